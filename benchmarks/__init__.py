@@ -0,0 +1,10 @@
+# -*- coding: UTF-8 -*-
+
+"""benchmarks: performance benchmarks of METRO.
+Modules:
+  synthetic.py: generates synthetic transcriptomes, MAF files and .metro.tsv files
+  run.py: times each stage of METRO on synthetic data, see `python benchmarks/run.py -h`
+  translate.py: benchmarks batch translation on a transcriptomic FASTA file
+  startup.py: benchmarks the cold start of each metro sub command, see `python benchmarks/startup.py -h`
+  stub/netMHCpan: deterministic stand-in for netMHCpan, used to benchmark predict
+"""
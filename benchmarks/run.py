@@ -0,0 +1,225 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+"""run.py: benchmarks each stage of METRO on synthetic inputs.
+USAGE:
+  python benchmarks/run.py [--workdir DIR] [--transcripts N] [--variants N] [--samples N]
+                           [--stages STAGE ...] [--repeat N] [--threads N] [--json FILE]
+  --workdir: directory of the synthetic inputs and outputs [default: temporary directory]
+  --transcripts: number of synthetic transcripts [default: 2000]
+  --variants: number of variants in each synthetic MAF file [default: 5000]
+  --samples: number of synthetic MAF files [default: 4]
+  --seed: seed of the synthetic inputs [default: 0]
+  --stages: stages to benchmark [default: mutate translate truncate find prepare predict]
+  --repeat: number of times each in-process stage is timed, the best run is kept [default: 3]
+  --threads: number of threads of the find and predict sub commands [default: 1]
+  --json: write the report to a JSON file, to track regressions between releases
+ABOUT:
+  Synthetic inputs are generated with synthetic.py. The mutate, translate and truncate
+  stages are timed in-process, their peak memory is the peak of Python allocations in a
+  separate, untimed run (tracemalloc). The find, prepare and predict stages run the metro
+  sub commands, their peak memory is the peak resident set size of the metro process.
+  predict runs with the stub netMHCpan (stub/netMHCpan), and only the post-processing of
+  the netMHCpan outputs is timed, from the moment predict reports it starts.
+Example:
+  python benchmarks/run.py --transcripts 20000 --variants 50000 --json metro-v2.1.json
+"""
+
+from __future__ import print_function, division
+import os, sys, time, json, platform
+import argparse, subprocess, tempfile, tracemalloc
+
+# Add the root of the project directory
+# to the path to import the src package
+here = os.path.dirname(os.path.realpath(__file__))
+sys.path.insert(0, os.path.join(here, '..'))
+from src import version
+from src.mutator import (mutate,
+    parse)
+from src.aminoacid import (translate,
+    translate_many,
+    truncate,
+    convert_aa_cooridate)
+from src.reader import (fasta,
+    records)
+from benchmarks import synthetic
+
+# Stages in the order they are run
+stages = ['mutate', 'translate', 'truncate', 'find', 'prepare', 'predict']
+
+
+def timeit(method, repeat):
+    """Times a method, reports the best of N runs and the peak of Python allocations
+    of one more, untimed run.
+    @param method <function>:
+        Method to time, without arguments
+    @param repeat <int>:
+        Number of timed runs
+    @return seconds <float>, peak <float>:
+        Fastest run time in seconds and peak memory in MB
+    """
+    best = float('inf')
+    for i in range(repeat):
+        start = time.perf_counter()
+        method()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        method()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return best, peak / 1e6
+
+
+def metro(args, env=None, marker=None):
+    """Runs a metro sub command and measures it.
+    @param args list[<str>]:
+        Arguments of the metro executable
+    @param env <dict>:
+        Environment of the metro process
+    @param marker <str>:
+        Only time the sub command from the first line of its output starting with marker
+    @return seconds <float>, peak <float>:
+        Run time in seconds and peak resident set size of the metro process in MB
+    """
+    env = dict(env or os.environ, PYTHONUNBUFFERED='1')
+    root = os.path.join(here, '..')
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, os.path.join(root, 'metro')] + args, cwd=root, env=env,
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, universal_newlines=True)
+    for line in process.stdout:
+        if marker and line.startswith(marker):
+            start = time.perf_counter()
+    process.stdout.close()
+    # Resource usage of this process only,
+    # not of any other child process
+    _, status, usage = os.wait4(process.pid, 0)
+    seconds = time.perf_counter() - start
+    process.returncode = os.waitstatus_to_exitcode(status)
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, ['metro'] + args)
+
+    # Maximum resident set size
+    # is in KB on Linux
+    scale = 1e6 if sys.platform == 'darwin' else 1e3
+    return seconds, usage.ru_maxrss / scale
+
+
+def benchmark(files, workdir, selected=stages, repeat=3, threads=1):
+    """Benchmarks each selected stage of METRO.
+    @param files <dict>:
+        Synthetic inputs, see synthetic.generate()
+    @param workdir <str>:
+        Directory of the outputs of each sub command
+    @param selected list[<str>]:
+        Stages to benchmark
+    @param repeat <int>:
+        Number of timed runs of each in-process stage
+    @param threads <int>:
+        Number of threads of the find and predict sub commands
+    @return results list[<dict>]:
+        Stage, number of items, unit of the items, seconds, throughput and peak memory
+    """
+    results = []
+    def record(stage, items, unit, seconds, peak):
+        results.append({'stage': stage, 'items': items, 'unit': unit, 'seconds': seconds,
+            'throughput': items / seconds if seconds else float('inf'), 'peak_mb': peak})
+        print('{:<10}{:>10} {:<12}{:>10.3f} s{:>14.1f} {}/s{:>10.1f} MB'.format(
+            stage, items, unit, seconds, items / seconds if seconds else float('inf'), unit, peak))
+
+    transcripts = dict((sid.split(' ')[0].split('.')[0], sequence) for sid, sequence in fasta(files['transcripts']))
+    variants = [(transcripts[transcript], hgvs, classification) for transcript, hgvs, classification in
+        records(files['mafs'][0], subset=['Transcript_ID', 'HGVSc', 'Variant_Classification']) if '-' not in hgvs]
+    mutated = []
+    for sequence, hgvs, classification in variants:
+        mutated_dna, position = mutate(sequence, hgvs)
+        downstream = None if classification.lower().startswith('frame_shift') else 30
+        mutated.append((translate(mutated_dna), convert_aa_cooridate(position), downstream))
+
+    if 'mutate' in selected:
+        # Parsed HGVS terms are cached,
+        # each run starts with a cold cache
+        def mutate_all():
+            parse.cache_clear()
+            return [mutate(sequence, hgvs) for sequence, hgvs, _ in variants]
+        seconds, peak = timeit(mutate_all, repeat)
+        record('mutate', len(variants), 'variants', seconds, peak)
+    if 'translate' in selected:
+        sequences = list(transcripts.values())
+        seconds, peak = timeit(lambda: translate_many(sequences, return_exceptions=True), repeat)
+        record('translate', sum(len(sequence) for sequence in sequences) // 1000, 'kb', seconds, peak)
+    if 'truncate' in selected:
+        seconds, peak = timeit(lambda: [truncate(aa, position, 30, downstream) for aa, position, downstream in mutated], repeat)
+        record('truncate', len(mutated), 'variants', seconds, peak)
+
+    nvariants = sum(1 for maf in files['mafs'] for _ in records(maf, subset=['HGVSc']))
+    if 'find' in selected:
+        seconds, peak = metro(['find', '--input'] + files['mafs'] + ['--transcripts', files['transcripts'],
+            '--outputDir', os.path.join(workdir, 'find'), '--threads', str(threads)])
+        record('find', nvariants, 'variants', seconds, peak)
+    if 'prepare' in selected:
+        output_dir = os.path.join(workdir, 'prepare')
+        if not os.path.isdir(output_dir):
+            os.makedirs(output_dir)
+        seconds, peak = metro(['prepare', '--mafFiles'] + files['mafs'] + ['--outputDir', output_dir,
+            '--outprefix', 'bench'])
+        record('prepare', nvariants, 'variants', seconds, peak)
+    if 'predict' in selected:
+        output_dir = os.path.join(workdir, 'predict')
+        if not os.path.isdir(output_dir):
+            os.makedirs(output_dir)
+        env = dict(os.environ, PATH=os.path.join(here, 'stub') + os.pathsep + os.environ.get('PATH', ''))
+        seconds, peak = metro(['predict', '--mutationFile', files['metro'], '--alleleList', 'H-2-Kb,H-2-Db',
+            '--peptideLength', '8,9,10', '--outputDir', output_dir, '--outprefix', 'bench',
+            '--threads', str(threads)], env=env, marker='--Post-Processing')
+        with open(os.path.join(output_dir, 'bench_output_netmhc_final.tsv')) as fh:
+            peptides = sum(1 for _ in fh) - 1
+        record('predict', peptides, 'peptides', seconds, peak)
+
+    return results
+
+
+def main():
+    """
+    Pseudo main method that runs when program is directly invoked.
+    """
+    parser = argparse.ArgumentParser(description = 'Benchmarks each stage of METRO on synthetic inputs.')
+    parser.add_argument('--workdir', default = None, help = 'Directory of the synthetic inputs and outputs')
+    parser.add_argument('--transcripts', type = int, default = 2000, help = 'Number of synthetic transcripts')
+    parser.add_argument('--variants', type = int, default = 5000, help = 'Number of variants in each MAF file')
+    parser.add_argument('--samples', type = int, default = 4, help = 'Number of MAF files')
+    parser.add_argument('--seed', type = int, default = 0, help = 'Seed of the synthetic inputs')
+    parser.add_argument('--stages', nargs = '+', choices = stages, default = stages, help = 'Stages to benchmark')
+    parser.add_argument('--repeat', type = int, default = 3, help = 'Number of timed runs of in-process stages')
+    parser.add_argument('--threads', type = int, default = 1, help = 'Number of threads of find and predict')
+    parser.add_argument('--json', default = None, help = 'Write the report to a JSON file')
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix = 'metro_bench_')
+    print('Generating synthetic inputs in {}'.format(workdir))
+    start = time.perf_counter()
+    files = synthetic.generate(os.path.join(workdir, 'inputs'), args.transcripts, args.variants, args.samples, args.seed)
+    print('Generated {} transcripts, {} MAF files of {} variants in {:.1f} s'.format(
+        args.transcripts, args.samples, args.variants, time.perf_counter() - start))
+
+    print('{:<10}{:>10} {:<12}{:>12}{:>22}{:>13}'.format('stage', 'items', '', 'time', 'throughput', 'peak'))
+    results = benchmark(files, workdir, args.stages, args.repeat, args.threads)
+
+    if args.json:
+        report = {
+            'version': version,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'scale': {'transcripts': args.transcripts, 'variants': args.variants,
+                'samples': args.samples, 'seed': args.seed, 'threads': args.threads},
+            'results': results
+        }
+        with open(args.json, 'w') as fh:
+            json.dump(report, fh, indent=2)
+        print('Report written to {}'.format(args.json))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+"""startup.py: benchmarks the cold start of the metro entry point for each sub command.
+USAGE:
+  python benchmarks/startup.py [--commands COMMAND ...] [--repeat N] [--budget MS] [--json FILE]
+  --commands: sub commands to benchmark, 'metro' is the entry point without a sub command
+              [default: metro build prepare find predict]
+  --repeat: number of times each sub command is started, the fastest start is kept [default: 5]
+  --budget: maximum import time of each sub command in milliseconds [default: 100]
+  --json: write the report to a JSON file, to track regressions between releases
+ABOUT:
+  Each sub command is started with `python -X importtime metro <command> --help`, which
+  imports everything the entry point imports before a sub command runs. The import time is
+  the sum of the cumulative import time of each top-level import reported by -X importtime,
+  the wall time is the run time of the whole process. Sub commands import their own modules,
+  pandas and numpy when they run, so none of the heavy modules (numpy, pandas, pyarrow) should
+  be imported at startup. The benchmark exits with a non-zero exit code if a sub command
+  imports a heavy module at startup, or if its import time is over budget.
+Example:
+  python benchmarks/startup.py --repeat 10 --json startup-v2.1.json
+"""
+
+from __future__ import print_function, division
+import os, sys, time, json, platform
+import argparse, subprocess
+
+here = os.path.dirname(os.path.realpath(__file__))
+root = os.path.join(here, '..')
+
+# Sub commands in the order they are run,
+# 'metro' starts without a sub command
+commands = ['metro', 'build', 'prepare', 'find', 'predict']
+
+# Modules which must not be
+# imported at startup
+heavy = ['numpy', 'pandas', 'pyarrow']
+
+
+def importtime(stderr):
+    """Parses the output of python -X importtime.
+    @param stderr <str>:
+        Standard error of a python process started with -X importtime
+    @return modules <dict>:
+        Maps each imported module to its cumulative import time in microseconds
+    @return total <int>:
+        Sum of the cumulative import time of each top-level import in microseconds
+    """
+    modules, total = {}, 0
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[1].strip().isdigit():
+            # Header line of the report
+            continue
+        cumulative, name = int(fields[1]), fields[2].rstrip()
+        module = name.strip()
+        modules[module] = cumulative
+        # Nested imports are indented
+        # under their parent module
+        if name[1:2] != ' ':
+            total += cumulative
+
+    return modules, total
+
+
+def start(command):
+    """Starts the metro entry point with a sub command, and exits at its help message.
+    @param command <str>:
+        Sub command, or 'metro' for the entry point without a sub command
+    @return seconds <float>, imports <float>, modules <dict>:
+        Wall time and import time in seconds, and the cumulative import time of each
+        imported module in microseconds
+    """
+    args = [sys.executable, '-X', 'importtime', os.path.join(root, 'metro')]
+    args += ['--help'] if command == 'metro' else [command, '--help']
+    started = time.perf_counter()
+    process = subprocess.run(args, cwd=root, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+        universal_newlines=True)
+    seconds = time.perf_counter() - started
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, args, stderr=process.stderr)
+    modules, total = importtime(process.stderr)
+
+    return seconds, total / 1e6, modules
+
+
+def benchmark(selected=commands, repeat=5, budget=100):
+    """Benchmarks the cold start of each selected sub command.
+    @param selected list[<str>]:
+        Sub commands to benchmark
+    @param repeat <int>:
+        Number of starts of each sub command, the fastest start is kept
+    @param budget <float>:
+        Maximum import time of each sub command in milliseconds
+    @return results list[<dict>]:
+        Sub command, wall time, import time, number of imported modules, heavy modules
+        imported at startup, and whether the sub command is within budget
+    """
+    results = []
+    for command in selected:
+        runs = [start(command) for i in range(repeat)]
+        seconds, imports, modules = min(runs, key=lambda run: run[1])
+        imported = [module for module in heavy if module in modules]
+        passed = not imported and imports * 1e3 <= budget
+        results.append({'command': command, 'seconds': min(run[0] for run in runs), 'imports': imports,
+            'modules': len(modules), 'heavy': imported, 'passed': passed})
+        print('{:<10}{:>10.1f} ms{:>10.1f} ms{:>10}  {:<20}{}'.format(command, results[-1]['seconds'] * 1e3,
+            imports * 1e3, len(modules), ','.join(imported) or '-', 'ok' if passed else 'FAIL'))
+
+    return results
+
+
+def main():
+    """
+    Pseudo main method that runs when program is directly invoked.
+    """
+    parser = argparse.ArgumentParser(description = 'Benchmarks the cold start of each metro sub command.')
+    parser.add_argument('--commands', nargs = '+', choices = commands, default = commands, help = 'Sub commands to benchmark')
+    parser.add_argument('--repeat', type = int, default = 5, help = 'Number of starts of each sub command')
+    parser.add_argument('--budget', type = float, default = 100, help = 'Maximum import time in milliseconds')
+    parser.add_argument('--json', default = None, help = 'Write the report to a JSON file')
+    args = parser.parse_args()
+
+    print('{:<10}{:>13}{:>13}{:>10}  {:<20}{}'.format('command', 'wall', 'imports', 'modules', 'heavy', 'budget'))
+    results = benchmark(args.commands, args.repeat, args.budget)
+
+    if args.json:
+        report = {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'budget_ms': args.budget,
+            'results': results
+        }
+        with open(args.json, 'w') as fh:
+            json.dump(report, fh, indent=2)
+        print('Report written to {}'.format(args.json))
+
+    if not all(result['passed'] for result in results):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
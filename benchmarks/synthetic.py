@@ -0,0 +1,249 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+"""synthetic.py: generates synthetic inputs of METRO at a configurable scale.
+USAGE:
+  python benchmarks/synthetic.py outputDir [--transcripts N] [--variants N] [--samples N] [--seed N]
+  outputDir: directory of the generated files
+  --transcripts: number of transcripts in the transcriptome [default: 2000]
+  --variants: number of variants in each MAF file [default: 5000]
+  --samples: number of MAF files, sharing a pool of recurrent variants [default: 4]
+  --seed: seed of the random number generator [default: 0]
+ABOUT:
+  Writes a transcriptomic FASTA file (transcripts.fa), like the output of metro build, a MAF
+  file for each sample (sample_N.maf) with the columns used by the find and prepare sub
+  commands, and the find output of the first sample (sample_0.metro.tsv), which is the input
+  of the predict sub command. Variants cover every HGVS class handled by mutate(): 
+  substitutions, deletions, duplications, insertions and deletion-insertions, in frame and
+  frame shift, plus a small fraction of non-coding variants. The same seed always generates
+  the same files.
+Example:
+  python benchmarks/synthetic.py /scratch/$USER/METRO/bench --transcripts 20000 --variants 50000
+"""
+
+from __future__ import print_function, division
+import os, sys, random
+import argparse
+
+# Add the root of the project directory 
+# to the path to import the src package
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
+from src import finder, writer
+
+# Sense codons, stop codons are only
+# used at the end of each transcript
+bases = 'ACGT'
+stops = ['TAA', 'TAG', 'TGA']
+codons = [a + b + c for a in bases for b in bases for c in bases if a + b + c not in stops]
+
+# Columns of each MAF file
+maf_columns = [
+    'Hugo_Symbol', 'Gene', 'Chromosome', 'Start_Position', 'End_Position',
+    'Reference_Allele', 'Tumor_Seq_Allele1', 'Tumor_Seq_Allele2',
+    't_alt_count', 't_depth', 'IMPACT', 'FILTER',
+    'Transcript_ID', 'HGVSc', 'Variant_Classification'
+]
+
+
+def transcriptome(filename, n, min_length=300, max_length=3000, seed=0, width=60):
+    """Writes a transcriptomic FASTA file of random coding sequences. Each sequence starts
+    with a start codon, has no premature stop codons, and ends with a stop codon. Headers
+    look like the output of metro build, i.e. '>ENSMUST00000000001.1 gene=Gene1'.
+    @param filename <str>:
+        Output FASTA file
+    @param n <int>:
+        Number of transcripts
+    @param min_length <int>:
+        Minimum length of each coding sequence, in base pairs
+    @param max_length <int>:
+        Maximum length of each coding sequence, in base pairs
+    @param seed <int>:
+        Seed of the random number generator
+    @param width <int>:
+        Number of bases on each sequence line
+    @return transcripts list[<tuple>]:
+        Transcript ID, gene name and sequence of each transcript
+    """
+    rng = random.Random(seed)
+    transcripts = []
+    with open(filename, 'w') as fh:
+        for i in range(1, n + 1):
+            ncodons = rng.randint(min_length // 3, max_length // 3)
+            sequence = 'ATG' + ''.join(rng.choice(codons) for _ in range(ncodons - 2)) + rng.choice(stops)
+            transcript, gene = 'ENSMUST{:011d}'.format(i), 'Gene{}'.format(i)
+            fh.write('>{}.1 gene={}\n'.format(transcript, gene))
+            for j in range(0, len(sequence), width):
+                fh.write(sequence[j:j+width] + '\n')
+            transcripts.append((transcript, gene, sequence))
+
+    return transcripts
+
+
+def variant(rng, transcript, gene, sequence, offset):
+    """Draws a random variant of a transcript.
+    @param rng <random.Random>:
+        Random number generator
+    @params transcript, gene, sequence <str>:
+        Transcript ID, gene name and coding sequence of the transcript
+    @param offset <int>:
+        Genomic position of the first base of the transcript
+    @return variant <dict>:
+        MAF columns of the variant, apart from the sample specific columns
+    """
+    kind = rng.choice(['substitution', 'substitution', 'deletion', 'duplication', 'insertion', 'indel', 'noncoding'])
+    start = rng.randint(4, len(sequence) - 12)
+    length = rng.choice([1, 2, 3, 4, 6])
+    stop = start + length - 1
+    ref = sequence[start-1:stop]
+    insert = ''.join(rng.choice(bases) for _ in range(rng.choice([1, 2, 3, 5, 6])))
+    frame = 'In_Frame' if length % 3 == 0 else 'Frame_Shift'
+    span = '{}'.format(start) if start == stop else '{}_{}'.format(start, stop)
+    if kind == 'substitution':
+        ref, alt = sequence[start-1], rng.choice([b for b in bases if b != sequence[start-1]])
+        stop, hgvs, classification = start, 'c.{}{}>{}'.format(start, ref, alt), 'Missense_Mutation'
+    elif kind == 'deletion':
+        alt, hgvs, classification = '-', 'c.{}del{}'.format(span, rng.choice([ref, ''])), frame + '_Del'
+    elif kind == 'duplication':
+        alt, hgvs, classification = ref + ref, 'c.{}dup'.format(span), frame + '_Ins'
+    elif kind == 'insertion':
+        frame = 'In_Frame' if len(insert) % 3 == 0 else 'Frame_Shift'
+        ref, alt, stop = '-', insert, start + 1
+        hgvs, classification = 'c.{}_{}ins{}'.format(start, start + 1, insert), frame + '_Ins'
+    elif kind == 'indel':
+        frame = 'In_Frame' if (len(insert) - length) % 3 == 0 else 'Frame_Shift'
+        alt, hgvs, classification = insert, 'c.{}delins{}'.format(span, insert), frame + '_Del'
+    else:
+        # Variants outside of the coding 
+        # sequence are skipped by find
+        ref, alt, stop = 'A', 'G', start
+        hgvs, classification = 'c.-{}A>G'.format(start), "5'UTR"
+
+    return {
+        'Hugo_Symbol': gene, 'Gene': gene.replace('Gene', 'ENSMUSG'), 'Chromosome': 'chr1',
+        'Start_Position': offset + start, 'End_Position': offset + stop,
+        'Reference_Allele': ref, 'Tumor_Seq_Allele1': ref, 'Tumor_Seq_Allele2': alt,
+        'IMPACT': 'MODIFIER' if kind == 'noncoding' else rng.choice(['HIGH', 'MODERATE', 'LOW']),
+        'Transcript_ID': transcript, 'HGVSc': hgvs, 'Variant_Classification': classification
+    }
+
+
+def cohort(output_dir, transcripts, samples=4, variants=5000, recurrence=0.5, seed=0):
+    """Writes a MAF file for each sample of a cohort. A fraction of the variants of each
+    sample is drawn from a pool of recurrent variants shared by all samples, so variants
+    are seen in more than one sample like in a real cohort.
+    @param output_dir <str>:
+        Directory of the MAF files
+    @param transcripts list[<tuple>]:
+        Transcripts to draw variants from, see transcriptome()
+    @param samples <int>:
+        Number of samples
+    @param variants <int>:
+        Number of variants in each MAF file
+    @param recurrence <float>:
+        Fraction of the variants of each sample drawn from the pool of recurrent variants
+    @param seed <int>:
+        Seed of the random number generator
+    @return mafs list[<str>]:
+        MAF file of each sample
+    """
+    rng = random.Random(seed)
+    offsets = [10000 * (i + 1) for i in range(len(transcripts))]
+    def draw():
+        i = rng.randrange(len(transcripts))
+        return variant(rng, *(transcripts[i] + (offsets[i],)))
+    pool = [draw() for _ in range(max(1, variants // 2))]
+
+    mafs = []
+    for sample in range(samples):
+        filename = os.path.join(output_dir, 'sample_{}.maf'.format(sample))
+        with open(filename, 'w') as fh:
+            fh.write('#version 2.4\n')
+            fh.write('\t'.join(maf_columns) + '\n')
+            for _ in range(variants):
+                row = dict(rng.choice(pool) if rng.random() < recurrence else draw())
+                depth = rng.randint(20, 200)
+                row.update({
+                    't_depth': depth, 't_alt_count': rng.randint(1, depth),
+                    'FILTER': 'PASS' if rng.random() < 0.8 else 'common_variant'
+                })
+                fh.write('\t'.join(str(row[column]) for column in maf_columns) + '\n')
+        mafs.append(filename)
+
+    return mafs
+
+
+def metro_tsv(filename, maf, transcripts, subset=30):
+    """Writes the find output of a MAF file, the input of the predict sub command.
+    @param filename <str>:
+        Output .metro.tsv file
+    @param maf <str>:
+        MAF file, see cohort()
+    @param transcripts <str>:
+        Transcriptomic FASTA file, see transcriptome()
+    @param subset <int>:
+        Truncates non-frame shift mutations +/- N amino acids
+    @return rows <int>:
+        Number of rows in the output file
+    """
+    from src.reader import records
+    variant_finder = finder.Finder(finder.load(transcripts, quiet=True), subset=subset)
+    rows = 0
+    # Warnings of skipped variants 
+    # are not of interest here
+    stderr, sys.stderr = sys.stderr, open(os.devnull, 'w')
+    try:
+        with writer.TableWriter(filename, finder.columns) as ofh:
+            for record in records(maf, subset=['Transcript_ID', 'Variant_Classification', 'HGVSc', 'Hugo_Symbol', 'Gene']):
+                row = variant_finder.find(*record)
+                if row:
+                    ofh.write(row)
+                    rows += 1
+    finally:
+        sys.stderr.close()
+        sys.stderr = stderr
+
+    return rows
+
+
+def generate(output_dir, transcripts=2000, variants=5000, samples=4, seed=0):
+    """Generates every synthetic input of METRO, see the module docstring.
+    @param output_dir <str>:
+        Directory of the generated files, created if it does not exist
+    @params transcripts, variants, samples <int>:
+        Scale of the generated files
+    @param seed <int>:
+        Seed of the random number generator
+    @return files <dict>:
+        'transcripts' FASTA file, 'mafs' files and 'metro' file
+    """
+    if not os.path.isdir(output_dir):
+        os.makedirs(output_dir)
+    fasta = os.path.join(output_dir, 'transcripts.fa')
+    records = transcriptome(fasta, transcripts, seed=seed)
+    mafs = cohort(output_dir, records, samples, variants, seed=seed)
+    metro = os.path.join(output_dir, 'sample_0.metro.tsv')
+    metro_tsv(metro, mafs[0], fasta)
+
+    return {'transcripts': fasta, 'mafs': mafs, 'metro': metro}
+
+
+def main():
+    """
+    Pseudo main method that runs when program is directly invoked.
+    """
+    parser = argparse.ArgumentParser(description = 'Generates synthetic METRO inputs.')
+    parser.add_argument('outputDir', help = 'Directory of the generated files')
+    parser.add_argument('--transcripts', type = int, default = 2000, help = 'Number of transcripts')
+    parser.add_argument('--variants', type = int, default = 5000, help = 'Number of variants in each MAF file')
+    parser.add_argument('--samples', type = int, default = 4, help = 'Number of MAF files')
+    parser.add_argument('--seed', type = int, default = 0, help = 'Seed of the random number generator')
+    args = parser.parse_args()
+
+    files = generate(args.outputDir, args.transcripts, args.variants, args.samples, args.seed)
+    print('Transcriptome: {}'.format(files['transcripts']))
+    print('MAF files: {}'.format(' '.join(files['mafs'])))
+    print('Find output: {}'.format(files['metro']))
+
+
+if __name__ == '__main__':
+    main()
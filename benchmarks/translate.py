@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+"""translate.py: benchmarks the vectorized batch translation engine against
+codon-by-codon translation on a transcriptomic FASTA file.
+USAGE:
+  python benchmarks/translate.py transcripts.fa [--repeat REPEAT]
+  transcripts.fa: transcriptomic FASTA file, i.e. the output of metro build
+  --repeat: number of times each translation method is timed [default: 3]
+Example:
+  # Full mouse transcriptome (GENCODE vM29)
+  python benchmarks/translate.py /scratch/$USER/METRO/refs/transcripts.fa
+"""
+
+from __future__ import print_function, division
+import os, sys, time
+import argparse
+
+# Add the root of the project directory 
+# to the path to import the src package
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
+from src.aminoacid import (translate_codons,
+    translate_many,
+    InvalidCodonError)
+from src.reader import fasta
+
+
+def legacy(sequences):
+    """Translates each sequence one codon at a time.
+    @param sequences list[<str>]:
+        Coding DNA sequences to translate
+    @return aminoacids list[<str|InvalidCodonError>]:
+        Translated amino acid sequence of each coding DNA sequence
+    """
+    aminoacids = []
+    for sequence in sequences:
+        try:
+            aminoacids.append(translate_codons(sequence))
+        except InvalidCodonError as e:
+            aminoacids.append(e)
+    return aminoacids
+
+
+def vectorized(sequences):
+    """Translates all sequences in one batch.
+    @param sequences list[<str>]:
+        Coding DNA sequences to translate
+    @return aminoacids list[<str|InvalidCodonError>]:
+        Translated amino acid sequence of each coding DNA sequence
+    """
+    return translate_many(sequences, return_exceptions=True)
+
+
+def timeit(method, sequences, repeat):
+    """Times a translation method, reports the best of N runs.
+    @param method <function>:
+        Translation method to time
+    @param sequences list[<str>]:
+        Coding DNA sequences to translate
+    @param repeat <int>:
+        Number of times to run the translation method
+    @return best <float>, aminoacids list[<str|InvalidCodonError>]:
+        Fastest run time in seconds and the translated sequences
+    """
+    best = float('inf')
+    for i in range(repeat):
+        start = time.perf_counter()
+        aminoacids = method(sequences)
+        best = min(best, time.perf_counter() - start)
+    return best, aminoacids
+
+
+def main():
+    """
+    Pseudo main method that runs when program is directly invoked.
+    """
+    parser = argparse.ArgumentParser(description = 'Benchmarks METRO batch translation.')
+    parser.add_argument('transcripts', help = 'Transcriptomic FASTA file')
+    parser.add_argument('--repeat', type = int, default = 3, help = 'Number of timed runs')
+    args = parser.parse_args()
+
+    sequences = [sequence for sid, sequence in fasta(args.transcripts)]
+    nbases = sum(len(sequence) for sequence in sequences)
+    print('Loaded {} transcripts ({:.1f} Mb)'.format(len(sequences), nbases/1e6))
+
+    legacy_time, expected = timeit(legacy, sequences, args.repeat)
+    vectorized_time, observed = timeit(vectorized, sequences, args.repeat)
+
+    # Translations and errors must be identical
+    for e, o in zip(expected, observed):
+        assert type(e) == type(o) and str(e) == str(o), 'Error batch translation does not match!'
+
+    for name, seconds in [('codon-by-codon', legacy_time), ('vectorized', vectorized_time)]:
+        print('{:<16}{:>10.3f} s{:>12.1f} Mb/s'.format(name, seconds, nbases/1e6/seconds))
+    print('Speedup: {:.1f}x'.format(legacy_time/vectorized_time))
+
+
+if __name__ == '__main__':
+    main()
@@ -34,6 +34,10 @@ subsetFilter="30"
 alleleList="H-2-Ld,H-2-Dd,H-2-Kb"
 peptideLength="8,9,10,11"
 kmerLength="21"
+threads="16"
+# skip the stages which are up to date,
+# set to "" to re-run every stage
+resume="--resume"
 
 ###############################################################
 # DIRECTORIES
@@ -108,7 +112,7 @@ if [[ $flag == "build" ]]; then
         gunzip $BUILD_DIR/$REF_GTF_SHORT
     fi
 
-    $METRO_LOC/./metro build \
+    $METRO_LOC/./metro $resume build \
         --ref-fa $BUILD_DIR/$REF_FA_SHORT \
         --ref-gtf $BUILD_DIR/$REF_GTF_SHORT \
         --output $BUILD_DIR" > $sh
@@ -121,7 +125,7 @@ if [[ $flag == "prepare" ]]; then
 
     echo "#!/bin/sh
     export PATH=$PATH:/data/CCBR_Pipeliner/bin/netMHC/netMHCpan-4.1
-    $METRO_LOC/./metro prepare \
+    $METRO_LOC/./metro $resume prepare \
         --mafFiles $INPUT_MAF_FILES \
         --outputDir $PREPARE_DIR \
         --outprefix $prefix \
@@ -141,11 +145,12 @@ if [[ $flag == "find" ]]; then
     echo "#!/bin/sh
     export PATH=$PATH:/data/CCBR_Pipeliner/bin/netMHC/netMHCpan-4.1
     module load python/3.8
-    $METRO_LOC/./metro find \
+    $METRO_LOC/./metro $resume find \
         --input $PREPARE_DIR/${prefix}_VAF${VAF}0_Variant.csv \
-        --output $FIND_DIR \
+        --outputDir $FIND_DIR \
         --transcripts $BUILD_DIR/transcripts.fa \
-        --subset $subsetFilter" > $sh
+        --subset $subsetFilter \
+        --threads $threads" > $sh
     $calltype $sh
 fi
 
@@ -171,7 +176,7 @@ if [[ $flag == "predict" ]]; then
             module load python/3.8
 
             cd $METRO_LOC
-            $METRO_LOC/./metro predict \
+            $METRO_LOC/./metro $resume predict \
                 --mutationFile $FIND_DIR/${prefix}_VAF${VAF}0_Variant.metro.tsv \
                 --alleleList $a \
                 --peptideLength $peptideLength \
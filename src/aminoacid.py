@@ -2,10 +2,53 @@
 # -*- coding: UTF-8 -*-
 from __future__ import print_function, division
 from utils import err
+from collections import OrderedDict
 from math import ceil
+import numpy as np
 import re
 
 
+# Translates codons to amino acids 
+codontable = {
+    'ATA': 'I', 'ATC': 'I', 'ATT': 'I', 'ATG': 'M',
+    'ACA': 'T', 'ACC': 'T', 'ACG': 'T', 'ACT': 'T',
+    'AAC': 'N', 'AAT': 'N', 'AAA': 'K', 'AAG': 'K',
+    'AGC': 'S', 'AGT': 'S', 'AGA': 'R', 'AGG': 'R',
+    'CTA': 'L', 'CTC': 'L', 'CTG': 'L', 'CTT': 'L',
+    'CCA': 'P', 'CCC': 'P', 'CCG': 'P', 'CCT': 'P',
+    'CAC': 'H', 'CAT': 'H', 'CAA': 'Q', 'CAG': 'Q',
+    'CGA': 'R', 'CGC': 'R', 'CGG': 'R', 'CGT': 'R',
+    'GTA': 'V', 'GTC': 'V', 'GTG': 'V', 'GTT': 'V',
+    'GCA': 'A', 'GCC': 'A', 'GCG': 'A', 'GCT': 'A',
+    'GAC': 'D', 'GAT': 'D', 'GAA': 'E', 'GAG': 'E',
+    'GGA': 'G', 'GGC': 'G', 'GGG': 'G', 'GGT': 'G',
+    'TCA': 'S', 'TCC': 'S', 'TCG': 'S', 'TCT': 'S',
+    'TTC': 'F', 'TTT': 'F', 'TTA': 'L', 'TTG': 'L',
+    'TAC': 'Y', 'TAT': 'Y', 'TAA': '*', 'TAG': '*',
+    'TGC': 'C', 'TGT': 'C', 'TGA': '*', 'TGG': 'W'
+}
+
+# Encodes each nucleotide (as an ASCII byte) into 
+# a 2-bit code, where A=0, C=1, G=2, T=3. Any other 
+# byte (i.e. N's or unknown basepairs) is encoded as 
+# 4 and cannot be mapped to a known amino acid.
+nucleotides = 'ACGT'
+invalid_base = 4
+base_lookup = np.full(256, invalid_base, dtype=np.uint8)
+for i, bp in enumerate(nucleotides):
+    base_lookup[ord(bp)] = i
+
+# Maps each encoded codon, i.e. 16*first + 4*second + third,
+# to the ASCII byte of its amino acid
+codon_lookup = np.zeros(64, dtype=np.uint8)
+for codon, aa in codontable.items():
+    index = 16*nucleotides.index(codon[0]) + 4*nucleotides.index(codon[1]) + nucleotides.index(codon[2])
+    codon_lookup[index] = ord(aa)
+
+# Matches any basepair that is not part of a known codon
+invalid_bases = re.compile('[^ACGT]')
+
+
 def translate(sequence):
     """Translates a coding DNA reference sequence into an amino acid sequence.
     @param sequence <str>:
@@ -13,38 +56,103 @@ def translate(sequence):
     @returns aminoacid <str>:
         Translated amino acid sequence
     """
+    return translate_many([sequence])[0]
+
+
+def translate_many(sequences, return_exceptions=False):
+    """Translates a batch of coding DNA reference sequences into amino acid sequences.
+    Each nucleotide is encoded into a uint8 array and each codon is mapped to its amino
+    acid through a pre-computed 64-entry lookup array, so the whole batch is translated
+    in one vectorized pass. Sequences containing N's or unknown basepairs raise an 
+    InvalidCodonError for the first codon that cannot be mapped, like translate().
+    @param sequences list[<str>]:
+        Coding DNA reference sequences to translate (transcript sequences or CDS sequences)
+    @param return_exceptions <bool>:
+        If True, an InvalidCodonError is returned in place of the sequence's amino
+        acid sequence instead of being raised, i.e. one bad sequence does not fail
+        the batch
+    @returns aminoacids list[<str>]:
+        Translated amino acid sequence of each coding DNA sequence
+    """
     # Clean sequence prior to conversion
-    sequence = sequence.strip().upper()
-    # Translates codons to amino acids 
-    codontable = {
-        'ATA': 'I', 'ATC': 'I', 'ATT': 'I', 'ATG': 'M',
-        'ACA': 'T', 'ACC': 'T', 'ACG': 'T', 'ACT': 'T',
-        'AAC': 'N', 'AAT': 'N', 'AAA': 'K', 'AAG': 'K',
-        'AGC': 'S', 'AGT': 'S', 'AGA': 'R', 'AGG': 'R',
-        'CTA': 'L', 'CTC': 'L', 'CTG': 'L', 'CTT': 'L',
-        'CCA': 'P', 'CCC': 'P', 'CCG': 'P', 'CCT': 'P',
-        'CAC': 'H', 'CAT': 'H', 'CAA': 'Q', 'CAG': 'Q',
-        'CGA': 'R', 'CGC': 'R', 'CGG': 'R', 'CGT': 'R',
-        'GTA': 'V', 'GTC': 'V', 'GTG': 'V', 'GTT': 'V',
-        'GCA': 'A', 'GCC': 'A', 'GCG': 'A', 'GCT': 'A',
-        'GAC': 'D', 'GAT': 'D', 'GAA': 'E', 'GAG': 'E',
-        'GGA': 'G', 'GGC': 'G', 'GGG': 'G', 'GGT': 'G',
-        'TCA': 'S', 'TCC': 'S', 'TCG': 'S', 'TCT': 'S',
-        'TTC': 'F', 'TTT': 'F', 'TTA': 'L', 'TTG': 'L',
-        'TAC': 'Y', 'TAT': 'Y', 'TAA': '*', 'TAG': '*',
-        'TGC': 'C', 'TGT': 'C', 'TGA': '*', 'TGG': 'W'
-    }
+    sequences = [sequence.strip().upper() for sequence in sequences]
+    try:
+        # Only complete codons are translated,
+        # trailing partial codons are ignored
+        encoded = ''.join(s[:len(s)-len(s)%3] for s in sequences).encode('ascii')
+    except UnicodeEncodeError:
+        # Non-ASCII characters cannot be encoded
+        # into the lookup table, translate each 
+        # sequence codon by codon instead
+        return [_translate_or_raise(translate_codons, s, return_exceptions) for s in sequences]
+
+    bases = base_lookup[np.frombuffer(encoded, dtype=np.uint8)].reshape(-1, 3)
+    first, second, third = bases[:, 0], bases[:, 1], bases[:, 2]
+    invalid = ((first | second | third) & invalid_base).astype(bool)
+    codons = (first << 4) | (second << 2) | third
+    # Invalid codons are masked to a valid index, 
+    # their sequences are reported below
+    codons[invalid] = 0
+    translated = codon_lookup[codons].tobytes().decode('ascii')
+
+    # Find the first codon that cannot be mapped
+    # to a known amino acid in each sequence
+    offsets = np.cumsum([0] + [len(sequence)//3 for sequence in sequences])
+    errors = {}
+    bad_codons = np.flatnonzero(invalid)
+    if bad_codons.size:
+        owners = np.searchsorted(offsets, bad_codons, side='right') - 1
+        owners, first_bad = np.unique(owners, return_index=True)
+        errors = dict(zip(owners.tolist(), (bad_codons[first_bad] - offsets[owners]).tolist()))
 
+    aminoacids, offsets = [], offsets.tolist()
+    for i, sequence in enumerate(sequences):
+        if i in errors:
+            codon = errors[i]
+            error = InvalidCodonError(sequence, sequence[3*codon:3*codon+3])
+            if not return_exceptions:
+                raise error
+            aminoacids.append(error)
+            continue
+        aminoacids.append(translated[offsets[i]:offsets[i+1]])
+
+    return aminoacids
+
+
+def translate_codons(sequence):
+    """Translates a coding DNA reference sequence into an amino acid sequence one 
+    codon at a time. Reference implementation of translate(), it is used as a fallback 
+    for sequences which cannot be encoded into the nucleotide lookup table.
+    @param sequence <str>:
+        Coding DNA reference sequence to translate (transcript sequence or CDS sequence)
+    @returns aminoacid <str>:
+        Translated amino acid sequence
+    """
+    # Clean sequence prior to conversion
+    sequence = sequence.strip().upper()
     # Translate DNA sequence to amino acids 
-    aminoacid = ""
+    aminoacid = []
     for i in range(0, len(sequence)-2, 3):
         codon = sequence[i:i+3]
         try:
-            aminoacid += codontable[codon]
+            aminoacid.append(codontable[codon])
         except KeyError:
             raise InvalidCodonError(sequence, codon)
 
-    return aminoacid
+    return ''.join(aminoacid)
+
+
+def _translate_or_raise(translator, sequence, return_exceptions):
+    """Private function: translates a sequence with the provided translator, 
+    returning any InvalidCodonError instead of raising it if return_exceptions
+    is True.
+    """
+    try:
+        return translator(sequence)
+    except InvalidCodonError as e:
+        if not return_exceptions:
+            raise
+        return e
 
 
 def truncate(sequence, index, upstream=30, downstream=None):
@@ -107,6 +215,70 @@ def truncate(sequence, index, upstream=30, downstream=None):
     return subsequence
 
 
+def translate_window(sequence, index, upstream=30, downstream=None):
+    """Translates only the window of a coding DNA sequence that is kept by truncate(). 
+    The result is identical to truncate(translate(sequence), index, upstream, downstream), 
+    but only the codons within the window are translated: the fixed window of +/- N codons
+    if a downstream value is given, otherwise the codons up to the first stop codon found 
+    downstream of the index (i.e. frame shift mutations). The sequence is still checked for
+    N's or unknown basepairs, so the same InvalidCodonError is raised as translate().
+    @param sequence <str>:
+        Coding DNA sequence to translate (mutated transcript sequence or CDS sequence)
+    @param index <int>:
+        Non-negative seed or reference point index in the amino acid sequence where 
+        upstream and downstream characters will be derived from to truncate the sequence
+    @param upstream <int>:
+        Extract N character upstream of the index the sequence
+    @param downstream <int>:
+        Extract N character downstream of the index the sequence
+    @returns subsequence <str>:
+        Truncated amino acid sequence 
+    """
+    # Clean sequence prior to conversion
+    sequence = sequence.strip().upper()
+    ncodons = len(sequence)//3
+
+    # Check the whole sequence for codons that cannot 
+    # be mapped to a known amino acid, a codon is valid
+    # if it is only composed of A, C, G or T
+    invalid = invalid_bases.search(sequence, 0, 3*ncodons)
+    if invalid:
+        i = invalid.start() - invalid.start()%3
+        raise InvalidCodonError(sequence, sequence[i:i+3])
+
+    def codons(start, stop):
+        # Translates codons within [start, stop)
+        return translate_many([sequence[3*start:3*stop]])[0]
+
+    # Get index upstream with respect to string length
+    # and convert 1-based to 0-based coordinate system
+    left_index = max(0, index-abs(upstream)-1)
+    if downstream:
+        # Fixed window, truncated at the 
+        # first stop codon (if found)
+        right_index = min(index+abs(downstream), ncodons)
+        subsequence = codons(left_index, right_index)
+        stop = subsequence.find('*', max(index-left_index, 0))
+        if stop >= 0:
+            subsequence = subsequence[:stop+1]
+        return subsequence
+
+    # Translate until the first stop codon found downstream 
+    # of the index is reached or until the end of the sequence,
+    # doubling the number of codons translated each time
+    subsequence = codons(left_index, min(index, ncodons))
+    start, chunk = max(index, left_index), 64
+    while start < ncodons:
+        translated = codons(start, min(start+chunk, ncodons))
+        stop = translated.find('*')
+        if stop >= 0:
+            return subsequence + translated[:stop+1]
+        subsequence += translated
+        start, chunk = start+chunk, chunk*2
+
+    return subsequence
+
+
 def convert_aa_cooridate(coordinate):
     """Converts DNA sequence coordinates into Amino acid coordinates.
     Assumes the coordiante system of the DNA sequence starts at 1, 
@@ -124,6 +296,99 @@ def convert_aa_cooridate(coordinate):
     return converted
 
 
+class TranslationCache(object):
+    """Bounded LRU cache of wild-type translations. Each entry is keyed by a transcript ID
+    and the hash of its coding DNA sequence, and it stores the transcript's translated amino
+    acid sequence (or the InvalidCodonError raised while translating it) and any truncated
+    windows of that amino acid sequence. Once the cache reaches its capacity, the least 
+    recently used transcript is evicted.
+
+    @attributes:
+        capacity -- maximum number of transcripts to cache, 0 disables caching
+        proteins -- function returning the pre-translated amino acid sequence of a 
+                    transcript ID or None, i.e. Bundle.protein (optional)
+        hits     -- number of translation requests served from the cache
+        misses   -- number of translation requests which required a translation
+    """
+    def __init__(self, capacity=1024, proteins=None):
+        self.capacity = int(capacity)
+        self.proteins = proteins
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def translate(self, transcript_id, sequence):
+        """Translates a transcript's coding DNA sequence, see translate().
+        @param transcript_id <str>:
+            Transcript identifier of the coding DNA sequence
+        @param sequence <str>:
+            Coding DNA reference sequence to translate (transcript sequence or CDS sequence)
+        @returns aminoacid <str>:
+            Translated amino acid sequence
+        """
+        return self._protein(self._lookup(transcript_id, sequence))
+
+    def truncate(self, transcript_id, sequence, index, upstream=30, downstream=None):
+        """Truncates a transcript's translated amino acid sequence, see truncate().
+        Each window is only truncated once per transcript. 
+        @param transcript_id <str>:
+            Transcript identifier of the coding DNA sequence
+        @param sequence <str>:
+            Coding DNA reference sequence to translate (transcript sequence or CDS sequence)
+        @param index <int>:
+            Seed or reference point index in the amino acid sequence 
+        @param upstream <int>:
+            Extract N character upstream of the index the sequence
+        @param downstream <int>:
+            Extract N character downstream of the index the sequence
+        @returns subsequence <str>:
+            Truncated amino acid sequence 
+        """
+        entry = self._lookup(transcript_id, sequence, count=False)
+        window = (index, upstream, downstream)
+        if window not in entry['windows']:
+            entry['windows'][window] = truncate(self._protein(entry), index, upstream, downstream)
+        return entry['windows'][window]
+
+    def _lookup(self, transcript_id, sequence, count=True):
+        """Private method: gets or creates the cache entry of a transcript.
+        """
+        key = (transcript_id, hash(sequence))
+        entry = self._entries.get(key)
+        if entry is not None:
+            if count: self.hits += 1
+            self._entries.move_to_end(key)
+            return entry
+
+        if count: self.misses += 1
+        # Pre-translated amino acid sequences 
+        # of a reference bundle are used as is
+        protein = self.proteins(transcript_id) if self.proteins is not None else None
+        try:
+            entry = {'protein': protein if protein is not None else translate(sequence), 'windows': {}}
+        except InvalidCodonError as e:
+            entry = {'protein': e, 'windows': {}}
+        if self.capacity > 0:
+            self._entries[key] = entry
+            if len(self._entries) > self.capacity:
+                # Evict least recently used transcript
+                self._entries.popitem(last=False)
+        return entry
+
+    @staticmethod
+    def _protein(entry):
+        """Private method: returns the translated amino acid sequence of an 
+        entry or raises the InvalidCodonError of its coding DNA sequence.
+        """
+        if isinstance(entry['protein'], InvalidCodonError):
+            # Drop the traceback of any previous raise
+            raise entry['protein'].with_traceback(None)
+        return entry['protein']
+
+
 class InvalidCodonError(Exception):
     """Raised when a trinucleotide sequence cannot be mapped to a known amino acid.
     This may occur when the provided sequence contains N's or unknown basepairs.
@@ -154,12 +419,26 @@ def main():
     print('Translated {} -> {}'.format('ATGATAACAAACAGCCTACCATGA',translate('ATGATAACAAACAGCCTACCATGA')))
     assert(translate('ATGATAACAAACAGCCTACCATGA') == 'MITNSLP*'), 'Error DNA sequence translation incorrect!'
 
+    # Translate a batch of DNA sequences
+    print('Translated batch {} -> {}'.format(['ATGATAACA', 'AAcAGCcTA'], translate_many(['ATGATAACA', 'AAcAGCcTA'])))
+    assert(translate_many(['ATGATAACA', 'AAcAGCcTA']) == ['MIT', 'NSL']), 'Error DNA sequence batch translation incorrect!'
+
     # Induce a translation failure
     try:
         translate('ATGATAACnAACAGCCTACCATGA')
     except InvalidCodonError as e:
         err('WARNING: Unable to translate DNA sequence!\n{}'.format(e))
     
+    # Translate only the truncated window
+    print("Windowed translation where i=2,l=1,r=1: {} -> {}".format('ATGATAACAAACAGCCTACCATGA', translate_window('ATGATAACAAACAGCCTACCATGA', 2, 1, 1)))
+    assert(translate_window('ATGATAACAAACAGCCTACCATGA', 2, 1, 1) == truncate('MITNSLP*', 2, 1, 1)), 'Error windowed translation incorrect!'
+
+    # Cache wild-type translations per transcript
+    cache = TranslationCache(capacity=2)
+    for tid, seq in [('T1', 'ATGATAACA'), ('T2', 'AAcAGCcTA'), ('T1', 'ATGATAACA')]:
+        print('Cached translation {} -> {}, {}'.format(tid, cache.translate(tid, seq), cache.truncate(tid, seq, 2, 1, 1)))
+    print('Translation cache: {} hits, {} misses'.format(cache.hits, cache.misses))
+
     # Convert DNA coordinates to AA coordinates
     print("DNA to AA coordinates: {} -> {}".format(1, convert_aa_cooridate(1)))
     print("DNA to AA coordinates: {} -> {}".format(5, convert_aa_cooridate(5)))
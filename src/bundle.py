@@ -0,0 +1,328 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+from __future__ import print_function
+from reader import fasta
+from aminoacid import (translate_many,
+    InvalidCodonError)
+import numpy as np
+import json, mmap, os
+
+"""
+ABOUT: Binary reference bundle of a transcriptomic FASTA file, written by the build sub command
+and read by the find sub command, see Bundle.
+
+Opening a bundle does not parse the transcriptomic FASTA file: the bundle is memory-mapped, and
+each section is a NumPy array over the memory map. A bundle holds the following sections:
+  • keys:      sorted transcript IDs, with and without their version suffix
+  • rows:      transcript of each key, and whether the key is only a versioned ID
+  • sequences: coding DNA sequence of each transcript, as bytes
+  • proteins:  pre-translated wild-type amino acid sequence of each transcript, transcripts
+               with an invalid codon are not pre-translated
+  • headers:   FASTA header of each transcript, i.e. its gene annotations
+A bundle records the size and the modification time of its FASTA file, a bundle older than its
+FASTA file, or of another FASTA file, is stale.
+"""
+
+# Identifies a bundle file and
+# the version of its layout
+magic = b'METROREF'
+layout = 1
+
+
+class StaleBundleError(ValueError):
+    """Raised when a bundle is stale, corrupt or of another layout, see Bundle.
+
+    @attributes:
+        filename -- path of the bundle
+        reason   -- why the bundle cannot be used
+    """
+    def __init__(self, filename, reason):
+        self.filename = filename
+        self.reason = reason
+        ValueError.__init__(self, "Reference bundle '{}' {}.".format(filename, reason))
+
+
+def path(transcripts):
+    """Path of the bundle of a transcriptomic FASTA file.
+    @param transcripts <str>:
+        Transcriptomic FASTA file, i.e. 'transcripts.fa'
+    @return bundle <str>:
+        Bundle file, i.e. 'transcripts.fa.bundle'
+    """
+    return transcripts + '.bundle'
+
+
+def unversioned(name):
+    """Removes the version suffix of a transcript ID, like finder.transcript_id().
+    @param name <str>:
+        Transcript ID, i.e. 'ENSMUST00000193812.1'
+    @return name <str>:
+        Transcript ID without its version suffix, i.e. 'ENSMUST00000193812'
+    """
+    return name.split('.')[0]
+
+
+def _offsets(blobs):
+    """Private function: start offset of each blob and the end of the last blob.
+    """
+    offsets = np.zeros(len(blobs) + 1, dtype=np.int64)
+    np.cumsum([len(blob) for blob in blobs], out=offsets[1:])
+    return offsets
+
+
+def write(transcripts, filename=None, batch_size=1000):
+    """Writes the bundle of a transcriptomic FASTA file. Later entries with the same
+    transcript ID take precedence over earlier ones, like finder.load().
+    @param transcripts <str>:
+        Transcriptomic FASTA file, i.e. the output of the build sub command
+    @param filename <str>:
+        Output bundle file, defaults to path(transcripts)
+    @param batch_size <int>:
+        Number of sequences translated at a time
+    @return count <int>:
+        Number of transcripts in the bundle
+    """
+    filename = filename or path(transcripts)
+    headers, sequences, proteins, translated = [], [], [], []
+    keys = {}
+    for sid, sequence in fasta(transcripts):
+        name = sid.split(' ')[0]
+        row = len(headers)
+        headers.append(sid.encode())
+        sequences.append(sequence.encode())
+        # Unversioned IDs are added last,
+        # a transcript ID without a version
+        # is not only a versioned ID
+        keys[name] = (row, 1)
+        keys[unversioned(name)] = (row, 0)
+
+    # Translate the wild-type sequences in batches,
+    # sequences with an invalid codon are translated
+    # by find to raise their InvalidCodonError
+    for start in range(0, len(sequences), batch_size):
+        batch = [sequence.decode() for sequence in sequences[start:start+batch_size]]
+        for protein in translate_many(batch, return_exceptions=True):
+            invalid = isinstance(protein, InvalidCodonError)
+            proteins.append(b'' if invalid else protein.encode())
+            translated.append(0 if invalid else 1)
+
+    names = sorted(keys)
+    width = max([len(name.encode()) for name in names] or [1])
+    sections = [
+        ('keys', np.array([name.encode() for name in names], dtype='S{}'.format(width))),
+        ('rows', np.array([keys[name][0] for name in names], dtype=np.int64)),
+        ('versioned', np.array([keys[name][1] for name in names], dtype=np.uint8)),
+        ('sequence_offsets', _offsets(sequences)),
+        ('protein_offsets', _offsets(proteins)),
+        ('header_offsets', _offsets(headers)),
+        ('translated', np.array(translated, dtype=np.uint8)),
+        ('sequences', np.frombuffer(b''.join(sequences), dtype=np.uint8)),
+        ('proteins', np.frombuffer(b''.join(proteins), dtype=np.uint8)),
+        ('headers', np.frombuffer(b''.join(headers), dtype=np.uint8))
+    ]
+
+    # Offset of each section from the start of
+    # the data, each section is 8-byte aligned
+    meta = {'layout': layout, 'count': len(headers), 'fasta': {'size': os.path.getsize(transcripts),
+        'mtime': os.path.getmtime(transcripts)}, 'sections': {}}
+    position = 0
+    for name, array in sections:
+        meta['sections'][name] = {'offset': position, 'dtype': array.dtype.str, 'length': len(array)}
+        position += array.nbytes + (-array.nbytes % 8)
+    encoded = json.dumps(meta, sort_keys=True).encode()
+    encoded += b' ' * (-(len(magic) + 8 + len(encoded)) % 8)
+
+    # Written to a temporary file first, so
+    # find never opens a partial bundle
+    temporary = filename + '.tmp'
+    with open(temporary, 'wb') as file:
+        file.write(magic)
+        file.write(np.array([len(encoded)], dtype='<u8').tobytes())
+        file.write(encoded)
+        for name, array in sections:
+            file.write(array.tobytes())
+            file.write(b'\0' * (-array.nbytes % 8))
+    os.replace(temporary, filename)
+
+    return len(headers)
+
+
+class Bundle(object):
+    """Reader of a reference bundle, see write(). Maps each transcript ID to its coding
+    DNA sequence, like IndexedFasta. Transcript IDs are looked up with a binary search
+    over the sorted keys of the memory-mapped bundle, so opening a bundle takes the same
+    time whatever the size of the transcriptome.
+
+    @attributes:
+        filename  -- path of the bundle
+        versioned -- whether transcript IDs with their version suffix can be looked up
+    """
+    def __init__(self, filename, transcripts=None, versioned=True):
+        """
+        @param filename <str>:
+            Bundle file
+        @param transcripts <str>:
+            Transcriptomic FASTA file of the bundle, to check whether the bundle is stale
+        @param versioned <bool>:
+            Look up transcript IDs with their version suffix, as well as without it
+        @raises StaleBundleError:
+            If the bundle is stale, corrupt or of another layout
+        """
+        self.filename = filename
+        self.versioned = versioned
+        if transcripts is not None and os.path.getmtime(filename) < os.path.getmtime(transcripts):
+            raise StaleBundleError(filename, 'is older than {}'.format(transcripts))
+        self._file = open(filename, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise StaleBundleError(filename, 'is empty')
+        try:
+            meta = self._meta()
+        except (ValueError, KeyError):
+            self.close()
+            raise StaleBundleError(filename, 'is corrupt')
+        if meta.get('layout') != layout:
+            self.close()
+            raise StaleBundleError(filename, 'has an unsupported layout, please re-run the build sub command')
+        if transcripts is not None and meta['fasta']['size'] != os.path.getsize(transcripts):
+            self.close()
+            raise StaleBundleError(filename, 'was built from another version of {}'.format(transcripts))
+        self.count = meta['count']
+        if versioned:
+            self._visible = None
+            self._length = len(self._keys)
+        else:
+            self._visible = self._versioned == 0
+            self._length = int(np.count_nonzero(self._visible))
+
+    def _meta(self):
+        """Private method: reads the metadata of the bundle and maps each section.
+        """
+        if self._map[:len(magic)] != magic:
+            raise ValueError('Not a reference bundle')
+        size = int(np.frombuffer(self._map, dtype='<u8', count=1, offset=len(magic))[0])
+        start = len(magic) + 8
+        meta = json.loads(self._map[start:start+size].decode())
+        start += size
+        for name, section in meta['sections'].items():
+            setattr(self, '_' + name, np.frombuffer(self._map, dtype=section['dtype'],
+                count=section['length'], offset=start + section['offset']))
+        return meta
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _row(self, key):
+        """Private method: row of a transcript ID, or -1 if it is not in the bundle.
+        """
+        encoded = key.encode()
+        if len(encoded) > self._keys.dtype.itemsize:
+            return -1
+        i = int(np.searchsorted(self._keys, encoded))
+        if i == len(self._keys) or self._keys[i] != encoded:
+            return -1
+        if not self.versioned and self._versioned[i]:
+            return -1
+        return int(self._rows[i])
+
+    def _slice(self, blob, offsets, row):
+        """Private method: decodes the bytes of a row of a blob section.
+        """
+        return blob[offsets[row]:offsets[row+1]].tobytes().decode()
+
+    def __contains__(self, key):
+        return self._row(key) >= 0
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def keys(self):
+        keys = self._keys if self._visible is None else self._keys[self._visible]
+        return [key.decode() for key in keys]
+
+    def __getitem__(self, key):
+        row = self._row(key)
+        if row < 0:
+            raise KeyError(key)
+        return self._slice(self._sequences, self._sequence_offsets, row)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def protein(self, key):
+        """Pre-translated wild-type amino acid sequence of a transcript.
+        @param key <str>:
+            Transcript ID
+        @return protein <str>:
+            Amino acid sequence, or None if the transcript is not in the bundle or
+            it was not pre-translated
+        """
+        row = self._row(key)
+        if row < 0 or not self._translated[row]:
+            return None
+        return self._slice(self._proteins, self._protein_offsets, row)
+
+    def header(self, key):
+        """FASTA header of a transcript.
+        @param key <str>:
+            Transcript ID
+        @return header <str>:
+            FASTA header, i.e. 'ENSMUST00000193812.1 gene_id=ENSMUSG00000102693.2 ...'
+        """
+        row = self._row(key)
+        if row < 0:
+            raise KeyError(key)
+        return self._slice(self._headers, self._header_offsets, row)
+
+    def annotation(self, key):
+        """Gene annotations of a transcript, listed as key=value pairs in its FASTA header.
+        @param key <str>:
+            Transcript ID
+        @return annotation <dict>:
+            Maps each annotation to its value, i.e. {'gene_name': 'Gm37180', ...}
+        """
+        return dict(field.split('=', 1) for field in self.header(key).split(' ')[1:] if '=' in field)
+
+    def close(self):
+        """Closes the memory map and the bundle file.
+        """
+        # Arrays over the memory map
+        # must be released first
+        for name in list(vars(self)):
+            if isinstance(getattr(self, name), np.ndarray):
+                delattr(self, name)
+        if getattr(self, '_map', None) is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+
+def main():
+    """Pseudo-main method for testing.
+    """
+    import sys, time
+    transcripts = sys.argv[1]
+    start = time.perf_counter()
+    count = write(transcripts)
+    print('Wrote {} transcripts to {} in {:.2f} s'.format(count, path(transcripts), time.perf_counter() - start))
+    start = time.perf_counter()
+    with Bundle(path(transcripts), transcripts) as bundle:
+        print('Opened {} keys in {:.1f} ms'.format(len(bundle), (time.perf_counter() - start) * 1e3))
+        for key in bundle.keys()[:3]:
+            print(bundle.header(key), len(bundle[key]), bundle.protein(key))
+
+
+if __name__ == '__main__':
+
+    main()
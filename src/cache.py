@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+from __future__ import print_function
+import hashlib, sqlite3
+
+"""
+ABOUT: Persistent cache of netMHCpan results for the predict sub command.
+
+Results are stored in a SQLite database and keyed by their content: the peptide, the allele,
+the peptide length and the netMHCpan version. Each cached result holds the columns of the
+netMHCpan output which only depend on its key, i.e. everything after the Pos, Peptide and ID
+columns. The cache also keeps the layout of the netMHCpan output of each allele, see layout().
+Least recently used results are evicted once the cache holds more than a maximum number of
+results.
+"""
+
+
+def version(executable):
+    """Identifies the version of a netMHCpan installation by the contents of its executable.
+    The netMHCpan executable is a wrapper script which records the path of its installation
+    and its version.
+    @param executable <str>:
+        Path to the netMHCpan executable
+    @return version <str>:
+        Hash of the netMHCpan executable
+    """
+    sha = hashlib.sha1()
+    with open(executable, 'rb') as fh:
+        for block in iter(lambda: fh.read(1 << 16), b''):
+            sha.update(block)
+
+    return 'sha1:' + sha.hexdigest()[:16]
+
+
+class NetMHCCache(object):
+    """Cache of netMHCpan results for a given netMHCpan version.
+
+    @attributes:
+        filename    -- SQLite database of the cache, created if it does not exist
+        version     -- netMHCpan version, see version()
+        max_entries -- maximum number of cached results, see evict()
+        hits        -- number of results found in the cache
+        misses      -- number of results not found in the cache
+    """
+    schema = """
+        CREATE TABLE IF NOT EXISTS results (
+            peptide TEXT NOT NULL,
+            allele TEXT NOT NULL,
+            length INTEGER NOT NULL,
+            version TEXT NOT NULL,
+            fields TEXT NOT NULL,
+            used INTEGER NOT NULL,
+            PRIMARY KEY (peptide, allele, length, version)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS results_used ON results (used);
+        CREATE TABLE IF NOT EXISTS layouts (
+            allele TEXT NOT NULL,
+            version TEXT NOT NULL,
+            header TEXT NOT NULL,
+            row_order TEXT NOT NULL,
+            order_known INTEGER NOT NULL,
+            id_width INTEGER,
+            name_width INTEGER NOT NULL,
+            pos_base INTEGER NOT NULL,
+            PRIMARY KEY (allele, version)
+        );
+        CREATE TABLE IF NOT EXISTS runs (
+            run INTEGER PRIMARY KEY AUTOINCREMENT
+        );
+    """
+    # Maximum number of variables
+    # in a SQLite statement
+    batch_size = 500
+
+    def __init__(self, filename, version, max_entries=10000000):
+        self.filename = filename
+        self.version = version
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.connection = sqlite3.connect(filename)
+        # Layouts of older caches do not record what
+        # was observed, they are learned again instead
+        columns = [row[1] for row in self.connection.execute("PRAGMA table_info(layouts)")]
+        if columns and 'name_width' not in columns:
+            with self.connection:
+                self.connection.execute("DROP TABLE layouts")
+        self.connection.executescript(self.schema)
+        # Results used in this run are more
+        # recently used than any earlier run
+        with self.connection:
+            self.run = self.connection.execute("INSERT INTO runs DEFAULT VALUES").lastrowid
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """Closes the connection to the database.
+        """
+        self.connection.close()
+
+    def get(self, allele, peptides):
+        """Looks up the results of peptides for an allele, and marks them as used.
+        @param allele <str>:
+            Allele name
+        @param peptides set(<str>):
+            Peptide sequences
+        @return results dict[<str>] = <str>:
+            Maps each cached peptide to its tab-delimited result columns
+        """
+        peptides = list(peptides)
+        results = {}
+        with self.connection:
+            for i in range(0, len(peptides), self.batch_size):
+                batch = peptides[i:i+self.batch_size]
+                marks = ",".join("?" * len(batch))
+                results.update(self.connection.execute(
+                    "SELECT peptide, fields FROM results WHERE allele = ? AND version = ? AND peptide IN ({})".format(marks),
+                    [allele, self.version] + batch))
+                self.connection.execute(
+                    "UPDATE results SET used = ? WHERE allele = ? AND version = ? AND peptide IN ({})".format(marks),
+                    [self.run, allele, self.version] + batch)
+        self.hits += len(results)
+        self.misses += len(peptides) - len(results)
+
+        return results
+
+    def put(self, allele, results):
+        """Adds the results of peptides for an allele.
+        @param allele <str>:
+            Allele name
+        @param results dict[<str>] = <str>:
+            Maps each peptide to its tab-delimited result columns
+        """
+        with self.connection:
+            self.connection.executemany("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)",
+                ((peptide, allele, len(peptide), self.version, fields, self.run) for peptide, fields in results.items()))
+
+    def layout(self, allele):
+        """Layout of the netMHCpan output of an allele, learned from earlier runs.
+        @param allele <str>:
+            Allele name
+        @return layout <dict>:
+            'header' lines, 'row_order' ('length' or 'sequence') and whether it was observed
+            ('order_known'), 'id_width' (None if no truncated name was observed), the longest
+            name observed untruncated ('name_width') and 'pos_base', or None if netMHCpan was
+            never run for the allele
+        """
+        row = self.connection.execute("SELECT header, row_order, order_known, id_width, name_width, pos_base FROM layouts WHERE allele = ? AND version = ?",
+            (allele, self.version)).fetchone()
+        if row is None:
+            return None
+
+        return {'header': row[0], 'row_order': row[1], 'order_known': bool(row[2]), 'id_width': row[3],
+            'name_width': row[4], 'pos_base': row[5]}
+
+    def set_layout(self, allele, layout):
+        """Records the layout of the netMHCpan output of an allele, see layout().
+        @param allele <str>:
+            Allele name
+        @param layout <dict>:
+            Layout of the netMHCpan output
+        """
+        with self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO layouts VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (allele, self.version, layout['header'], layout['row_order'], int(layout['order_known']),
+                layout['id_width'], layout['name_width'], layout['pos_base']))
+
+    def evict(self):
+        """Evicts the least recently used results once the cache holds more than
+        max_entries results.
+        @return evicted <int>:
+            Number of evicted results
+        """
+        entries = self.connection.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        if entries <= self.max_entries:
+            return 0
+        with self.connection:
+            self.connection.execute("""
+                DELETE FROM results WHERE (peptide, allele, length, version) IN (
+                    SELECT peptide, allele, length, version FROM results ORDER BY used LIMIT ?
+                )""", (entries - self.max_entries,))
+
+        return entries - self.max_entries
+
+    def hit_rate(self):
+        """Fraction of looked up results found in the cache.
+        @return hit_rate <float>:
+            Hit rate, 0 if nothing was looked up
+        """
+        total = self.hits + self.misses
+
+        return float(self.hits) / total if total else 0.0
+
+
+def main():
+    """Pseudo-main method for testing.
+    """
+    with NetMHCCache(":memory:", version="4.1b", max_entries=2) as cache:
+        cache.put("H-2-Kb", {"SIINFEKL": "SIINFEKL\tSIINFEKL\t0.9\t0.01\t0.8\t0.02\t0.9\t1"})
+        print(cache.get("H-2-Kb", {"SIINFEKL", "SIINFEKV"}))
+        cache.put("H-2-Kb", {"SIINFEKV": "x", "SIINFEKA": "y"})
+        print("evicted", cache.evict(), "hit rate", cache.hit_rate())
+
+
+if __name__ == '__main__':
+
+    main()
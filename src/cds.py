@@ -0,0 +1,271 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+from __future__ import print_function
+from utils import err
+from reader import IndexedFasta
+import multiprocessing
+
+"""
+ABOUT: Extracts the coding DNA sequence (CDS) of each transcript for the build sub command,
+without samtools or gffread.
+
+The GTF file is streamed once, and the CDS features of each transcript are grouped by their
+transcript_id. The spliced CDS sequence of each transcript is pulled from an indexed, memory-
+mapped genomic FASTA file (see IndexedFasta), so only the coding regions of the genome are
+ever read into memory. CDS sequences of transcripts on the minus strand are reverse
+complemented. Each chromosome is extracted by its own worker process, and the results are
+written in the order of the chromosomes in the GTF file.
+
+Only transcripts with a CDS are written, the stop codon is not added to the CDS, and the
+sequences are written 70 bases per line. The header of each sequence is the transcript ID
+followed by each of the attributes of the transcript, i.e.
+'>ENSMUST00000193812.1 gene_id=ENSMUSG00000102693.2 gene_type=TEC ...'.
+
+The output follows the conventions of `gffread -F -x`, but it is not byte-compatible with it:
+the attributes in each header and the order of the transcripts can differ from gffread, so a
+transcriptomic FASTA file built with gffread should not be replaced by one built here within
+the same project.
+"""
+
+# Bases per line of
+# the output FASTA file
+line_width = 70
+
+# Reverse complement of IUPAC nucleotide
+# codes, the case of each base is kept
+complements = str.maketrans(
+    'ACGTUNRYKMSWBDHVacgtunrykmswbdhv',
+    'TGCAANYRMKSWVHDBtgcaanyrmkswvhdb'
+)
+
+# Attributes of individual exons, they are
+# not attributes of the transcript itself
+exon_attributes = ('exon_number', 'exon_id')
+
+
+class Transcript(object):
+    """Coding regions of a transcript, see annotation().
+
+    @attributes:
+        name       -- transcript ID
+        strand     -- '+' or '-'
+        start      -- first position of the transcript (1-based)
+        end        -- last position of the transcript (1-based, inclusive)
+        attributes -- list of (key, value) attributes of the transcript
+        cds        -- list of (start, end) CDS segments (1-based, inclusive)
+    """
+    __slots__ = ('name', 'strand', 'start', 'end', 'attributes', 'cds', 'order')
+
+    def __init__(self, name, strand, start, end, attributes, order):
+        self.name = name
+        self.strand = strand
+        self.start = start
+        self.end = end
+        self.attributes = attributes
+        self.cds = []
+        self.order = order
+
+    def header(self):
+        """FASTA header of the CDS sequence of the transcript.
+        @return header <str>:
+            Transcript ID followed by each of its key=value attributes
+        """
+        return ' '.join([self.name] + ['{}={}'.format(key, value) for key, value in self.attributes])
+
+
+def attributes(field):
+    """Parses the attributes column of a GTF file.
+    @param field <str>:
+        Attributes column, i.e. 'gene_id "ENSMUSG00000102693.2"; transcript_id "ENSMUST00000193812.1";'
+    @return attributes list[(<str>, <str>)]:
+        Key and value of each attribute, in the order of the column
+    """
+    parsed = []
+    for attribute in field.strip().split(';'):
+        attribute = attribute.strip()
+        if not attribute:
+            continue
+        key, _, value = attribute.partition(' ')
+        parsed.append((key, value.strip().strip('"')))
+
+    return parsed
+
+
+def transcript_id(field):
+    """Grabs the transcript_id from the attributes column of a GTF file, without parsing
+    the other attributes, see attributes().
+    @param field <str>:
+        Attributes column
+    @return transcript_id <str>:
+        Value of the transcript_id attribute, or an empty string if it is missing
+    """
+    start = field.find('transcript_id ')
+    # Skips other attributes ending
+    # with transcript_id in their key
+    while start > 0 and field[start-1] not in ' ;':
+        start = field.find('transcript_id ', start + 1)
+    if start < 0:
+        return ''
+    end = field.find(';', start)
+    return field[start+len('transcript_id '):end if end >= 0 else len(field)].strip().strip('"')
+
+
+def annotation(gtf):
+    """Streams a GTF file and groups the CDS features of each transcript.
+    @param gtf <str>:
+        GTF file of the reference genome
+    @return chromosomes list[(<str>, list[<Transcript>])]:
+        Each chromosome, in the order they are first listed in the GTF file, and its
+        transcripts with a CDS, sorted by their start and end position
+    """
+    chromosomes = {}
+    transcripts = {}
+    with open(gtf, 'r') as file:
+        for line in file:
+            if line.startswith('#'):
+                continue
+            fields = line.rstrip('\n').split('\t', 8)
+            if len(fields) < 9 or fields[2] not in ('transcript', 'exon', 'CDS'):
+                continue
+            chrom, feature, start, end, strand = fields[0], fields[2], int(fields[3]), int(fields[4]), fields[6]
+            # Only the transcript_id of most features
+            # is needed, the other attributes are only
+            # parsed once for each transcript
+            name = transcript_id(fields[8])
+            if not name:
+                continue
+            transcript = transcripts.get(name)
+            if transcript is None or feature == 'transcript':
+                attrs = attributes(fields[8])
+            if transcript is None:
+                # Attributes of a transcript are listed on its
+                # transcript feature, or on its first feature
+                transcript = Transcript(name, strand, start, end,
+                    [(key, value) for key, value in attrs if key != 'transcript_id'
+                        and (feature == 'transcript' or key not in exon_attributes)], len(transcripts))
+                transcripts[name] = transcript
+                chromosomes.setdefault(chrom, []).append(transcript)
+            elif feature == 'transcript':
+                transcript.attributes = [(key, value) for key, value in attrs if key != 'transcript_id']
+            transcript.start = min(transcript.start, start)
+            transcript.end = max(transcript.end, end)
+            if feature == 'CDS':
+                transcript.cds.append((start, end))
+
+    # Chromosomes in the order they are first
+    # seen, then transcripts by position, which
+    # is not necessarily the order of gffread
+    return [(chrom, sorted([transcript for transcript in chrom_transcripts if transcript.cds],
+        key=lambda transcript: (transcript.start, transcript.end, transcript.order)))
+        for chrom, chrom_transcripts in chromosomes.items()]
+
+
+def reverse_complement(sequence):
+    """Reverse complements a DNA sequence.
+    @param sequence <str>:
+        DNA sequence
+    @return reverse_complement <str>:
+        Reverse complement of the sequence, i.e. 'ATGc' -> 'gCAT'
+    """
+    return sequence.translate(complements)[::-1]
+
+
+def extract(genome, chrom, transcripts):
+    """Extracts the spliced CDS sequence of each transcript of a chromosome.
+    @param genome <str>:
+        Genomic FASTA file, it should already be indexed, see IndexedFasta
+    @param chrom <str>:
+        Name of the chromosome in the genomic FASTA file
+    @param transcripts list[<Transcript>]:
+        Transcripts of the chromosome
+    @return records <str>, written <int>, warnings list[<str>]:
+        FASTA records of the CDS sequences, number of records, and warning messages
+    """
+    warnings = []
+    records = []
+    written = 0
+    with IndexedFasta(genome) as reference:
+        if chrom not in reference:
+            warnings.append("WARNING: Skipping over {} transcripts on {}, it is not in the genomic FASTA file!".format(len(transcripts), chrom))
+            return '', 0, warnings
+        length = reference.length(chrom)
+        for transcript in transcripts:
+            segments = sorted(transcript.cds)
+            if segments[-1][1] > length:
+                warnings.append("WARNING: Skipping over transcript {}, its CDS is outside of {}!".format(transcript.name, chrom))
+                continue
+            # CDS segments are 1-based and inclusive,
+            # fetched regions are 0-based half-open
+            sequence = ''.join(reference.fetch(chrom, start - 1, end) for start, end in segments)
+            if transcript.strand == '-':
+                sequence = reverse_complement(sequence)
+            records.append('>' + transcript.header() + '\n')
+            records.extend(sequence[i:i+line_width] + '\n' for i in range(0, len(sequence), line_width))
+            written += 1
+
+    return ''.join(records), written, warnings
+
+
+def _extract(job):
+    """Private function: unpacks the arguments of extract() for Pool.imap.
+    """
+    return extract(*job)
+
+
+def build(genome, gtf, output, threads=1):
+    """Writes the CDS sequence of each transcript of a GTF file to a FASTA file, in the
+    layout described above, which is not byte-compatible with `gffread -F -x`.
+    @param genome <str>:
+        Genomic FASTA file
+    @param gtf <str>:
+        GTF file of the reference genome
+    @param output <str>:
+        Output transcriptomic FASTA file, i.e. 'transcripts.fa'
+    @param threads <int>:
+        Number of chromosomes extracted in parallel
+    @return written <int>:
+        Number of transcripts written to the output file
+    """
+    # Index the genomic FASTA file before
+    # starting any worker processes
+    IndexedFasta(genome).close()
+    chromosomes = annotation(gtf)
+    jobs = [(genome, chrom, transcripts) for chrom, transcripts in chromosomes]
+
+    written = 0
+    pool = None
+    imap = map
+    if threads > 1:
+        pool = multiprocessing.Pool(threads)
+        imap = pool.imap
+    try:
+        with open(output, 'w') as file:
+            # Chromosomes are written in the
+            # order of the GTF file as each
+            # of them completes
+            for records, n, warnings in imap(_extract, jobs):
+                for warning in warnings:
+                    err(warning)
+                file.write(records)
+                written += n
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+
+    return written
+
+
+def main():
+    """Pseudo-main method for testing.
+    """
+    import sys
+    genome, gtf = sys.argv[1], sys.argv[2]
+    output = sys.argv[3] if len(sys.argv) > 3 else 'transcripts.fa'
+    written = build(genome, gtf, output, threads=int(sys.argv[4]) if len(sys.argv) > 4 else 1)
+    print('Wrote {} transcripts to {}'.format(written, output))
+
+
+if __name__ == '__main__':
+
+    main()
@@ -0,0 +1,526 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+from __future__ import print_function
+from pandas.api.types import union_categoricals
+import numpy as np
+import pandas as pd
+import io, json, os, sqlite3
+
+"""
+ABOUT: Computes the per-variant (VIDA) statistics of a cohort of MAF files for the prepare sub command.
+
+All statistics are computed in a single grouped aggregation over the merged MAF files,
+rather than re-scanning the merged MAF files for each variant.
+
+MAF files are read in two passes, see ingest() and extract(). The first pass only reads the
+columns needed to build each VIDA and to filter variants, with compact categorical dtypes.
+The second pass reads all the columns of the rows of the selected variants, one MAF file at
+a time, so the full contents of each MAF file never need to be held in memory at once.
+Both passes can be run on a pool of worker processes, one MAF file per task.
+
+The statistics of a cohort can also be kept in an aggregate state file, see State. New
+MAF files are folded into the state with the byte offset of each of their rows, and the
+filters can be re-applied to the state, so only the rows of the selected variants of the
+MAF files already in the state are read again.
+"""
+
+# Columns required to
+# build each VIDA
+required = [
+    "Hugo_Symbol",
+    "Start_Position",
+    "End_Position",
+    "Reference_Allele",
+    "Tumor_Seq_Allele1",
+    "Tumor_Seq_Allele2"
+]
+
+# Columns used to filter
+# each VIDA
+filters = [
+    "t_alt_count",
+    "t_depth",
+    "IMPACT",
+    "FILTER"
+]
+
+# Low cardinality text columns,
+# parsed as categoricals
+categoricals = {
+    "Hugo_Symbol": "category",
+    "IMPACT": "category",
+    "FILTER": "category"
+}
+
+# IMPACT ratings counted
+# towards the IMPACT filter
+impacts = ["HIGH", "MODERATE"]
+
+
+class MissingColumnError(ValueError):
+    """Raised when a MAF file is missing a column required to build each VIDA.
+    """
+    pass
+
+
+class ModifiedFileError(ValueError):
+    """Raised when a MAF file was modified after it was folded into a State.
+    """
+    pass
+
+
+def sample(filename):
+    """Creates the file ID of a MAF file, used to track the input file of each row.
+    @param filename <str>:
+        MAF file
+    @return file_id <str>:
+        File ID of the MAF file
+    """
+    return filename.split(".")[0]
+
+
+def vida(df):
+    """Builds the variant ID (VIDA) of each row of a MAF file.
+    Example: [Hugo_Symbol]_[Start_Position]_[End_Position]_[Reference_Allele][Tumor_Seq_Allele1][Tumor_Seq_Allele2]
+    @param df <pandas.DataFrame>:
+        MAF file with the required columns
+    @return vida <pandas.Series>:
+        VIDA of each row, rows with a missing Hugo symbol or allele have a missing VIDA
+    """
+    return df["Hugo_Symbol"].astype(object) + "_" + df["Start_Position"].astype(str) + "_" + \
+        df["End_Position"].astype(str) + "_" + df["Reference_Allele"] + df["Tumor_Seq_Allele1"] + \
+        df["Tumor_Seq_Allele2"]
+
+
+def ingest(filename):
+    """Reads the columns of a MAF file needed to filter each variant, first pass.
+    Positions and alleles are parsed exactly as when reading the whole MAF file, so
+    each VIDA is identical; they are only kept as the categorical VIDA.
+    @param filename <str>:
+        MAF file, its first line is skipped over
+    @return df <pandas.DataFrame>:
+        'VIDA', 'file_id', 'av_VAF', 'IMPACT' and 'FILTER' of each row
+    """
+    columns = set(required + filters)
+    df = pd.read_csv(filename, delimiter="\t", skiprows=1, usecols=lambda c: c in columns, dtype=categoricals)
+
+    return _first_pass(df, filename)
+
+
+def _first_pass(df, filename):
+    """Private function: builds the first pass of a MAF file from its rows, see ingest().
+    """
+    for col in required:
+        if col not in df:
+            raise MissingColumnError(col)
+
+    file_id = sample(filename)
+    return pd.DataFrame({
+        "VIDA": vida(df).astype("category"),
+        "file_id": pd.Categorical([file_id] * len(df)),
+        # Calculate average VAF: t_alt_count/t_depth
+        "av_VAF": df["t_alt_count"] / df["t_depth"],
+        "IMPACT": df["IMPACT"],
+        "FILTER": df["FILTER"]
+    })
+
+
+def concat(frames):
+    """Merges the first pass of each MAF file, see ingest(). Categorical
+    columns are merged as categoricals.
+    @param frames list[<pandas.DataFrame>]:
+        First pass of each MAF file, in the order of the input files
+    @return df_merged <pandas.DataFrame>:
+        Merged MAF files
+    """
+    df_merged = {}
+    for col in frames[0].columns:
+        values = [df[col] for df in frames]
+        if all(isinstance(v.dtype, pd.CategoricalDtype) for v in values):
+            df_merged[col] = pd.Series(union_categoricals(values, ignore_order=True))
+        else:
+            df_merged[col] = pd.concat(values, ignore_index=True)
+
+    return pd.DataFrame(df_merged)
+
+
+def fold(filename):
+    """Reads a MAF file to fold it into a State: its first pass, and the layout of its
+    rows, see ingest() and rows(). The MAF file is parsed once, with all its columns,
+    so the rows of the selected VIDAs can later be parsed with the column types of the
+    whole MAF file, see State.extract().
+    @param filename <str>:
+        MAF file, its first line is skipped over
+    @return df <pandas.DataFrame>, layout <tuple>:
+        First pass of the MAF file, and its header, column types and the byte offset
+        of each row, or None if the lines of the MAF file are not one line per row 
+        (i.e. quoted line breaks)
+    """
+    df = pd.read_csv(filename, delimiter="\t", skiprows=1)
+    header, offsets = rows(filename)
+    layout = None
+    if len(offsets) == len(df):
+        layout = (header, dict((column, str(dtype)) for column, dtype in df.dtypes.items()), offsets)
+
+    return _first_pass(df, filename), layout
+
+
+def rows(filename):
+    """Finds the line of each row of a MAF file, without parsing it.
+    @param filename <str>:
+        MAF file, its first line is skipped over
+    @return header <str>, offsets list[<int>]:
+        Header line, and the byte offset of the line of each row
+    """
+    offsets = []
+    with open(filename, "rb") as fh:
+        fh.readline()
+        header = fh.readline()
+        offset = fh.tell()
+        for line in iter(fh.readline, b""):
+            # Blank lines are
+            # skipped over
+            if line.strip(b"\r\n"):
+                offsets.append(offset)
+            offset += len(line)
+
+    return header.decode(), offsets
+
+
+def parse(header, dtypes, lines):
+    """Parses the lines of some of the rows of a MAF file, see rows().
+    @param header <str>:
+        Header line of the MAF file
+    @param dtypes <dict>:
+        Type of each column of the whole MAF file
+    @param lines list[<str>]:
+        Lines of the rows
+    @return df <pandas.DataFrame>:
+        Rows, typed like the rows of the whole MAF file
+    """
+    return pd.read_csv(io.StringIO(header + "".join(lines)), delimiter="\t", dtype=dtypes)
+
+
+def _annotate(df, file_id, vidas=None):
+    """Private function: adds the 'file_id', 'VIDA' and 'av_VAF' columns to the rows
+    of a MAF file, and only keeps the rows of the selected VIDAs, see extract().
+    """
+    df = df.assign(file_id=file_id)
+    df["VIDA"] = vida(df)
+    df["av_VAF"] = df["t_alt_count"] / df["t_depth"]
+    if vidas is not None:
+        df = df[df["VIDA"].isin(vidas)]
+
+    return df
+
+
+def extract(filename, rows=None, vidas=None, file_id=None):
+    """Reads all the columns of the selected rows of a MAF file, second pass.
+    @param filename <str>:
+        MAF file, its first line is skipped over
+    @param rows <numpy.ndarray>:
+        Positions of the selected rows, see ingest()
+    @param vidas set(<str>):
+        VIDAs of the selected rows, used when the positions of the rows are not known
+    @param file_id <str>:
+        File ID of the MAF file, defaults to sample(filename)
+    @return df <pandas.DataFrame>:
+        Selected rows with their 'file_id', 'VIDA' and 'av_VAF'
+    """
+    df = pd.read_csv(filename, delimiter="\t", skiprows=1)
+    if rows is not None:
+        df = df.iloc[rows]
+
+    return _annotate(df, sample(filename) if file_id is None else file_id, vidas)
+
+
+def aggregate(df_merged):
+    """Computes the statistics of each variant in a cohort. Rows with a missing
+    VIDA are not counted, as in value_counts(dropna=True).
+    @param df_merged <pandas.DataFrame>:
+        Merged MAF files with 'VIDA', 'file_id', 'av_VAF', 'IMPACT' and 'FILTER' columns
+    @return stats <pandas.DataFrame>:
+        Per-VIDA statistics indexed by VIDA, in order of first occurrence:
+         • VIDA_Counts: number of rows of the variant
+         • Sample_Counts: number of input files with the variant
+         • av_VAF: average VAF of the variant
+         • IMPACT_Counts: number of rows with a "HIGH" or "MODERATE" IMPACT rating
+         • PASS_Counts: number of rows with a "PASS" FILTER rating
+    """
+    df = pd.DataFrame({
+        "VIDA": df_merged["VIDA"].values,
+        "file_id": df_merged["file_id"].values,
+        "av_VAF": df_merged["av_VAF"].values,
+        "IMPACT": df_merged["IMPACT"].isin(impacts).values,
+        "PASS": (df_merged["FILTER"] == "PASS").values
+    })
+
+    grouped = df.groupby("VIDA", sort=False, observed=True)
+    stats = pd.DataFrame({
+        "VIDA_Counts": grouped.size(),
+        "Sample_Counts": grouped["file_id"].nunique(),
+        "av_VAF": grouped["av_VAF"].mean(),
+        "IMPACT_Counts": grouped["IMPACT"].sum(),
+        "PASS_Counts": grouped["PASS"].sum()
+    })
+    stats.index.name = "VIDA"
+
+    return stats
+
+
+def select(stats, df_merged, min_count, vaf, impact, passed):
+    """Selects the variants which pass each filter. Average VAFs within rounding
+    error of the VAF filter are re-computed with Series.mean() over the variant's
+    rows, in the order of the merged MAF files, so variants on the boundary of the
+    VAF filter are selected exactly as with a per-variant Series.mean().
+    @param stats <pandas.DataFrame>:
+        Per-VIDA statistics, see aggregate() or State.stats()
+    @param df_merged <pandas.DataFrame>:
+        Merged MAF files the statistics were computed from, or None to use the
+        average VAFs of the statistics as is
+    @param min_count <int>:
+        Minimum number of rows of a variant, i.e. the number of input files
+    @param vaf <float>:
+        Minimum average VAF of a variant
+    @param impact <int>:
+        Minimum number of rows with a "HIGH" or "MODERATE" IMPACT rating
+    @param passed <int>:
+        Minimum number of rows with a "PASS" FILTER rating
+    @return selected <pandas.Series>:
+        Boolean mask of the variants passing each filter, indexed by VIDA
+    """
+    counted = stats["VIDA_Counts"] >= min_count
+    av_vaf = stats["av_VAF"]
+
+    # Grouped means can differ from
+    # Series.mean() in the last few bits
+    boundary = counted & np.isclose(av_vaf, vaf, rtol=1e-9, atol=1e-12)
+    if df_merged is not None and boundary.any():
+        av_vaf = av_vaf.copy()
+        rows = df_merged["VIDA"].isin(stats.index[boundary]).values
+        values = df_merged["av_VAF"][rows]
+        for key, index in values.groupby(df_merged["VIDA"].values[rows], sort=False, observed=True).indices.items():
+            av_vaf[key] = values.iloc[index].mean()
+
+    return counted & (av_vaf >= vaf) & (stats["IMPACT_Counts"] >= impact) & (stats["PASS_Counts"] >= passed)
+
+
+class State(object):
+    """Aggregate state of a cohort of MAF files, stored in a SQLite database. For each
+    VIDA, the state keeps its number of rows, its number of input files, the sum and
+    the number of its VAFs, and its IMPACT and PASS counts. The state also keeps the
+    MAF files folded into it, in the order they were added.
+
+    Folding a MAF file into the state only reads that file, see add(). The average
+    VAF of each VIDA is computed from its VAF sum, so it can differ from the average
+    VAF of a full re-read of the cohort in the last few bits. The state also keeps the
+    byte offset of each row of a MAF file with a VIDA, indexed by VIDA, so only the
+    rows of the selected VIDAs are read from each MAF file in the cohort, see extract().
+    A VIDA is selected by its number of rows, so any VIDA can still be selected once
+    more MAF files are added, and the offsets of every VIDA are kept. The MAF files
+    must be kept, unchanged, next to the state. MAF files which were added without
+    their offsets are read again.
+
+    @attributes:
+        filename   -- SQLite database of the state, created if it does not exist
+        connection -- sqlite3 connection to the database
+    """
+    schema = """
+        CREATE TABLE IF NOT EXISTS sources (
+            filename TEXT PRIMARY KEY,
+            file_id TEXT NOT NULL,
+            rows INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS vidas (
+            vida TEXT PRIMARY KEY,
+            rows INTEGER NOT NULL,
+            samples INTEGER NOT NULL,
+            vaf_sum REAL,
+            vaf_counts INTEGER NOT NULL,
+            impact INTEGER NOT NULL,
+            pass INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS headers (
+            source INTEGER PRIMARY KEY,
+            header TEXT NOT NULL,
+            dtypes TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS offsets (
+            source INTEGER NOT NULL,
+            row INTEGER NOT NULL,
+            vida INTEGER NOT NULL,
+            offset INTEGER NOT NULL,
+            PRIMARY KEY (source, row)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS offsets_vida ON offsets (vida, source);
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.connection = sqlite3.connect(filename)
+        self.connection.executescript(self.schema)
+
+    def __contains__(self, filename):
+        return self.connection.execute("SELECT 1 FROM sources WHERE filename = ?",
+            (os.path.abspath(filename),)).fetchone() is not None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """Closes the connection to the database.
+        """
+        self.connection.close()
+
+    def sources(self):
+        """MAF files folded into the state, in the order they were added.
+        @return sources list[<tuple>]:
+            Absolute path and file ID of each MAF file
+        """
+        return self.connection.execute("SELECT filename, file_id FROM sources ORDER BY rowid").fetchall()
+
+    def add(self, filename, df, layout=None):
+        """Folds a MAF file into the state. Each MAF file can only be added once.
+        @param filename <str>:
+            MAF file
+        @param df <pandas.DataFrame>:
+            First pass of the MAF file, see ingest()
+        @param layout <tuple>:
+            Header, column types and row offsets of the MAF file, see fold(), or
+            None to read the whole MAF file again in extract()
+        """
+        df = pd.DataFrame({
+            "VIDA": df["VIDA"].values,
+            "av_VAF": df["av_VAF"].values,
+            "IMPACT": df["IMPACT"].isin(impacts).values,
+            "PASS": (df["FILTER"] == "PASS").values
+        })
+        grouped = df.groupby("VIDA", sort=False, observed=True)
+        rows = zip(
+            [str(v) for v in grouped.size().index],
+            grouped.size().tolist(),
+            grouped["av_VAF"].sum().tolist(),
+            grouped["av_VAF"].count().tolist(),
+            grouped["IMPACT"].sum().tolist(),
+            grouped["PASS"].sum().tolist()
+        )
+        with self.connection:
+            source = self.connection.execute("INSERT INTO sources VALUES (?, ?, ?)",
+                (os.path.abspath(filename), sample(filename), len(df))).lastrowid
+            self.connection.executemany("""
+                INSERT INTO vidas VALUES (?, ?, 1, ?, ?, ?, ?)
+                ON CONFLICT (vida) DO UPDATE SET
+                    rows = rows + excluded.rows,
+                    samples = samples + 1,
+                    vaf_sum = vaf_sum + excluded.vaf_sum,
+                    vaf_counts = vaf_counts + excluded.vaf_counts,
+                    impact = impact + excluded.impact,
+                    pass = pass + excluded.pass
+            """, rows)
+            if layout is not None:
+                header, dtypes, offsets = layout
+                self.connection.execute("INSERT INTO headers VALUES (?, ?, ?)",
+                    (source, header, json.dumps(dtypes)))
+                # Rows without a VIDA are never
+                # selected, VIDAs are referenced
+                # by their row in the vidas table
+                self.connection.executemany("INSERT INTO offsets SELECT ?, ?, rowid, ? FROM vidas WHERE vida = ?",
+                    ((source, i, offset, v) for i, (v, offset) in enumerate(zip(df["VIDA"], offsets))
+                        if isinstance(v, str)))
+
+    def extract(self, filename, vidas, file_id):
+        """Reads the rows of the selected VIDAs of a MAF file at their offsets kept in
+        the state, like extract() reads them from the whole MAF file.
+        @param filename <str>:
+            MAF file in the state, see sources()
+        @param vidas set(<str>):
+            Selected VIDAs
+        @param file_id <str>:
+            File ID of the MAF file
+        @return df <pandas.DataFrame>:
+            Selected rows with their 'file_id', 'VIDA' and 'av_VAF', or None if the
+            offsets of the MAF file are not kept in the state
+        @raises ModifiedFileError:
+            If the rows at the offsets are not the rows of the VIDAs kept in the state
+        """
+        layout = self.connection.execute("""
+            SELECT source, header, dtypes FROM headers JOIN sources ON source = sources.rowid 
+            WHERE filename = ?""", (filename,)).fetchone()
+        if layout is None:
+            return None
+        if getattr(self, "_selected", None) is not vidas:
+            # Selected VIDAs are joined with the
+            # offsets of each MAF file in the state
+            self.connection.execute("CREATE TEMP TABLE IF NOT EXISTS selected (vida TEXT PRIMARY KEY)")
+            with self.connection:
+                self.connection.execute("DELETE FROM selected")
+                self.connection.executemany("INSERT INTO selected VALUES (?)", ((v,) for v in vidas))
+            self._selected = vidas
+        selected = self.connection.execute("""
+            SELECT offset, vidas.vida FROM offsets JOIN vidas ON offsets.vida = vidas.rowid
+            JOIN selected ON vidas.vida = selected.vida
+            WHERE source = ? ORDER BY row""", (layout[0],)).fetchall()
+        lines = []
+        with open(filename, "rb") as fh:
+            for offset, _ in selected:
+                fh.seek(offset)
+                line = fh.readline().decode()
+                lines.append(line if line.endswith("\n") else line + "\n")
+        # Lines at the offsets of a modified
+        # MAF file are not its earlier rows
+        try:
+            df = _annotate(parse(layout[1], json.loads(layout[2]), lines), file_id)
+        except ValueError:
+            raise ModifiedFileError(filename)
+        if df["VIDA"].tolist() != [v for _, v in selected]:
+            raise ModifiedFileError(filename)
+
+        return df
+
+    def stats(self):
+        """Computes the statistics of each variant in the state.
+        @return stats <pandas.DataFrame>:
+            Per-VIDA statistics indexed by VIDA, see aggregate()
+        """
+        df = pd.read_sql_query("SELECT * FROM vidas ORDER BY rowid", self.connection)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            # Variants without any VAFs
+            # have a missing average VAF
+            av_vaf = df["vaf_sum"].values / df["vaf_counts"].values
+        stats = pd.DataFrame({
+            "VIDA_Counts": df["rows"].values,
+            "Sample_Counts": df["samples"].values,
+            "av_VAF": av_vaf,
+            "IMPACT_Counts": df["impact"].values,
+            "PASS_Counts": df["pass"].values
+        }, index=pd.Index(df["vida"], name="VIDA"))
+
+        return stats
+
+
+def main():
+    """Pseudo-main method for testing.
+    """
+    df_merged = pd.DataFrame({
+        "VIDA": ["Kras_100_100_GGA", "Kras_100_100_GGA", "Trp53_7_9_AAC", "Trp53_7_9_AAC", np.nan],
+        "file_id": ["s1", "s2", "s1", "s2", "s2"],
+        "av_VAF": [0.2, 0.2, 0.1, np.nan, 0.5],
+        "IMPACT": ["HIGH", "MODERATE", "LOW", "HIGH", "HIGH"],
+        "FILTER": ["PASS", "PASS", "PASS", "germline", "PASS"]
+    })
+    stats = aggregate(df_merged)
+    print(stats)
+    print(select(stats, df_merged, min_count=2, vaf=0.2, impact=2, passed=2))
+
+    with State(":memory:") as state:
+        state.add("s1.maf", df_merged[df_merged["file_id"] == "s1"])
+        state.add("s2.maf", df_merged[df_merged["file_id"] == "s2"])
+        print(state.stats())
+
+
+if __name__ == '__main__':
+
+    main()
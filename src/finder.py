@@ -0,0 +1,318 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+from __future__ import print_function
+from utils import err
+from mutator import (mutate,
+    NonCodingVariantError,
+    UnsupportedVariantTypeError,
+    VariantParsingError,
+    NonMatchingReferenceBases)
+from aminoacid import (translate,
+    convert_aa_cooridate,
+    truncate,
+    translate_window,
+    TranslationCache,
+    InvalidCodonError)
+from reader import (fasta,
+    IndexedFasta)
+import bundle
+import metrics
+import io, os, sys
+
+"""
+ABOUT: Determines the consequence of each variant on a protein product for the find sub command.
+
+Variants can be processed serially with a Finder, or in parallel by a pool of worker processes
+(see initializer() and run()). Each worker process opens its own read-only, memory-mapped copy
+of the transcriptome, so transcript sequences are never pickled between processes. Workers
+return the output rows and the warning messages of each batch of variants, which are then
+written in the same order as the variants in the input file, so the output of a parallel run
+is identical to a serial run.
+"""
+
+# Columns of the output file
+columns = [
+    "Variant_Classification",
+    "Hugo_Symbol",
+    "Transcript_ID",
+    "HGVSc",
+    "Variant_Start_Position",
+    "WT_Transcript_Sequence",
+    "Mutated_Transcript_Sequence",
+    "WT_AA_Sequence",
+    "Mutated_AA_Sequence",
+    "WT_Subset_AA_Sequence",
+    "Mutated_Subset_AA_Sequence"
+]
+
+
+def transcript_id(sid):
+    """Grabs the transcipt id from a FASTA sequence identifier and removes the version suffix.
+    @param sid <str>:
+        Sequence identifier of a transcript, i.e. 'ENSMUST00000193812.1 gene=Gm37180'
+    @return transcript_id <str>:
+        Transcript id without its version suffix, i.e. 'ENSMUST00000193812'
+    """
+    return sid.split(' ')[0].split('.')[0]
+
+
+def index(transcripts):
+    """Indexes a transcriptomic FASTA file for random access, see IndexedFasta. 
+    @param transcripts <str>:
+        Transcriptomic FASTA file
+    @return indexed <bool>:
+        True if the FASTA file is indexed, False if it cannot be indexed
+    """
+    transcriptome = load_bundle(transcripts)
+    if transcriptome is not None:
+        # Reference bundle is
+        # read instead
+        transcriptome.close()
+        return True
+    try:
+        IndexedFasta(transcripts).close()
+    except ValueError as e:
+        err('WARNING: {} Loading all transcripts into memory instead.'.format(e))
+        return False
+
+    return True
+
+
+def load_bundle(transcripts, quiet=False):
+    """Opens the reference bundle of a transcriptomic FASTA file, see bundle.Bundle.
+    @param transcripts <str>:
+        Transcriptomic FASTA file
+    @param quiet <bool>:
+        Do not warn about stale bundles
+    @return transcriptome <Bundle>:
+        Maps each transcript ID (without its version suffix) to its sequence, or None
+        if the FASTA file does not have a bundle or its bundle is stale
+    """
+    filename = bundle.path(transcripts)
+    if not os.path.exists(filename):
+        return None
+    try:
+        return bundle.Bundle(filename, transcripts, versioned=False)
+    except bundle.StaleBundleError as e:
+        if not quiet:
+            err('WARNING: {} Reading {} instead.'.format(e, transcripts))
+
+    return None
+
+
+def load(transcripts, quiet=False):
+    """Maps each transcript ID to its coding DNA sequence or CDS sequence. The build
+    command can be used to generate this reference file. Sequences are read on demand
+    from the reference bundle of the FASTA file, written by the build command, or from 
+    an indexed, memory-mapped FASTA file, so only the transcripts with a recorded
+    variant are loaded. FASTA files which cannot be indexed are loaded into a dictionary
+    instead.
+    @param transcripts <str>:
+        Transcriptomic FASTA file
+    @param quiet <bool>:
+        Do not warn about stale bundles or FASTA files which cannot be indexed
+    @return transcriptome <Bundle|IndexedFasta|dict>:
+        Maps each transcript ID (without its version suffix) to its sequence
+    """
+    transcriptome = load_bundle(transcripts, quiet)
+    if transcriptome is not None:
+        return transcriptome
+    try:
+        return IndexedFasta(transcripts, key=transcript_id)
+    except ValueError as e:
+        if not quiet:
+            err('WARNING: {} Loading all transcripts into memory instead.'.format(e))
+    transcriptome = {}
+    for sid, sequence in fasta(transcripts):
+        transcriptome[transcript_id(sid)] = sequence
+
+    return transcriptome
+
+
+class Finder(object):
+    """Obtains the mutated amino acid sequence for each variant. Warnings for variants
+    which are skipped over are printed to standard error.
+
+    @attributes:
+        transcriptome -- maps each transcript ID to its coding DNA sequence, see load()
+        translations  -- cache of wild-type translations, see TranslationCache
+        subset        -- truncates non-frame shift mutations +/- N amino acids
+        windowed      -- only translate mutated sequences within the subset window
+    """
+    def __init__(self, transcriptome, cache_size=1024, subset=30, windowed=False):
+        self.transcriptome = transcriptome
+        # Cache of wild-type translations, each
+        # transcript's amino acid sequence and its
+        # truncated windows are only computed once
+        # even if it has many recorded variants
+        # Wild-type amino acid sequences of a 
+        # reference bundle are pre-translated
+        self.translations = TranslationCache(capacity=cache_size, 
+            proteins=getattr(transcriptome, 'protein', None))
+        self.subset = int(subset)
+        self.windowed = windowed
+
+    def find(self, transcript, variant_class, hgvs, hugo, *args):
+        """Determines the consequence of a variant on its protein product.
+        @param transcript <str>:
+            Transcript ID of the variant
+        @param variant_class <str>:
+            Variant classification, i.e. Frame_Shift_Del or Missense_Mutation
+        @param hgvs <str>:
+            HGVS term describing the mutation
+        @param hugo <str>:
+            Hugo symbol of the variant's gene
+        @return row <str>:
+            Tab-delimited output row, or None if the variant is skipped over
+        """
+        # Variant class is used to determine the size
+        # of the downstream portion of the subset AA
+        # sequence from the variant start site. Frame
+        # shift mutations will report until the end of
+        # the coding AA sequence or until a stop codon
+        # is reached.
+        variant_class = str(variant_class)
+        transcript = str(transcript)
+        hgvs = str(hgvs)
+        hugo = str(hugo)
+        subset = self.subset
+
+        metrics.count('variants.read')
+        if not ((hgvs and hgvs != 'nan') and (transcript and transcript != 'nan') and (variant_class and variant_class != 'nan')):
+            metrics.count('variants.skipped.MissingFields')
+            return None
+
+        try:
+            sequence = self.transcriptome[transcript]
+        except KeyError:
+            # Skip over un-annotated transcript.
+            # Recorded transcript is not annotated
+            # in the user provided reference file,
+            # which may indicate that the user did
+            # not provide the same reference files
+            # to call variants and to generate the
+            # MAF file in the build sub command
+            err("{} {}".format("WARNING: Transcript {} not found in provided transcripts FASTA file!".format(transcript),
+            "Please verify the correct reference file is provided!"))
+            metrics.count('variants.skipped.TranscriptNotFound')
+            return None
+        try:
+            # Mutate the coding DNA sequence based on
+            # the recorded HGVS representation of the
+            # mutation, and get the mutation start site.
+            # HGVS terms representing mutations in non-exonic
+            # regions will return a NonCodingVariantError.
+            # HGVS terms without a parser or HGVS terms which
+            # are not supported will return a
+            # UnsupportedVariantTypeError.
+            # HGVS terms which cannot be parsed during term
+            # tokenization will return a VariantParsingError.
+            # HGVS terms containing the variants reference
+            # sequence will be checked against the transcripts
+            # sequence. If the transcript sequence does not
+            # match the HGVS term sequence then a
+            # NonMatchingReferenceBases error is raised.
+            with metrics.stage('mutate'):
+                mutated_dna, variant_position = mutate(sequence, hgvs)
+            with metrics.stage('translate'):
+                # Translate the wt and mutated coding DNA sequence into
+                # an amino acid sequence. Sequences containing
+                # codons with non-stardard nucleotide
+                # representations (i.e. not "A,a,C,c,G,T,t")
+                # will not be translated and will return
+                # InvalidCodonError.
+                wt_amino_acid = self.translations.translate(transcript, sequence)
+                # Convert coding DNA varaint start site to
+                # amino acid coordinate system.
+                aa_variant_position = convert_aa_cooridate(variant_position)
+                # In the Subset_AA_sequence representation of
+                # the mutated and wt amino acid sequence, the
+                # downstream portion of frameshift mutations
+                # are reported until one of the following
+                # conditions are met: the end of the coding
+                # sequence is reached, OR until the first
+                # terminating stop codon is reached.
+                # The upstream and downstream portion of
+                # non-frame shift mutations are +/- N amino
+                # acids of the mutation start site. This
+                # vairable is adjustable via the --subset
+                # cli option.
+                downstream = None if variant_class.lower().startswith('frame_shift') else subset
+                truncated_wt_aa = self.translations.truncate(transcript, sequence, aa_variant_position, subset, downstream)
+                if self.windowed:
+                    # Only translate the codons of the mutated
+                    # coding DNA sequence within the subset window,
+                    # the full length mutated amino acid sequence
+                    # is not reported.
+                    mutated_amino_acid = ''
+                    truncated_mutated_aa = translate_window(mutated_dna, aa_variant_position, subset, downstream)
+                else:
+                    mutated_amino_acid = translate(mutated_dna)
+                    truncated_mutated_aa = truncate(mutated_amino_acid, aa_variant_position, subset, downstream)
+            metrics.count('variants.written')
+            return "{}\t{}\t{}\t{}\t{}\t{}\t{}\t{}\t{}\t{}\t{}\n".format(variant_class, hugo, transcript, hgvs, variant_position,
+                sequence, mutated_dna, wt_amino_acid, mutated_amino_acid, truncated_wt_aa, truncated_mutated_aa)
+        except NonCodingVariantError as e:
+            err("WARNING: Skipping over non-coding DNA HGVS variant '{}' reported in {}!".format(hgvs, transcript))
+            metrics.count('variants.skipped.NonCodingVariantError')
+        except UnsupportedVariantTypeError as e:
+            err("WARNING: Skipping over unsupported HGVS variant class '{}' reported in {}!".format(hgvs, transcript))
+            metrics.count('variants.skipped.UnsupportedVariantTypeError')
+        except VariantParsingError as e:
+            err("WARNING: Skipping over HGVS variant '{}' reported in {} because it could not be parsed!".format(hgvs, transcript))
+            metrics.count('variants.skipped.VariantParsingError')
+        except NonMatchingReferenceBases as e:
+            err("WARNING: Skipping over HGVS variant '{}' reported in {} due to non-matching reference sequence!".format(hgvs, transcript),
+            "Please verify the correct reference file is provided!")
+            metrics.count('variants.skipped.NonMatchingReferenceBases')
+        except InvalidCodonError as e:
+            err("WARNING: Skipping over HGVS variant '{}' reported in {} due to invalid codon in mutated sequence!".format(hgvs, transcript),
+            "Please review the following mutated coding DNA sequence for any errors:\n\t> {}".format(mutated_dna))
+            metrics.count('variants.skipped.InvalidCodonError')
+
+        return None
+
+
+# Finder of each worker process,
+# see initializer()
+worker = None
+
+
+def initializer(transcripts, cache_size=1024, subset=30, windowed=False, metrics_enabled=False):
+    """Initializes a worker process. Each worker opens its own copy of the transcriptome.
+    @param transcripts <str>:
+        Transcriptomic FASTA file, it should already be indexed by the parent process
+    @param cache_size <int>:
+        Maximum number of transcripts in the worker's translation cache
+    @param subset <int>:
+        Truncates non-frame shift mutations +/- N amino acids
+    @param windowed <bool>:
+        Only translate mutated sequences within the subset window
+    @param metrics_enabled <bool>:
+        Records the stages and counters of the worker, see run()
+    """
+    global worker
+    if metrics_enabled:
+        metrics.default.enable()
+    worker = Finder(load(transcripts, quiet=True), cache_size, subset, windowed)
+
+
+def run(variants):
+    """Runs a batch of variants in a worker process, see initializer().
+    @param variants list[<tuple>]:
+        Transcript ID, variant class, HGVS term and Hugo symbol of each variant
+    @return rows list[<str>], warnings <str>, hits <int>, misses <int>, snapshot <dict>:
+        Output rows, warning messages, translation cache hits and misses, and the
+        metrics of the batch, see metrics.Metrics.snapshot()
+    """
+    hits, misses = worker.translations.hits, worker.translations.misses
+    # Capture warnings to print them
+    # in the order of the input file
+    stderr, sys.stderr = sys.stderr, io.StringIO()
+    try:
+        rows = [row for row in (worker.find(*variant) for variant in variants) if row]
+        warnings = sys.stderr.getvalue()
+    finally:
+        sys.stderr = stderr
+
+    return rows, warnings, worker.translations.hits - hits, worker.translations.misses - misses, metrics.default.snapshot()
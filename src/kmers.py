@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+from __future__ import print_function
+import numpy as np
+
+"""
+ABOUT: Kmer helpers for the predict sub command.
+
+extract() cuts the kmer and the verification windows of each mutation, for all mutations
+at once, from the first difference between their wild-type and mutated sequences.
+
+KmerIndex resolves each peptide scored by netMHCpan to the kmers it was cut from, with a
+hash index of every substring of each kmer, rather than scanning every kmer for each peptide.
+"""
+
+
+def differences(wt_seqs, mt_seqs, chunk_size=4096):
+    """Finds the first difference between each wild-type and mutated sequence. Sequences
+    are compared as fixed-width arrays of character codes, in chunks of sequences of
+    similar length, so short sequences are not padded to the length of the longest.
+    @param wt_seqs list[<str>]:
+        Wild-type sequences
+    @param mt_seqs list[<str>]:
+        Mutated sequences
+    @param chunk_size <int>:
+        Number of sequences compared at once
+    @return first <np.ndarray>, same <np.ndarray>:
+        Position of the first difference of each pair of sequences, or the length of the
+        shorter sequence if it is the start of the longer one, and whether they are equal
+    """
+    n = len(wt_seqs)
+    first = np.zeros(n, dtype=np.int64)
+    same = np.zeros(n, dtype=bool)
+    wt_len = np.array([len(seq) for seq in wt_seqs], dtype=np.int64)
+    mt_len = np.array([len(seq) for seq in mt_seqs], dtype=np.int64)
+    order = np.argsort(np.maximum(wt_len, mt_len), kind='stable')
+    for start in range(0, n, chunk_size):
+        rows = order[start:start+chunk_size]
+        # Shorter sequences are padded 
+        # with null characters
+        seqs = np.array([wt_seqs[i] for i in rows] + [mt_seqs[i] for i in rows], dtype=str)
+        codes = seqs.view(np.uint32).reshape(len(seqs), -1)
+        wt_codes, mt_codes = codes[:len(rows)], codes[len(rows):]
+        min_len = np.minimum(wt_len[rows], mt_len[rows])
+        differs = (wt_codes != mt_codes) & (np.arange(codes.shape[1]) < min_len[:, None])
+        found = differs.any(axis=1)
+        first[rows] = np.where(found, differs.argmax(axis=1), min_len)
+        same[rows] = ~found & (wt_len[rows] == mt_len[rows])
+
+    return first, same
+
+
+def extract(mut_types, wt_seqs, mt_seqs, kmer_length):
+    """Cuts the kmer of each mutation from its mutated sequence, with its upstream and
+    downstream verification windows. Frameshifts keep up to 10 AA upstream of the mutation
+    and every AA downstream of it. Other mutations are centered in a kmer of kmer_length,
+    shifted downstream or upstream when the mutation is near either end of the sequence,
+    or the whole sequence if it is not longer than kmer_length. The upstream window is the
+    3 AA preceding the mutation and the mutation, the downstream window is the mutation and
+    the 3 AA following it. Mutations without a difference have empty kmers and windows.
+    @param mut_types list[<str>]:
+        Variant_Classification of each mutation
+    @param wt_seqs list[<str>]:
+        WT_Subset_AA_Sequence of each mutation
+    @param mt_seqs list[<str>]:
+        Mutated_Subset_AA_Sequence of each mutation
+    @param kmer_length <int>:
+        Length of the kmer, an odd number
+    @return kmers list[<str>], up list[<str>], down list[<str>]:
+        Kmer, upstream and downstream verification window of each mutation
+    """
+    mut_types = [str(mut_type) for mut_type in mut_types]
+    wt_seqs = [str(seq) for seq in wt_seqs]
+    mt_seqs = [str(seq) for seq in mt_seqs]
+    first, same = differences(wt_seqs, mt_seqs)
+    length = np.array([len(seq) for seq in mt_seqs], dtype=np.int64)
+    frameshift = np.array(["Frame" in mut_type for mut_type in mut_types], dtype=bool)
+
+    # Mutation centered in the kmer, add one 
+    # to downstream for inclusive range locations
+    half = (kmer_length - 1) // 2
+    up_loc = first - half
+    down_loc = first + half + 1
+    # If the peptide is shorter than the kmer then use the whole peptide,
+    # if it's too short on the upstream then have a longer downstream,
+    # if it's too short on the downstream then have a longer upstream
+    fits = (length >= down_loc) & (up_loc > 0)
+    whole = ~fits & (length <= kmer_length)
+    short_up = ~fits & ~whole & (up_loc <= 0)
+    short_down = ~fits & ~whole & ~short_up & (length <= down_loc)
+    up_loc = np.where(whole | short_up, 0, up_loc)
+    down_loc = np.where(whole | short_down, length, down_loc)
+
+    # Frameshifts keep every AA downstream of the mutation, 
+    # and 10 AA upstream of it or until the start of the seq
+    up_loc = np.where(frameshift, np.maximum(first - 10, 0), up_loc)
+    down_loc = np.where(frameshift, length, down_loc)
+
+    # Verification windows start 3 AA upstream of the mutation, 
+    # slicing from a negative position counts from the end of 
+    # the seq, as the windows were always cut
+    kmers, up, down = [], [], []
+    for seq, d, u, l, s in zip(mt_seqs, first.tolist(), up_loc.tolist(), down_loc.tolist(), same.tolist()):
+        if s:
+            kmers.append("")
+            up.append("")
+            down.append("")
+            continue
+        kmers.append(seq[u:l])
+        up.append(seq[d-3:d+1])
+        down.append(seq[d:d+4])
+
+    return kmers, up, down
+
+
+class KmerIndex(object):
+    """Index of the kmers submitted to netMHCpan. Resolves each peptide to the kmers
+    containing it, their Hugo symbols and their up/downstream verification windows.
+    Lookups give the same results as scanning the keys of each dictionary, in order,
+    with `peptide in kmer`. The substrings of each kmer are only indexed for the
+    peptide lengths which are looked up.
+
+    @attributes:
+        kmers   -- distinct kmers, in order of first occurrence
+        symbols -- maps each kmer to its Hugo symbol
+        up      -- maps each kmer to its upstream verification window
+        down    -- maps each kmer to its downstream verification window
+    """
+    def __init__(self, kmers, symbols, up, down):
+        kmers = list(kmers)
+        # Later rows of a kmer override earlier
+        # rows, like dict(zip(kmers, symbols))
+        self.symbols = dict(zip(kmers, symbols))
+        self.up = dict(zip(kmers, up))
+        self.down = dict(zip(kmers, down))
+        self.kmers = list(self.symbols)
+        # Maps each peptide length to a hash
+        # index of the substrings of each kmer
+        self._index = {}
+        # Lookups of peptides scored
+        # for more than one allele
+        self._verified = {}
+
+    def _build(self, length):
+        """Indexes every substring of a given length of each kmer.
+        @param length <int>:
+            Length of the indexed substrings
+        @return index dict[<str>] = list[<int>]:
+            Maps each substring to the position of each kmer containing it, in order
+        """
+        index = {}
+        for i, kmer in enumerate(self.kmers):
+            for start in range(len(kmer) - length + 1):
+                positions = index.setdefault(kmer[start:start+length], [])
+                # Substring may occur more
+                # than once in a kmer
+                if not positions or positions[-1] != i:
+                    positions.append(i)
+        self._index[length] = index
+
+        return index
+
+    def lookup(self, peptide):
+        """Finds the kmers containing a peptide.
+        @param peptide <str>:
+            Peptide sequence
+        @return kmers list[<str>]:
+            Kmers containing the peptide, in order of first occurrence
+        """
+        length = len(peptide)
+        if length == 0:
+            # Empty peptides are found in every kmer
+            return list(self.kmers)
+        try:
+            index = self._index[length]
+        except KeyError:
+            index = self._build(length)
+
+        return [self.kmers[i] for i in index.get(peptide, [])]
+
+    def verify(self, peptide):
+        """Checks whether a peptide contains the upstream verification window of any
+        kmer containing it, or if not, the downstream verification window of any kmer
+        containing it. Peptides which contain neither are not derived from a mutation.
+        For example, a 9-mer could be generated in the flanking 9 AA sequence of a 21-mer.
+        @param peptide <str>:
+            Peptide sequence
+        @return keep <str>:
+            "Y" if the peptide contains a verification window, else "N"
+        """
+        try:
+            return self._verified[peptide]
+        except KeyError:
+            pass
+        kmers = self.lookup(peptide)
+        keep = "N"
+        if any(self.up[kmer] in peptide for kmer in kmers) or \
+            any(self.down[kmer] in peptide for kmer in kmers):
+            keep = "Y"
+        self._verified[peptide] = keep
+
+        return keep
+
+    def symbol(self, peptide):
+        """Finds the Hugo symbol of the first kmer containing a peptide.
+        @param peptide <str>:
+            Peptide sequence
+        @return symbol <str>:
+            Hugo symbol without any square brackets
+        """
+        symbol = self.symbols[self.lookup(peptide)[0]]
+
+        return symbol.replace("[", "").replace("]", "")
+
+
+def main():
+    """Pseudo-main method for testing.
+    """
+    # example: SLEYVSTRQPLRRSLRSCSTP with mutation at pos 10 L
+    # up_window is RQPL | down_window is LRRS
+    print(extract(["Missense_Mutation", "Frame_Shift_Del"], ["SLEYVSTRQPRRRSLRSCSTP", "MKTAYIAKQRQISFVKSHF"],
+        ["SLEYVSTRQPLRRSLRSCSTP", "MKTAYIAKQRQLL"], 9))
+    index = KmerIndex(["SLEYVSTRQPLRRSLRSCSTP", "MKTAYIAKQRQ"], ["Trp53", "[Kras]"], ["RQPL", "AKQ"], ["LRRS", "KQRQ"])
+    for peptide in ["VSTRQPLRR", "SLEYVSTRQ", "TAYIAKQRQ"]:
+        print(peptide, index.lookup(peptide), index.verify(peptide), index.symbol(peptide))
+
+
+if __name__ == '__main__':
+
+    main()
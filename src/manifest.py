@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+from __future__ import print_function
+import hashlib, json, os
+
+"""
+ABOUT: Stage manifests of the metro sub commands, see `metro --resume`.
+
+A manifest records each stage run by a sub command: the content hash, size and modification
+time of each of its input files, its parameters, and the content hash of each of its output
+files. A stage is current when its inputs and parameters have not changed since it was last
+recorded, and its outputs still exist and have not been modified. With --resume, current
+stages are skipped, i.e. a find input file which was already processed, or the netMHCpan
+output of an allele when only the --highbind threshold of predict changed.
+
+Input and output files are identified by their content, not by their modification time: a
+file is only re-hashed when its size or modification time changed since it was recorded, so
+re-generating an input file with the same contents does not invalidate later stages.
+"""
+
+
+def checksum(filename, block_size=1 << 20):
+    """Hashes the contents of a file.
+    @param filename <str>:
+        File to hash
+    @param block_size <int>:
+        Number of bytes read at a time
+    @return checksum <str>:
+        SHA-1 hash of the contents of the file
+    """
+    sha = hashlib.sha1()
+    with open(filename, 'rb') as fh:
+        for block in iter(lambda: fh.read(block_size), b''):
+            sha.update(block)
+
+    return 'sha1:' + sha.hexdigest()
+
+
+def fingerprint(filename, previous=None):
+    """Fingerprints a file by its contents.
+    @param filename <str>:
+        File to fingerprint
+    @param previous <dict>:
+        Recorded fingerprint of the file, its checksum is reused if the size and the
+        modification time of the file have not changed
+    @return fingerprint <dict>:
+        Size, modification time and checksum of the file, or None if it does not exist
+    """
+    try:
+        stat = os.stat(filename)
+    except OSError:
+        return None
+    if previous and previous.get('size') == stat.st_size and previous.get('mtime') == stat.st_mtime_ns:
+        return previous
+
+    return {'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'checksum': checksum(filename)}
+
+
+def _normalize(parameters):
+    """Private function: parameters as they are read back from a manifest, i.e. tuples
+    become lists.
+    """
+    return json.loads(json.dumps(parameters, sort_keys=True))
+
+
+class Manifest(object):
+    """Stage manifest of a sub command, stored as a JSON file. A missing or corrupt
+    manifest has no recorded stages.
+
+    @attributes:
+        filename -- path of the manifest file
+        stages   -- maps each recorded stage to its inputs, parameters and outputs
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        self.stages = {}
+        try:
+            with open(filename, 'r') as fh:
+                self.stages = json.load(fh)['stages']
+        except (IOError, OSError, ValueError, KeyError, TypeError):
+            pass
+
+    def current(self, stage, inputs, parameters, outputs):
+        """Whether a stage is current: its inputs and parameters are the same as when
+        it was recorded, and its outputs were not modified since.
+        @param stage <str>:
+            Stage name, i.e. 'netMHCpan H-2-Kb'
+        @param inputs list[<str>]:
+            Input files of the stage
+        @param parameters <dict>:
+            Parameters of the stage, must be JSON serializable
+        @param outputs list[<str>]:
+            Output files of the stage
+        @return current <bool>:
+            True if the stage can be skipped
+        """
+        recorded = self.stages.get(stage)
+        if not recorded or recorded['parameters'] != _normalize(parameters):
+            return False
+        for kind, files in (('inputs', inputs), ('outputs', outputs)):
+            files = [os.path.abspath(filename) for filename in files]
+            if sorted(files) != sorted(recorded[kind]):
+                return False
+            for filename in files:
+                previous = recorded[kind][filename]
+                current = fingerprint(filename, previous)
+                if previous is None or current is None or current['checksum'] != previous['checksum']:
+                    return False
+
+        return True
+
+    def record(self, stage, inputs, parameters, outputs):
+        """Records a stage which was run, and saves the manifest.
+        @params stage, inputs, parameters, outputs:
+            See current()
+        """
+        recorded = self.stages.get(stage, {})
+        entry = {'parameters': _normalize(parameters)}
+        for kind, files in (('inputs', inputs), ('outputs', outputs)):
+            entry[kind] = {}
+            for filename in files:
+                filename = os.path.abspath(filename)
+                entry[kind][filename] = fingerprint(filename, recorded.get(kind, {}).get(filename))
+        self.stages[stage] = entry
+        self.save()
+
+    def save(self):
+        """Writes the manifest file, the previous manifest is replaced at once.
+        """
+        temporary = self.filename + '.tmp'
+        with open(temporary, 'w') as fh:
+            json.dump({'stages': self.stages}, fh, indent=2, sort_keys=True)
+            fh.write('\n')
+        os.replace(temporary, self.filename)
+
+
+def main():
+    """Pseudo-main method for testing.
+    """
+    import tempfile
+    directory = tempfile.mkdtemp()
+    source, target = os.path.join(directory, 'input.txt'), os.path.join(directory, 'output.txt')
+    with open(source, 'w') as fh: fh.write('ACGT\n')
+    with open(target, 'w') as fh: fh.write('TGCA\n')
+    manifest = Manifest(os.path.join(directory, 'test.manifest.json'))
+    print('Before recording:', manifest.current('reverse', [source], {'n': 1}, [target]))
+    manifest.record('reverse', [source], {'n': 1}, [target])
+    manifest = Manifest(manifest.filename)
+    print('After recording:', manifest.current('reverse', [source], {'n': 1}, [target]))
+    print('New parameters:', manifest.current('reverse', [source], {'n': 2}, [target]))
+    with open(source, 'w') as fh: fh.write('ACGA\n')
+    print('New input:', manifest.current('reverse', [source], {'n': 1}, [target]))
+
+
+if __name__ == '__main__':
+
+    main()
@@ -0,0 +1,275 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+from __future__ import print_function
+import json, sys, time
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows
+    resource = None
+
+"""
+ABOUT: Per-stage metrics of the metro sub commands, see `metro --metrics`.
+
+Records the wall time, CPU time and peak resident set size of each stage of a sub command
+(i.e. FASTA load, MAF read, mutate, translate, write, netMHCpan, post-processing), and
+counters of processed and skipped variants by error class. Stages and counters are only
+recorded once metrics are enabled, otherwise they cost next to nothing. Worker processes
+record their own metrics, which are merged into the metrics of the parent process, see
+snapshot() and merge().
+
+The modules of the src package import each other by their bare names, while metro imports
+them from the src package, so this module registers itself under both names to share a
+single set of metrics.
+"""
+
+
+def rss(who='self'):
+    """Peak resident set size of this process, or of its largest child process.
+    @param who <str>:
+        'self' or 'children'
+    @return peak <float>:
+        Peak resident set size in MB, 0 if unknown
+    """
+    if resource is None:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_SELF if who == 'self' else resource.RUSAGE_CHILDREN)
+    # Maximum resident set size is in
+    # bytes on macOS and in KB on Linux
+    scale = 1e6 if sys.platform == 'darwin' else 1e3
+
+    return usage.ru_maxrss / scale
+
+
+class _Stage(object):
+    """Private class: times a stage, see Metrics.stage().
+    """
+    __slots__ = ('metrics', 'name', 'wall', 'cpu')
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.wall = time.perf_counter()
+        self.cpu = time.process_time()
+        return self
+
+    def __exit__(self, *args):
+        self.metrics.add(self.name, time.perf_counter() - self.wall, time.process_time() - self.cpu)
+
+
+class _Disabled(object):
+    """Private class: stage of disabled metrics, does nothing.
+    """
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+_disabled = _Disabled()
+
+
+class Metrics(object):
+    """Metrics of a sub command.
+
+    @attributes:
+        enabled  -- whether stages and counters are recorded
+        stages   -- maps each stage to its calls, wall time (s), CPU time (s), and peak
+                    resident set size (MB) of this process and of its child processes
+        counters -- maps each counter to its value
+    """
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.stages = {}
+        self.counters = {}
+        self.start = time.perf_counter()
+
+    def enable(self):
+        """Starts recording stages and counters.
+        """
+        self.enabled = True
+        self.start = time.perf_counter()
+
+    def stage(self, name):
+        """Times a stage, as a context manager. Stages entered more than once are added up.
+        @param name <str>:
+            Stage name
+        @return stage <context manager>:
+            Records the stage on exit
+        """
+        if not self.enabled:
+            return _disabled
+
+        return _Stage(self, name)
+
+    def add(self, name, wall, cpu, calls=1, peak=None, peak_children=None):
+        """Adds a run of a stage.
+        @param name <str>:
+            Stage name
+        @param wall <float>:
+            Wall time in seconds
+        @param cpu <float>:
+            CPU time in seconds
+        @param calls <int>:
+            Number of runs
+        @param peak <float>:
+            Peak resident set size in MB, defaults to the current peak of this process
+        @param peak_children <float>:
+            Peak resident set size of the child processes in MB, defaults to the current peak
+        """
+        stage = self.stages.setdefault(name, {'calls': 0, 'wall_s': 0.0, 'cpu_s': 0.0,
+            'peak_rss_mb': 0.0, 'peak_rss_children_mb': 0.0})
+        stage['calls'] += calls
+        stage['wall_s'] += wall
+        stage['cpu_s'] += cpu
+        stage['peak_rss_mb'] = max(stage['peak_rss_mb'], rss('self') if peak is None else peak)
+        stage['peak_rss_children_mb'] = max(stage['peak_rss_children_mb'],
+            rss('children') if peak_children is None else peak_children)
+
+    def count(self, name, n=1):
+        """Increments a counter.
+        @param name <str>:
+            Counter name, i.e. 'variants.skipped.NonCodingVariantError'
+        @param n <int>:
+            Increment
+        """
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def snapshot(self, reset=True):
+        """Metrics recorded since the last snapshot, to be merged into the metrics of
+        another process, see merge().
+        @param reset <bool>:
+            Clears the recorded metrics
+        @return snapshot <dict>:
+            Stages and counters
+        """
+        snapshot = {'stages': self.stages, 'counters': self.counters}
+        if reset:
+            self.stages, self.counters = {}, {}
+
+        return snapshot
+
+    def merge(self, snapshot):
+        """Merges the metrics of another process, see snapshot(). The peak resident set
+        size of a stage is the largest peak of any process.
+        @param snapshot <dict>:
+            Stages and counters
+        """
+        if not self.enabled:
+            return
+        for name, stage in snapshot['stages'].items():
+            self.add(name, stage['wall_s'], stage['cpu_s'], stage['calls'],
+                stage['peak_rss_mb'], stage['peak_rss_children_mb'])
+        for name, n in snapshot['counters'].items():
+            self.count(name, n)
+
+    def report(self, **info):
+        """Report of the recorded metrics.
+        @params info:
+            Extra fields of the report, i.e. the sub command
+        @return report <dict>:
+            Extra fields, stages, counters and totals of the sub command
+        """
+        report = dict(info)
+        report['stages'] = self.stages
+        report['counters'] = self.counters
+        report['total'] = {
+            'wall_s': time.perf_counter() - self.start,
+            'cpu_s': time.process_time(),
+            'peak_rss_mb': rss('self'),
+            'peak_rss_children_mb': rss('children')
+        }
+
+        return report
+
+    def write(self, filename, **info):
+        """Writes the report of the recorded metrics to a JSON file, see report().
+        @param filename <str>:
+            Output JSON file
+        @params info:
+            Extra fields of the report
+        """
+        with open(filename, 'w') as fh:
+            json.dump(self.report(**info), fh, indent=2, sort_keys=True)
+            fh.write('\n')
+
+
+# Metrics of this process
+default = Metrics()
+
+
+def stage(name):
+    """Times a stage of the default metrics, see Metrics.stage().
+    """
+    return default.stage(name)
+
+
+def count(name, n=1):
+    """Increments a counter of the default metrics, see Metrics.count().
+    """
+    default.count(name, n)
+
+
+def iterate(iterable, name):
+    """Times each item drawn from an iterable as a stage of the default metrics, i.e.
+    the rows streamed from an input file. Time spent by the caller between items is
+    not included in the stage.
+    @param iterable <iterable>:
+        Iterable to time
+    @param name <str>:
+        Stage name
+    @return iterator <iterator>:
+        Items of the iterable
+    """
+    if not default.enabled:
+        return iter(iterable)
+
+    def timed(iterator):
+        wall, cpu = 0.0, 0.0
+        try:
+            while True:
+                start, start_cpu = time.perf_counter(), time.process_time()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    wall += time.perf_counter() - start
+                    cpu += time.process_time() - start_cpu
+                yield item
+        finally:
+            # Each file read is recorded
+            # as a single call of the stage
+            default.add(name, wall, cpu)
+
+    return timed(iter(iterable))
+
+
+# Share a single module, whether it is
+# imported as 'metrics' or 'src.metrics'
+sys.modules.setdefault('metrics', sys.modules[__name__])
+sys.modules.setdefault('src.metrics', sys.modules[__name__])
+
+
+def main():
+    """Pseudo-main method for testing.
+    """
+    default.enable()
+    with stage('sleep'):
+        time.sleep(0.1)
+    for i in range(3):
+        with stage('sum'):
+            sum(range(100000))
+        count('variants.processed')
+    count('variants.skipped.VariantParsingError')
+    print(json.dumps(default.report(command='test'), indent=2, sort_keys=True))
+
+
+if __name__ == '__main__':
+
+    main()
@@ -2,6 +2,8 @@
 # -*- coding: UTF-8 -*-
 from __future__ import print_function
 from utils import err
+from collections import namedtuple
+from functools import lru_cache
 import re
 
 """
@@ -28,6 +30,25 @@ NOTE: mutations occuring in intronic or UTR regions (non-CDS regions) will not b
 will be passed over and will raise an UnsupportedVariantTypeError exception.
 """
 
+# Regular expressions to tokenize each major HGVS variant
+# type, these are compiled once at import time and reused
+# across every variant instead of being re-parsed per call
+substitution_regex = re.compile(r'(?P<id>^.+)\.(?P<position>\d+)(?P<ref>[A,C,G,T,N,a,c,g,t,n])(?P<type>>)(?P<alt>[A,C,G,T,N,a,c,g,t,n]$)')
+deletion_regex = re.compile(r'(?P<id>^.+)\.(?P<start>[0-9+-?*]+)_{0,1}(?P<stop>[0-9+-?*]+){0,1}(?P<type>del)(?P<seq>[A,C,G,T,a,c,g,t,N,n]+){0,1}')
+duplication_regex = re.compile(r'(?P<id>^.+)\.(?P<start>[0-9+-?*]+)_{0,1}(?P<stop>[0-9+-?*]+){0,1}(?P<type>dup)')
+insertion_regex = re.compile(r'(?P<id>^.+)\.(?P<start>[0-9+-?*]+)_{1}(?P<stop>[0-9+-?*]+){1}(?P<type>ins)(?P<seq>[A,C,G,T,a,c,g,t,N,n]+){1}')
+indel_regex = re.compile(r'(?P<id>^.+)\.(?P<start>[0-9+-?*]+)_{0,1}(?P<stop>[0-9+-?*]+){0,1}(?P<type>delins)(?P<seq>[A,C,G,T,a,c,g,t,N,n]+){1}')
+
+
+# Parsed representation of a HGVS term,
+# where start and stop are 1-based transcript
+# coordinates, ref is the reference base of a
+# substitution, alt is the substituted/inserted
+# sequence and position is the variant start site
+# reported back to the caller.
+Variant = namedtuple('Variant', ['hgvs', 'type', 'start', 'stop', 'ref', 'alt', 'position'])
+
+
 def mutate(sequence, hgvs):
     """Wrapper to each supported mutatation type: substitution, deletion, duplication, insertion, indel.
     Mutate takes in a reference sequence and a HGVS term and returns a mutated sequence. Only coding DNA
@@ -42,9 +63,8 @@ def mutate(sequence, hgvs):
     @return mutation
         Mutated coding DNA sequence, unsupported HGVS types raise UnsupportedVariantTypeError()
     """
-
     # Check for mutations encoded in non-CDS regions like introns and 5'/3' UTR regions 
-    if '-' in hgvs or '+' in hgvs or '*' in hgvs or '?' in hgvs:
+    if noncoding(hgvs):
         raise NonCodingVariantError(hgvs)
 
     # Check the variant type
@@ -52,28 +72,98 @@ def mutate(sequence, hgvs):
     if not hgvs.startswith('c.'):
         err("WARNING: HGVS variant '{}' may not be a coding DNA variant and may not be supported!".format(hgvs))
 
-    # Handler of each major variant types for Coding DNA reference sequences
+    return apply(sequence, parse(hgvs))
+
+
+def mutate_many(sequence, hgvs_list, return_exceptions=False):
+    """Applies a batch of HGVS terms to the same reference sequence. Each HGVS term
+    is applied independently to the reference sequence (i.e. variants are not stacked
+    on top of each other), and the results are returned in the same order as the 
+    provided HGVS terms. Each result is identical to calling mutate(sequence, hgvs).
+    Recurrent HGVS terms are only parsed once.
+    @param sequence <str>:
+        Coding DNA reference sequence to mutate (transcript sequence)
+    @param hgvs_list list[<str>]:
+        List of HGVS terms describing each mutation
+    @param return_exceptions <bool>:
+        If True, an exception raised by a HGVS term is returned in place of its
+        result instead of being raised, i.e. one bad term does not fail the batch
+    @return mutations list[(<str>, <str|int>)]:
+        Mutated coding DNA sequence and variant start position for each HGVS term
+    """
+    mutations = []
+    for hgvs in hgvs_list:
+        try:
+            mutations.append(mutate(sequence, hgvs))
+        except (NonCodingVariantError, UnsupportedVariantTypeError,
+                VariantParsingError, NonMatchingReferenceBases) as e:
+            if not return_exceptions:
+                raise
+            mutations.append(e)
+
+    return mutations
+
+
+def noncoding(hgvs):
+    """Checks whether a HGVS term describes a mutation in a non-CDS region like 
+    introns and 5'/3' UTR regions (i.e. 'c.-26', 'c.*85', 'c.530+6', 'c.?').
+    @param hgvs <str>:
+        HGVS term describing the mutation
+    @return <boolean>:
+        True if the HGVS term describes a non-coding mutation, else False
+    """
+    return '-' in hgvs or '+' in hgvs or '*' in hgvs or '?' in hgvs
+
+
+@lru_cache(maxsize=65536)
+def parse(hgvs):
+    """Parses a HGVS term into a Variant record. Determines the variant type of the 
+    HGVS term and tokenizes it with the corresponding parser. Parsed HGVS terms are
+    cached, so recurrent variants across a cohort are only tokenized once. 
+    @param hgvs <str>:
+        HGVS term describing the mutation
+    @return variant <Variant>:
+        Parsed HGVS term, unsupported HGVS types raise UnsupportedVariantTypeError()
+    """
+    if noncoding(hgvs):
+        raise NonCodingVariantError(hgvs)
+
+    # Parser of each major variant types for Coding DNA reference sequences
     if '>' in hgvs:
-        return substitution(sequence, hgvs)
+        return parse_substitution(hgvs)
     elif 'delins' in hgvs:
-        return indel(sequence, hgvs)
+        return parse_indel(hgvs)
     elif 'del' in hgvs:
-        return deletion(sequence, hgvs)
+        return parse_deletion(hgvs)
     elif 'dup' in hgvs:
-        return duplication(sequence, hgvs)
+        return parse_duplication(hgvs)
     elif 'ins' in hgvs:
-        return insertion(sequence, hgvs)
+        return parse_insertion(hgvs)
     else:
         raise UnsupportedVariantTypeError(hgvs)
 
 
+def apply(sequence, variant):
+    """Applies a parsed Variant to a reference sequence. Each handler builds the mutated
+    sequence by slicing the reference sequence around the variant, instead of visiting 
+    each base pair of the transcript.
+    @param sequence <str>:
+        Coding DNA reference sequence to mutate (transcript sequence)
+    @param variant <Variant>:
+        Parsed HGVS term, see parse()
+    @return mutated <str>, position <str|int>:
+        Mutated coding DNA sequence and the variant start position
+    """
+    return appliers[variant.type](sequence, variant), variant.position
+
+
 def tokenize(regex, tokens, hgvs, variant_type):
     """Breaks up a given HGVS term into meaningful tokens or components.
     Takes a regular expression, a list of named tokens representing required named 
     groups within the regular expression to check against, and a HGVS term to impose 
     the regular expression upon. A list of parse tokens are returned.
-    @param regex <str>:
-        Regular expression to tokenize HGVS term
+    @param regex <str|re.Pattern>:
+        Regular expression (or a pre-compiled regular expression) to tokenize HGVS term
     @param tokens list[<str>]:
         List of require named tokens/groups to check after imposing the regex
     @param hgvs <str>:
@@ -96,6 +186,124 @@ def tokenize(regex, tokens, hgvs, variant_type):
     return parsed
 
 
+def parse_substitution(hgvs):
+    """Tokenizes a HGVS substitution term, see substitution().
+    @param hgvs <str>:
+        HGVS term describing the mutation
+    @return variant <Variant>:
+        Parsed HGVS substitution term
+    """
+    # Regular expression to tokenize HGVS subsitution term
+    # See examples below
+    # c.2413G>T
+    # c.1249C>G
+    # c.10732A>C
+    # c.35G>T
+    # c1.1.1249C>G
+    tokens = tokenize(substitution_regex, ['id', 'position', 'ref', 'type', 'alt'], hgvs, 'substitution')
+    tid, mutation_position, ref, mtype, alt = tokens
+
+    return Variant(hgvs, 'substitution', int(mutation_position), None, ref, alt, mutation_position)
+
+
+def parse_deletion(hgvs):
+    """Tokenizes a HGVS deletion term, see deletion().
+    @param hgvs <str>:
+        HGVS term describing the mutation
+    @return variant <Variant>:
+        Parsed HGVS deletion term
+    """
+    # Regular expression to tokenize HGVS deletion term
+    # See examples below
+    # c.448del
+    # c.333_666del
+    # c.8054_8058delATTA
+    # c.862+26delA
+    # c.695-6del
+    # c.460-9_460-8del
+    tokens = tokenize(deletion_regex, ['id', 'start', 'stop', 'type', 'seq'], hgvs, 'deletion')
+    tid, start, stop, mtype, del_seq = tokens
+    start = int(start)
+    # Point deletion or deletion occuring 
+    # over a range of base pairs
+    stop = int(stop) if stop else start
+
+    return Variant(hgvs, 'deletion', start, stop, del_seq, None, start)
+
+
+def parse_duplication(hgvs):
+    """Tokenizes a HGVS duplication term, see duplication().
+    @param hgvs <str>:
+        HGVS term describing the mutation
+    @return variant <Variant>:
+        Parsed HGVS duplication term
+    """
+    # Regular expression to tokenize HGVS deletion term
+    # See examples below
+    # c.13dup
+    # c.928_948dup
+    # c.582+10_582+19dup
+    # c.1487-30dup
+    # c.6172+26dup
+    # NC12341q1.c.924dup
+    # LRG_199t1:c.1704+1dup
+    tokens = tokenize(duplication_regex, ['id', 'start', 'stop', 'type'], hgvs, 'duplication')
+    tid, start, stop, mtype = tokens
+    start = int(start)
+    # Point duplication or duplication 
+    # occuring over a range of base pairs
+    stop = int(stop) if stop else start
+
+    return Variant(hgvs, 'duplication', start, stop, None, None, start)
+
+
+def parse_insertion(hgvs):
+    """Tokenizes a HGVS insertion term, see insertion(). The insertion
+    is added directly after the start position, so the stop position
+    of the flanking nucleotides is not recorded.
+    @param hgvs <str>:
+        HGVS term describing the mutation
+    @return variant <Variant>:
+        Parsed HGVS insertion term
+    """
+    # Regular expression to tokenize HGVS deletion term
+    # See examples below
+    # c.4375_4376insACCT
+    # c.1597_1598insC
+    # c.432-15_432-14insGGGG
+    # c.579+1_579+2insAAGAAGAGGAAGA
+    # c.738_738+1insAAAAAGAAAGAAGAGG
+    tokens = tokenize(insertion_regex, ['id', 'start', 'stop', 'type', 'seq'], hgvs, 'insertion')
+    tid, start, stop, mtype, ins_seq = tokens
+    start = int(start)
+
+    return Variant(hgvs, 'insertion', start, None, None, ins_seq, start)
+
+
+def parse_indel(hgvs):
+    """Tokenizes a HGVS deletion/insertion term, see indel().
+    @param hgvs <str>:
+        HGVS term describing the mutation
+    @return variant <Variant>:
+        Parsed HGVS deletion/insertion term
+    """
+    # Regular expression to tokenize HGVS deletion term
+    # See examples below
+    # c.32386323delinsGA
+    # c.6775_6777delinsC
+    # c.145_147delinsTGG (p.Arg49Trp)
+    # c.9002_9009delinsTTT
+    # LRG_199t1:c.850_901delinsTTCCTCGATGCCTG
+    tokens = tokenize(indel_regex, ['id', 'start', 'stop', 'type', 'seq'], hgvs, 'indel')
+    tid, start, stop, mtype, ins_seq = tokens
+    start = int(start)
+    # Point deletion or deletion occuring 
+    # over a range of base pairs
+    stop = int(stop) if stop else start
+
+    return Variant(hgvs, 'indel', start, stop, None, ins_seq, start)
+
+
 def substitution(seq, hgvs):
     """One letter (nucleotide) of the DNA code is replaced (substituted) by one other letter. 
     On DNA and RNA level a substitution is indicated using '>' character.
@@ -122,34 +330,7 @@ def substitution(seq, hgvs):
     @return mutation_position <str>
         Position of mutated coding DNA sequence
     """
-    # Regular expression to tokenize HGVS subsitution term
-    # See examples below
-    # c.2413G>T
-    # c.1249C>G
-    # c.10732A>C
-    # c.35G>T
-    # c1.1.1249C>G
-    regex = '(?P<id>^.+)\.(?P<position>\d+)(?P<ref>[A,C,G,T,N,a,c,g,t,n])(?P<type>>)(?P<alt>[A,C,G,T,N,a,c,g,t,n]$)'
-    tokens = tokenize(regex, ['id', 'position', 'ref', 'type', 'alt'], hgvs, 'substitution')
-    tid, mutation_position, ref, mtype, alt = tokens
-
-    # Generate mutated sequence
-    mutated = ''
-    for i in range(len(seq)):
-        bp = seq[i]
-        # Transcript coordinates start at 1 (i.e. not zero based)
-        transcript_index = i + 1
-        # Find subsitution location defined by the HGVS term
-        if transcript_index == int(mutation_position):
-            # Sanity check to verify that the ref bp defined by HGSV is the same
-            # as the transcript's base pair at the defined position
-            if bp != ref:
-                # Reference bp does NOT match HGVS!
-                raise NonMatchingReferenceBases(hgvs)
-            bp = alt
-        mutated += bp
-
-    return mutated, mutation_position
+    return apply(seq, parse_substitution(hgvs))
 
 
 def deletion(seq, hgvs):
@@ -178,36 +359,7 @@ def deletion(seq, hgvs):
     @return start <str>
         Start position of mutated coding DNA sequence
     """
-    # Regular expression to tokenize HGVS deletion term
-    # See examples below
-    # c.448del
-    # c.333_666del
-    # c.8054_8058delATTA
-    # c.862+26delA
-    # c.695-6del
-    # c.460-9_460-8del
-    regex = '(?P<id>^.+)\.(?P<start>[0-9+-?*]+)_{0,1}(?P<stop>[0-9+-?*]+){0,1}(?P<type>del)(?P<seq>[A,C,G,T,a,c,g,t,N,n]+){0,1}'
-    tokens = tokenize(regex, ['id', 'start', 'stop', 'type', 'seq'], hgvs, 'deletion')
-    tid, start, stop, mtype, del_seq = tokens
-    start = int(start)
-    deleted_range = [start]  # point deletion
-
-    if stop:
-        # Deletion occuring over a range of base pairs
-        stop = int(stop)
-        deleted_range = range(start, stop + 1)  # Range and string index end position is not inclusive
-
-    # Generate mutated sequence
-    mutated = ''
-    for i in range(len(seq)):
-        bp = seq[i]
-        # Transcript coordinates start at 1 (i.e. not zero based)
-        transcript_index = i + 1
-        if transcript_index in deleted_range:
-            continue  # do not concatenate bp (i.e. delete bp)
-        mutated += bp
-
-    return mutated, start
+    return apply(seq, parse_deletion(hgvs))
 
 
 def duplication(seq, hgvs):
@@ -239,40 +391,7 @@ def duplication(seq, hgvs):
     @return start <str>
         Start position of mutated coding DNA sequence
     """
-    # Regular expression to tokenize HGVS deletion term
-    # See examples below
-    # c.13dup
-    # c.928_948dup
-    # c.582+10_582+19dup
-    # c.1487-30dup
-    # c.6172+26dup
-    # NC12341q1.c.924dup
-    # LRG_199t1:c.1704+1dup
-    regex = '(?P<id>^.+)\.(?P<start>[0-9+-?*]+)_{0,1}(?P<stop>[0-9+-?*]+){0,1}(?P<type>dup)'
-    tokens = tokenize(regex, ['id', 'start', 'stop', 'type'], hgvs, 'duplication')
-    tid, start, stop, mtype = tokens
-    start = int(start)
-    duplication_range = [start]  # point duplication
-
-    if stop:
-        # Duplication occuring over a range of base pairs
-        stop = int(stop)
-        duplication_range = range(start, stop + 1)  # Range and string index end position is not inclusive
-
-    # Generate mutated sequence
-    mutated, dup = '', ''
-    for i in range(len(seq)):
-        bp = seq[i]
-        # Transcript coordinates start at 1 (i.e. not zero based)
-        transcript_index = i + 1
-        mutated += bp
-        if transcript_index in duplication_range:
-            dup += bp
-            if transcript_index == max(duplication_range):
-                # Insert duplication into sequence
-                mutated += dup
-
-    return mutated, start
+    return apply(seq, parse_duplication(hgvs))
 
 
 def insertion(seq, hgvs):
@@ -305,35 +424,7 @@ def insertion(seq, hgvs):
     @return start <str>
         Start position of mutated coding DNA sequence
     """
-    # Regular expression to tokenize HGVS deletion term
-    # See examples below
-    # c.4375_4376insACCT
-    # c.1597_1598insC
-    # c.432-15_432-14insGGGG
-    # c.579+1_579+2insAAGAAGAGGAAGA
-    # c.738_738+1insAAAAAGAAAGAAGAGG
-    regex = '(?P<id>^.+)\.(?P<start>[0-9+-?*]+)_{1}(?P<stop>[0-9+-?*]+){1}(?P<type>ins)(?P<seq>[A,C,G,T,a,c,g,t,N,n]+){1}'
-    tokens = tokenize(regex, ['id', 'start', 'stop', 'type', 'seq'], hgvs, 'insertion')
-    tid, start, stop, mtype, ins_seq = tokens
-    start = int(start)
-
-    # Point of insertion or insertion break point
-    insert_point = start  # Insertion is added directly after concatenating start bp
-
-    # Generate mutated sequence
-    mutated = ''
-    for i in range(len(seq)):
-        bp = seq[i]
-        # Transcript coordinates start at 1 (i.e. not zero based)
-        transcript_index = i + 1
-        if transcript_index == insert_point:
-            # Insertion MUST be added after concatenating insert point (or start) bp
-            mutated += bp
-            mutated += ins_seq
-            continue # goto next bp position
-        mutated += bp
-
-    return mutated, start
+    return apply(seq, parse_insertion(hgvs))
 
 
 def indel(seq, hgvs):
@@ -364,39 +455,120 @@ def indel(seq, hgvs):
     @return start <str>
         Start position of mutated coding DNA sequence
     """
-    # Regular expression to tokenize HGVS deletion term
-    # See examples below
-    # c.32386323delinsGA
-    # c.6775_6777delinsC
-    # c.145_147delinsTGG (p.Arg49Trp)
-    # c.9002_9009delinsTTT
-    # LRG_199t1:c.850_901delinsTTCCTCGATGCCTG
-    regex = '(?P<id>^.+)\.(?P<start>[0-9+-?*]+)_{0,1}(?P<stop>[0-9+-?*]+){0,1}(?P<type>delins)(?P<seq>[A,C,G,T,a,c,g,t,N,n]+){1}'
-    tokens = tokenize(regex, ['id', 'start', 'stop', 'type', 'seq'], hgvs, 'indel')
-    tid, start, stop, mtype, ins_seq = tokens
-    start = int(start)
-    deleted_range = [start]
-
-    if stop:
-        # Deletion occuring over a range of base pairs
-        stop = int(stop)
-        deleted_range = range(start, stop + 1)  # Range and string index end position is not inclusive
-
-    # Generate mutated sequence
-    mutated = ''
-    inserted = False  # tracks whether the insertion has been added
-    for i in range(len(seq)):
-        bp = seq[i]
-        # Transcript coordinates start at 1 (i.e. not zero based)
-        transcript_index = i + 1
-        if transcript_index in deleted_range:
-            if not inserted:
-                mutated += ins_seq
-                inserted = True # add insertion sequence only once
-            continue  # do not concatenate bp (i.e. delete bp)
-        mutated += bp
-
-    return mutated, start
+    return apply(seq, parse_indel(hgvs))
+
+def apply_substitution(seq, variant):
+    """Replaces the reference base at the variant position, see substitution().
+    Positions outside of the reference sequence leave it unchanged.
+    @param seq <str>:
+        Coding DNA reference sequence to mutate (transcript sequence)
+    @param variant <Variant>:
+        Parsed HGVS substitution term
+    @return mutated <str>:
+        Mutated coding DNA sequence
+    """
+    # Transcript coordinates start at 1 (i.e. not zero based)
+    position = variant.start
+    if position < 1 or position > len(seq):
+        return seq
+
+    # Sanity check to verify that the ref bp defined by HGSV is the same
+    # as the transcript's base pair at the defined position
+    if seq[position-1] != variant.ref:
+        # Reference bp does NOT match HGVS!
+        raise NonMatchingReferenceBases(variant.hgvs)
+
+    return seq[:position-1] + variant.alt + seq[position:]
+
+
+def apply_deletion(seq, variant):
+    """Removes the deleted range of base pairs, see deletion(). 
+    Only the portion of the range within the reference sequence
+    is deleted.
+    @param seq <str>:
+        Coding DNA reference sequence to mutate (transcript sequence)
+    @param variant <Variant>:
+        Parsed HGVS deletion term
+    @return mutated <str>:
+        Mutated coding DNA sequence
+    """
+    # Transcript coordinates start at 1 (i.e. not zero based)
+    # and the deleted range is inclusive of the stop position
+    start, stop = max(variant.start, 1), min(variant.stop, len(seq))
+    if start > stop:
+        return seq
+
+    return seq[:start-1] + seq[stop:]
+
+
+def apply_duplication(seq, variant):
+    """Inserts a copy of the duplicated range of base pairs directly 
+    after its stop position, see duplication(). A range ending past 
+    the reference sequence leaves it unchanged.
+    @param seq <str>:
+        Coding DNA reference sequence to mutate (transcript sequence)
+    @param variant <Variant>:
+        Parsed HGVS duplication term
+    @return mutated <str>:
+        Mutated coding DNA sequence
+    """
+    # Transcript coordinates start at 1 (i.e. not zero based)
+    # and the duplicated range is inclusive of the stop position
+    start, stop = max(variant.start, 1), variant.stop
+    if start > stop or stop > len(seq):
+        return seq
+
+    return seq[:stop] + seq[start-1:stop] + seq[stop:]
+
+
+def apply_insertion(seq, variant):
+    """Adds the inserted sequence directly after the start position or 
+    insertion break point, see insertion(). Break points outside of the 
+    reference sequence leave it unchanged.
+    @param seq <str>:
+        Coding DNA reference sequence to mutate (transcript sequence)
+    @param variant <Variant>:
+        Parsed HGVS insertion term
+    @return mutated <str>:
+        Mutated coding DNA sequence
+    """
+    # Transcript coordinates start at 1 (i.e. not zero based)
+    insert_point = variant.start
+    if insert_point < 1 or insert_point > len(seq):
+        return seq
+
+    return seq[:insert_point] + variant.alt + seq[insert_point:]
+
+
+def apply_indel(seq, variant):
+    """Replaces the deleted range of base pairs with the inserted sequence, 
+    see indel(). Only the portion of the range within the reference sequence
+    is deleted.
+    @param seq <str>:
+        Coding DNA reference sequence to mutate (transcript sequence)
+    @param variant <Variant>:
+        Parsed HGVS deletion/insertion term
+    @return mutated <str>:
+        Mutated coding DNA sequence
+    """
+    # Transcript coordinates start at 1 (i.e. not zero based)
+    # and the deleted range is inclusive of the stop position
+    start, stop = max(variant.start, 1), min(variant.stop, len(seq))
+    if start > stop:
+        return seq
+
+    return seq[:start-1] + variant.alt + seq[stop:]
+
+
+# Handler to apply each parsed variant type
+appliers = {
+    'substitution': apply_substitution,
+    'deletion': apply_deletion,
+    'duplication': apply_duplication,
+    'insertion': apply_insertion,
+    'indel': apply_indel
+}
+
 
 
 class NonCodingVariantError(Exception):
@@ -523,8 +695,7 @@ def main():
         err('WARNING: Reference bases described in HGVS term, {}, does not match provided reference: {}'.format('c.1C>T', 'AGCT'))
 
     # Check deletion tokenization
-    regex = '(?P<id>^.+)\.(?P<start>[0-9+-?*]+)_{0,1}(?P<stop>[0-9+-?*]+){0,1}(?P<type>del)(?P<seq>[A,C,G,T,a,c,g,t,N,n]+){0,1}'
-    tokens = tokenize(regex, ['id', 'start', 'stop', 'type', 'seq'], 'c.8054delG', 'deletion')
+    tokens = tokenize(deletion_regex, ['id', 'start', 'stop', 'type', 'seq'], 'c.8054delG', 'deletion')
     print('Tokenization of c.8054_8058delATTA -> {}'.format(tokens))
 
     # Induce a deletion
@@ -541,6 +712,10 @@ def main():
     print('Induced duplication of c.2_3dup: ACGA -> {}'.format(duplication('AGCA', 'c.2_3dup')))
     print('Induced duplication of c.1dup: tAA -> {}'.format(duplication('tAA', 'c.1dup')))
 
+    # Apply a batch of variants to the same transcript
+    print('Induced batch of c.2A>T, c.2_3dup, c.1-1_1insCAA: GACC -> {}'.format(
+        mutate_many('GACC', ['c.2A>T', 'c.2_3dup', 'c.1-1_1insCAA'], return_exceptions=True)))
+
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
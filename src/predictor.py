@@ -2,30 +2,54 @@
 
 """predictor.py: runs netMHC prediction jobs in parallel for each allele provided.
 USAGE:
-  python3 predictor.py alleleList inputFile peptideLength im_prefix output_file
+  python3 predictor.py alleleList inputFile peptideLength im_prefix [threads] [--shardSize N] [--retries N] [--kmerMap FILE]
   --alleleList: list of alleles for netMHC separated by commas [H-2-Ld,H-2-Dd]
   --inputFile: filtered file obtained from predict sub-command
   --peptideLength: passed sys.arg of peptide lengths separated by commas [8,9]
   --im_prefix: path and prefix of intermediate netMHC output file [/path/to/output/netmhc_]
-  --output_file: path and prefix of the raw netMHC, merged, output file [/path/to/output/output_netmhc_raw.tsv]
+  --threads: number of netMHCpan jobs to run at the same time [4]
+  --shardSize: maximum number of sequences in each shard of the input file [1000]
+  --retries: number of times a failed netMHCpan job is re-run [2]
+  --cache: SQLite file of cached netMHCpan results, see cache.py [none]
+  --cacheEntries: maximum number of cached netMHCpan results [10000000]
+  --netmhcVersion: version of netMHCpan used in the cache keys [hash of the netMHCpan executable]
+  --kmerMap: mapping table of the kmer of each variant, when inputFile only has distinct kmers [none]
+ABOUT:
+  The input FASTA file is split into shards and netMHCpan is run for each allele and shard
+  on a bounded pool of workers. The outputs of each shard are merged back into a single
+  output file for each allele, im_prefix + "raw_" + allele + ".tsv", and a single log file,
+  im_prefix + "log_" + allele + ".tsv", as if netMHCpan was run on the whole input file.
+
+  With a cache, only the sequences with a peptide which is not cached are run through
+  netMHCpan, and the output file of each allele is re-created from the cached results,
+  see run_cached().
+
+  With a kmer mapping table, inputFile only holds the distinct kmers of the mapping table.
+  The results of each distinct kmer are fanned back out to every variant, transcript and
+  gene with that kmer, so the output file of each allele lists every record of the mapping
+  table as if netMHCpan was run on all of them, see fan_out().
 """
 
 from __future__ import print_function
-import sys, os, subprocess
-import ray
+from multiprocessing.pool import ThreadPool
+from utils import err, fatal
+from cache import NetMHCCache, version
+import os, subprocess, shutil
+import argparse, math, csv
+
 
 def bash(cmd, interpreter='/bin/bash', strict=True, **kwargs):
     """
     Interface to run a process or bash command. Using subprocess.call_check()
     due to portability across most python versions. It was introduced in python 2.5
-    and it is also interoperabie across all python 3 versions. 
+    and it is also interoperabie across all python 3 versions.
     @param cmd <str>:
         Shell command to run
     @param interpreter <str>:
         Interpreter for command to run [default: bash]
     @pararm strict <bool>:
         Prefixes any command with 'set -euo pipefail' to ensure process fail with
-        the expected exit-code  
+        the expected exit-code
     @params kwargs <check_call()>:
         Keyword arguments to modify subprocess.check_call() behavior
     @return exitcode <int>:
@@ -40,53 +64,570 @@ def bash(cmd, interpreter='/bin/bash', strict=True, **kwargs):
 
     exitcode = subprocess.check_call(prefix + cmd, shell = True, executable = interpreter, **kwargs)
 
-    if exitcode != 0: 
+    if exitcode != 0:
         fatal("""\n\tFatal: Failed to run '{}' command!
         └── Command returned a non-zero exitcode of '{}'.
-        """.format(process, exitcode)
+        """.format(cmd, exitcode)
         )
 
     return exitcode
 
-# run netMHCpan on individual allele with RAY parallelizing jobs
-def run_netMHC(alleleid, netMHC_input, peptideLength, netmhc_intermed): 
-    print("RUNNING " + alleleid)
-    
+
+# run netMHCpan on individual allele
+def run_netMHC(alleleid, netMHC_input, peptideLength, netmhc_intermed, suffix=""):
+    print("RUNNING " + alleleid + suffix)
+
     # set output intermed file names
-    netmhc_raw=str(netmhc_intermed+"raw_"+alleleid+".tsv")
-    netmhc_log=str(netmhc_intermed+"log_"+alleleid+".tsv")
-    
+    netmhc_raw=str(netmhc_intermed+"raw_"+alleleid+suffix+".tsv")
+    netmhc_log=str(netmhc_intermed+"log_"+alleleid+suffix+".tsv")
+
     # Run NETMHCPAN
     # netHMC -f $file -a alleleList -l pepetidelength
     # -xls -xlsfile /ouput/dir/outprefix_output_netmhc_raw.tsv > outprefix_netmhc_log.tsv
     process = "{} -f {} -a {} -l {} -BA -xls -xlsfile {} > {}".format(
-        "netMHCpan", 
+        "netMHCpan",
         netMHC_input,
         alleleid,
         peptideLength,
         netmhc_raw,
         netmhc_log
     )
-    
+
     print("--Running: " + process)
     exitcode = bash(process)
 
     return netmhc_raw
 
-if __name__ == '__main__':
 
-    # List of alleles to process
-    list_in=sys.argv[1]
-    alleleList=list_in.split(",")
+def records(filename):
+    """Reads the records of a FASTA file without parsing them.
+    @param filename <str>:
+        FASTA file
+    @return records list[list[<str>]]:
+        Lines of each record, starting with its header
+    """
+    records = []
+    with open(filename) as fh:
+        for line in fh:
+            if line.startswith('>') or not records:
+                records.append([])
+            records[-1].append(line)
+
+    return records
+
+
+def shard(netMHC_input, netmhc_intermed, threads, n_alleles, shard_size=1000):
+    """Splits the input FASTA file into shards of consecutive records. There are enough
+    shards to keep each worker busy, and no shard has more than shard_size records.
+    Shards have at least two records, so the order of a netMHCpan output can be
+    recognized when merging the outputs of each shard, see merge().
+    @param netMHC_input <str>:
+        Input FASTA file
+    @param netmhc_intermed <str>:
+        Path and prefix of intermediate files
+    @param threads <int>:
+        Number of workers
+    @param n_alleles <int>:
+        Number of alleles, each shard is run once for each allele
+    @param shard_size <int>:
+        Maximum number of records in each shard
+    @return shards list[<str>]:
+        FASTA file of each shard, or the input file if it is not split
+    """
+    fasta = records(netMHC_input)
+    n = max(int(math.ceil(threads / float(n_alleles))), int(math.ceil(len(fasta) / float(shard_size))))
+    n = min(n, len(fasta) // 2)
+    if n <= 1:
+        return [netMHC_input]
+
+    shards = []
+    for i in range(n):
+        shard_file = "{}shard_{}.fa".format(netmhc_intermed, i)
+        with open(shard_file, 'w') as fh:
+            for record in fasta[i * len(fasta) // n:(i + 1) * len(fasta) // n]:
+                fh.writelines(record)
+        shards.append(shard_file)
+
+    return shards
+
+
+def run_shard(alleleid, shard_file, index, peptideLength, netmhc_intermed, retries=2):
+    """Runs netMHCpan on a shard of the input file for an allele. Failed runs are
+    re-run until they succeed or they fail retries + 1 times.
+    @param alleleid <str>:
+        Allele name
+    @param shard_file <str>:
+        FASTA file of the shard
+    @param index <int>:
+        Index of the shard, or None if the input file is not split
+    @param peptideLength <str>:
+        Peptide lengths separated by commas
+    @param netmhc_intermed <str>:
+        Path and prefix of intermediate files
+    @param retries <int>:
+        Number of times a failed run is re-run
+    @return netmhc_raw <str>, netmhc_log <str>:
+        Output and log files of the shard
+    """
+    suffix = "" if index is None else ".shard_{}".format(index)
+    for attempt in range(retries + 1):
+        try:
+            netmhc_raw = run_netMHC(alleleid, shard_file, peptideLength, netmhc_intermed, suffix)
+            return netmhc_raw, str(netmhc_intermed+"log_"+alleleid+suffix+".tsv")
+        except (subprocess.CalledProcessError, OSError) as e:
+            err("WARNING: netMHCpan failed on {} for {} (attempt {} of {}): {}".format(
+                shard_file, alleleid, attempt + 1, retries + 1, e))
+
+    raise RuntimeError("netMHCpan failed on {} for {} after {} attempts!".format(shard_file, alleleid, retries + 1))
+
+
+def merge(outputs, logs, netmhc_raw, netmhc_log, lengths):
+    """Merges the outputs of each shard of an allele. The first two lines of each output,
+    the allele name and the header, are only kept once. netMHCpan either lists the
+    peptides of each length for all sequences before the next length (length-major),
+    or all the peptides of a sequence before the next sequence. Length-major outputs
+    are recognized by peptide lengths never decreasing within any shard, and their rows
+    are merged one length at a time, otherwise shards are concatenated.
+    @param outputs list[<str>]:
+        Output files of each shard, in order
+    @param logs list[<str>]:
+        Log files of each shard, in order
+    @param netmhc_raw <str>:
+        Merged output file
+    @param netmhc_log <str>:
+        Merged log file
+    @param lengths list[<int>]:
+        Peptide lengths, in the order they were provided to netMHCpan
+    """
+    rank = {length: i for i, length in enumerate(lengths)}
+    header, rows = [], []
+    length_major = True
+    for output in outputs:
+        with open(output) as fh:
+            lines = fh.readlines()
+        header = header or lines[:2]
+        shard_rows = lines[2:]
+        ranks = [rank.get(len(line.split('\t')[1]), -1) if '\t' in line else -1 for line in shard_rows]
+        if any(j < i for i, j in zip(ranks, ranks[1:])):
+            length_major = False
+        rows.append((shard_rows, ranks))
+
+    with open(netmhc_raw, 'w') as fh:
+        fh.writelines(header)
+        if length_major:
+            for i in sorted(set(r for _, ranks in rows for r in ranks)):
+                for shard_rows, ranks in rows:
+                    fh.writelines(line for line, r in zip(shard_rows, ranks) if r == i)
+        else:
+            for shard_rows, _ in rows:
+                fh.writelines(shard_rows)
+
+    with open(netmhc_log, 'w') as fh:
+        for log in logs:
+            with open(log) as lh:
+                fh.writelines(lh)
+
+
+def schedule(alleleList, netMHC_input, peptideLength, netmhc_intermed, threads=4, shard_size=1000, retries=2):
+    """Runs netMHCpan for each allele and each shard of the input file on a pool of
+    workers, and merges the outputs of each allele.
+    @param alleleList list[<str>]:
+        Allele names
+    @param netMHC_input <str|dict>:
+        Input FASTA file, or a dictionary with the input FASTA file of each allele
+    @param peptideLength <str>:
+        Peptide lengths separated by commas
+    @param netmhc_intermed <str>:
+        Path and prefix of intermediate and output files
+    @param threads <int>:
+        Number of netMHCpan jobs to run at the same time
+    @param shard_size <int>:
+        Maximum number of records in each shard
+    @param retries <int>:
+        Number of times a failed job is re-run
+    @return outputs list[<str>]:
+        Output file of each allele
+    """
+    if not isinstance(netMHC_input, dict):
+        netMHC_input = {allele: netMHC_input for allele in alleleList}
+
+    # Each distinct input 
+    # file is split once
+    shards = {}
+    for i, input_file in enumerate(sorted(set(netMHC_input.values()))):
+        prefix = netmhc_intermed if len(set(netMHC_input.values())) == 1 else "{}{}_".format(netmhc_intermed, i)
+        shards[input_file] = shard(input_file, prefix, threads, len(alleleList), shard_size)
+
+    jobs = []
+    for allele in alleleList:
+        allele_shards = shards[netMHC_input[allele]]
+        for i, shard_file in enumerate(allele_shards):
+            jobs.append((allele, shard_file, None if len(allele_shards) == 1 else i, peptideLength, netmhc_intermed, retries))
+
+    # netMHCpan jobs run in their own processes,
+    # workers only wait for them to complete
+    pool = ThreadPool(max(1, threads))
+    try:
+        results = pool.starmap(run_shard, jobs)
+    finally:
+        pool.close()
+        pool.join()
+
+    lengths = [int(length) for length in peptideLength.split(',')]
+    outputs = []
+    for allele in alleleList:
+        allele_results = [result for job, result in zip(jobs, results) if job[0] == allele]
+        if len(allele_results) == 1:
+            outputs.append(allele_results[0][0])
+            continue
+        netmhc_raw = str(netmhc_intermed+"raw_"+allele+".tsv")
+        netmhc_log = str(netmhc_intermed+"log_"+allele+".tsv")
+        merge([r for r, _ in allele_results], [l for _, l in allele_results], netmhc_raw, netmhc_log, lengths)
+        for r, l in allele_results:
+            os.remove(r)
+            os.remove(l)
+        outputs.append(netmhc_raw)
+
+    for input_shards in shards.values():
+        for shard_file in input_shards:
+            if shard_file not in netMHC_input.values():
+                os.remove(shard_file)
+
+    return outputs
+
+
+def sequences(filename):
+    """Reads the name and sequence of each record of a FASTA file.
+    @param filename <str>:
+        FASTA file
+    @return sequences list[<tuple>]:
+        Name (first word of the header) and sequence of each record
+    """
+    sequences = []
+    for record in records(filename):
+        header = record[0].strip()
+        name = (header[1:].split() or [''])[0] if header.startswith('>') else ''
+        sequences.append((name, ''.join(line.strip() for line in record[1:])))
+
+    return sequences
+
+
+# Layout of a netMHCpan output
+# before anything is learned
+unlearned = {'row_order': 'length', 'order_known': False, 'id_width': None, 'name_width': 0, 'pos_base': 0}
+
 
+def windows(sequences, lengths, row_order='length'):
+    """Lists every peptide scored by netMHCpan, in the order of its output.
+    @param sequences list[<tuple>]:
+        Name and sequence of each record, see sequences()
+    @param lengths list[<int>]:
+        Peptide lengths, in the order they were provided to netMHCpan
+    @param row_order <str>:
+        'length' if netMHCpan lists the peptides of each length for all sequences
+        before the next length, 'sequence' if it lists all the peptides of a sequence
+        before the next sequence
+    @yield window <tuple>:
+        Index of the sequence, position and peptide
+    """
+    if row_order == 'sequence':
+        order = ((i, length) for i in range(len(sequences)) for length in lengths)
+    else:
+        order = ((i, length) for length in lengths for i in range(len(sequences)))
+    for i, length in order:
+        sequence = sequences[i][1]
+        for pos in range(len(sequence) - length + 1):
+            yield i, pos, sequence[pos:pos+length]
+
+
+def learn(sequences, netmhc_raw, lengths, layout=None):
+    """Learns the layout of a netMHCpan output: its first two lines, its row order,
+    the width its sequence names are truncated to, and whether its positions
+    start at 0 or 1. The row order and the width are only known once the output
+    shows them, see probes().
+    @param sequences list[<tuple>]:
+        Name and sequence of each record of the netMHCpan input, see sequences()
+    @param netmhc_raw <str>:
+        netMHCpan output file
+    @param lengths list[<int>]:
+        Peptide lengths, in the order they were provided to netMHCpan
+    @param layout <dict>:
+        Earlier layout, kept for anything the output does not show
+    @return layout <dict>, results dict[<str>] = <str>:
+        Layout of the output and the result columns of each peptide
+    """
+    layout = dict(layout or unlearned)
+    with open(netmhc_raw) as fh:
+        lines = fh.readlines()
+    layout['header'] = ''.join(lines[:2])
+    rows = [line.rstrip('\n').split('\t', 3) for line in lines[2:] if line.count('\t') >= 3]
+
+    # The row order is observed if the
+    # peptides are listed in only one 
+    # of the two possible orders
+    scored = set(row[1] for row in rows)
+    listed = [row[1] for row in rows]
+    orders = dict((order, [peptide for _, _, peptide in windows(sequences, lengths, order) if peptide in scored])
+        for order in ('length', 'sequence'))
+    if orders['length'] != orders['sequence']:
+        for order, peptides in orders.items():
+            if peptides == listed:
+                layout['row_order'], layout['order_known'] = order, True
+
+    # Sequence names longer than the
+    # width of the ID column are truncated
+    names = set(name for name, _ in sequences)
+    ids = set(row[2] for row in rows)
+    truncated = [name for name in ids if name not in names]
+    if truncated:
+        layout['id_width'] = max(len(name) for name in truncated)
+    layout['name_width'] = max([layout['name_width']] + [len(name) for name in ids if name in names])
+
+    # Position of the first row
+    # in its sequence
+    if rows:
+        pos, peptide, name = rows[0][:3]
+        for seq_name, sequence in sequences:
+            if seq_name[:len(name)] == name and peptide in sequence:
+                start = sequence.find(peptide)
+                if pos.isdigit() and int(pos) - start in (0, 1):
+                    layout['pos_base'] = int(pos) - start
+                break
+
+    return layout, dict((row[1], row[3]) for row in rows)
+
+
+def ambiguous(sequences, lengths):
+    """Finds two sequences whose peptides are listed in another order by each row order
+    of netMHCpan, see windows().
+    @param sequences list[<tuple>]:
+        Name and sequence of each record, see sequences()
+    @param lengths list[<int>]:
+        Peptide lengths, in the order they were provided to netMHCpan
+    @return pair list[<tuple>]:
+        Both sequences, in the order of the input, or an empty list if both row
+        orders list the peptides of the sequences in the same order
+    """
+    # Sequence with a peptide of
+    # the latest length so far
+    latest = None
+    for seq in sequences:
+        ranks = [i for i, length in enumerate(lengths) if len(seq[1]) >= length]
+        if not ranks:
+            continue
+        if latest is not None and ranks[0] < latest[0]:
+            return [latest[1], seq]
+        if latest is None or ranks[-1] > latest[0]:
+            latest = (ranks[-1], seq)
+
+    return []
+
+
+def probes(layout, sequences, lengths):
+    """Lists the records netMHCpan has to be run on to learn what a layout lacks to re-create
+    its output for a list of sequences, see rebuild(). A name longer than any name observed so
+    far may be truncated to an unknown width, and the row order matters as soon as a sequence
+    has a peptide of a later length than a peptide of a sequence after it.
+    @param layout <dict>:
+        Layout of the netMHCpan output, see learn(), or None if netMHCpan was never run
+    @param sequences list[<tuple>]:
+        Name and sequence of each record of the re-created output, see sequences()
+    @param lengths list[<int>]:
+        Peptide lengths, in the order they were provided to netMHCpan
+    @return probes list[<tuple>]:
+        Name and sequence of each record, in the order they have to be provided to netMHCpan
+    """
+    known = layout or unlearned
+    # Names of sequences without a peptide
+    # are not listed in the output
+    scored = [seq for seq in sequences if len(seq[1]) >= min(lengths)]
+    probes = []
+    longest = max(scored, key=lambda seq: len(seq[0]), default=None)
+    if known['id_width'] is None and longest and len(longest[0]) > known['name_width']:
+        probes.append(longest)
+    if not known['order_known']:
+        probes += ambiguous(scored, lengths)
+    # netMHCpan is run at least once for
+    # each allele to learn its output layout
+    if layout is None and not probes:
+        probes = sequences[:1]
+
+    return probes
+
+
+def rebuild(sequences, lengths, results, layout, netmhc_raw):
+    """Re-creates a netMHCpan output file from cached results.
+    @param sequences list[<tuple>]:
+        Name and sequence of each record of the netMHCpan input, see sequences()
+    @param lengths list[<int>]:
+        Peptide lengths, in the order they were provided to netMHCpan
+    @param results dict[<str>] = <str>:
+        Result columns of each peptide
+    @param layout <dict>:
+        Layout of the netMHCpan output, see learn()
+    @param netmhc_raw <str>:
+        Output file
+    """
+    width = layout['id_width']
+    ids = [name[:width] if width else name for name, _ in sequences]
+    with open(netmhc_raw, 'w') as fh:
+        fh.write(layout['header'])
+        for i, pos, peptide in windows(sequences, lengths, layout['row_order']):
+            # Peptides which netMHCpan 
+            # did not score are skipped
+            if peptide in results:
+                fh.write("{}\t{}\t{}\t{}\n".format(pos + layout['pos_base'], peptide, ids[i], results[peptide]))
+
+
+def kmer_map(filename):
+    """Reads the mapping table of the kmer of each variant, transcript and gene, written
+    by the predict sub command.
+    @param filename <str>:
+        Tab-delimited mapping table with header and kmer_Seqs columns
+    @return sequences list[<tuple>]:
+        Name (first word of the header) and kmer of each record, see sequences()
+    """
+    sequences = []
+    with open(filename) as fh:
+        for row in csv.DictReader(fh, delimiter='\t'):
+            header = row['header']
+            name = (header[1:].split() or [''])[0] if header.startswith('>') else ''
+            sequences.append((name, row['kmer_Seqs']))
+
+    return sequences
+
+
+def fan_out(alleleList, netMHC_input, kmers, peptideLength, netmhc_intermed):
+    """Fans the netMHCpan results of distinct kmers back out to each record of a mapping
+    table. The output file of each allele is re-created for every record of the mapping
+    table, in the layout of the netMHCpan output, see learn() and rebuild(). Each distinct
+    kmer is named after the longest header of its records, so the width netMHCpan
+    truncates names to is known whenever any name of the mapping table is truncated.
+    @params alleleList, netMHC_input, peptideLength, netmhc_intermed:
+        See schedule()
+    @param kmers list[<tuple>]:
+        Name and kmer of each record of the mapping table, see kmer_map()
+    """
+    lengths = [int(length) for length in peptideLength.split(',')]
+    seqs = sequences(netMHC_input)
+    for allele in alleleList:
+        netmhc_raw = str(netmhc_intermed+"raw_"+allele+".tsv")
+        layout, results = learn(seqs, netmhc_raw, lengths)
+        rebuild(kmers, lengths, results, layout, netmhc_raw)
+
+
+def run_cached(cache, alleleList, netMHC_input, peptideLength, netmhc_intermed, threads=4, shard_size=1000, retries=2, kmers=None):
+    """Runs netMHCpan for each allele, with a cache of netMHCpan results. Each peptide
+    of the input file is looked up in the cache; only the sequences with a peptide which
+    is not cached, and the few records which show what the layout of the output still
+    lacks, see probes(), are run through netMHCpan, see schedule(), and their results are
+    added to the cache. The output file of each allele is then re-created from the cached
+    results in the layout of the netMHCpan output, see learn() and rebuild().
+    @param cache <NetMHCCache>:
+        Cache of netMHCpan results
+    @params alleleList, netMHC_input, peptideLength, netmhc_intermed, threads, shard_size, retries:
+        See schedule()
+    @param kmers list[<tuple>]:
+        Name and kmer of each record of a mapping table, see fan_out(), output files list
+        these records instead of the records of the input file
+    @return outputs list[<str>]:
+        Output file of each allele
+    """
+    lengths = [int(length) for length in peptideLength.split(',')]
+    fasta = records(netMHC_input)
+    seqs = sequences(netMHC_input)
+    peptides = [set(peptide for _, _, peptide in windows([seq], lengths)) for seq in seqs]
+    distinct = set().union(*peptides)
+
+    # Sequences with a peptide which is not
+    # cached, and records which show what the
+    # layout lacks to re-create the output
+    results, missing = {}, {}
+    for allele in alleleList:
+        hits, misses = cache.hits, cache.misses
+        results[allele] = cache.get(allele, distinct)
+        err("netMHCpan cache ({}): {} hits, {} misses".format(allele, cache.hits - hits, cache.misses - misses))
+        missed = [i for i, seq_peptides in enumerate(peptides) if not seq_peptides.issubset(results[allele])]
+        extra = probes(cache.layout(allele), kmers or seqs, lengths)
+        if not missed and not extra:
+            continue
+        # The input file shows the longest name
+        # and the row order of its own records
+        if len(missed) == len(seqs) and not (kmers and extra):
+            missing[allele] = netMHC_input
+            continue
+        missing[allele] = "{}missing_{}.fa".format(netmhc_intermed, allele)
+        with open(missing[allele], 'w') as fh:
+            for i in missed:
+                fh.writelines(fasta[i])
+            for name, sequence in extra:
+                fh.write(">{}\n{}\n".format(name, sequence))
+
+    run = [allele for allele in alleleList if allele in missing]
+    if run:
+        schedule(run, missing, peptideLength, netmhc_intermed, threads, shard_size, retries)
+
+    outputs = []
+    for allele in alleleList:
+        netmhc_raw = str(netmhc_intermed+"raw_"+allele+".tsv")
+        netmhc_log = str(netmhc_intermed+"log_"+allele+".tsv")
+        if allele in run:
+            layout, new_results = learn(sequences(missing[allele]), netmhc_raw, lengths, cache.layout(allele))
+            cache.set_layout(allele, layout)
+            cache.put(allele, new_results)
+            results[allele].update(new_results)
+            if missing[allele] != netMHC_input:
+                os.remove(missing[allele])
+        else:
+            with open(netmhc_log, 'w') as fh:
+                fh.write("# All results found in the netMHCpan cache {}\n".format(cache.filename))
+        rebuild(kmers or seqs, lengths, results[allele], cache.layout(allele), netmhc_raw)
+        outputs.append(netmhc_raw)
+
+    evicted = cache.evict()
+    err("netMHCpan cache: {:.1%} hit rate, {} hits, {} misses, {} evicted".format(
+        cache.hit_rate(), cache.hits, cache.misses, evicted))
+
+    return outputs
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description = 'Runs netMHCpan in parallel for each allele.')
+    parser.add_argument('alleleList')
+    parser.add_argument('netMHC_input')
+    parser.add_argument('peptideLength')
+    parser.add_argument('netmhc_intermed')
     # Number of concurrent tasks
-    # or remote workers.
-    try: threads = int(sys.argv[5])
+    parser.add_argument('threads', nargs = '?', default = '4')
+    parser.add_argument('--shardSize', type = int, default = 1000)
+    parser.add_argument('--retries', type = int, default = 2)
+    parser.add_argument('--cache', default = None)
+    parser.add_argument('--cacheEntries', type = int, default = 10000000)
+    parser.add_argument('--netmhcVersion', default = None)
+    parser.add_argument('--kmerMap', default = None)
+    args = parser.parse_args()
+
+    # List of alleles to process
+    alleleList=args.alleleList.split(",")
+    try: threads = int(args.threads)
     except ValueError: threads = 4
-    # set args
-    netMHC_input=sys.argv[2]
-    peptideLength=sys.argv[3]
-    netmhc_intermed=sys.argv[4]
+
+    # Kmer of each variant, when the 
+    # input only has distinct kmers
+    kmers = kmer_map(args.kmerMap) if args.kmerMap else None
 
     # run netMHC in parallel
-    result_ids = [run_netMHC(id, netMHC_input, peptideLength, netmhc_intermed) for id in alleleList] 
\ No newline at end of file
+    try:
+        if args.cache:
+            netmhc_version = args.netmhcVersion or version(shutil.which('netMHCpan'))
+            with NetMHCCache(args.cache, netmhc_version, args.cacheEntries) as cache:
+                result_ids = run_cached(cache, alleleList, args.netMHC_input, args.peptideLength,
+                    args.netmhc_intermed, threads, args.shardSize, args.retries, kmers)
+        else:
+            result_ids = schedule(alleleList, args.netMHC_input, args.peptideLength, args.netmhc_intermed,
+                threads, args.shardSize, args.retries)
+            if kmers:
+                fan_out(alleleList, args.netMHC_input, kmers, args.peptideLength, args.netmhc_intermed)
+    except RuntimeError as e:
+        fatal("Fatal: {}".format(e))
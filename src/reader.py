@@ -1,8 +1,158 @@
 #!/usr/bin/env python
 # -*- coding: UTF-8 -*-
 from __future__ import print_function
-import pandas as pd
-import sys, os
+import sys, os, mmap, gzip, queue, threading, hashlib, json
+
+# pandas is imported by the functions which
+# read MAF-like files, FASTA files are read 
+# without importing pandas or numpy, i.e. 
+# by the build sub command
+
+
+# Bytes read from a FASTA
+# file at a time
+block_size = 4 * 1024 * 1024
+
+# Whitespace within the sequence lines of a
+# record, other than the line endings, and
+# non-ASCII bytes which may be unicode whitespace
+inner_whitespace = b' \t\r\x0b\x0c\x1c\x1d\x1e\x1f' + bytes(range(0x80, 0x100))
+
+# Excel files are converted into Arrow IPC
+# files the first time they are read in, see 
+# cached(). Converted files are written next
+# to each Excel file unless a cache directory
+# is set, the least recently used files are
+# removed once a directory holds more than
+# cache_size bytes of converted files
+cache_directory = None
+cache_size = 1 << 30
+cache_suffix = '.metro-cache.arrow'
+cache_layout = 1
+
+
+def compressed(filename):
+    """Checks whether a file is gzip-compressed, including BGZF files (bgzip).
+    @param filename <str>:
+        Path of the file
+    @return compressed <bool>:
+        True if the file starts with the gzip magic number
+    """
+    with open(filename, 'rb') as file:
+        return file.read(2) == b'\x1f\x8b'
+
+
+def blocks(filename, size=block_size, queued=4):
+    """Reads a file in large blocks of bytes. Gzip and BGZF-compressed files are 
+    decompressed by a separate thread, which runs up to a number of blocks ahead
+    of the caller. zlib releases the GIL, so decompression and parsing overlap.
+    @param filename <str>:
+        Path of the file, it may be gzip-compressed
+    @param size <int>:
+        Number of bytes in each block
+    @param queued <int>:
+        Maximum number of decompressed blocks waiting to be read
+    @yield block <bytes>:
+        Next block of the (decompressed) file
+    """
+    if not compressed(filename):
+        with open(filename, 'rb') as file:
+            for block in iter(lambda: file.read(size), b''):
+                yield block
+        return
+
+    # Each BGZF block is a gzip member,
+    # gzip reads every member in turn
+    done = threading.Event()
+    pending = queue.Queue(maxsize=queued)
+    def put(item):
+        # Gives up once the
+        # caller stops reading
+        while not done.is_set():
+            try:
+                pending.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+    def decompress():
+        try:
+            with gzip.open(filename, 'rb') as file:
+                for block in iter(lambda: file.read(size), b''):
+                    if done.is_set():
+                        return
+                    put(block)
+            put(None)
+        except Exception as e:
+            put(e)
+    worker = threading.Thread(target=decompress)
+    worker.daemon = True
+    worker.start()
+    try:
+        while True:
+            block = pending.get()
+            if block is None:
+                break
+            if isinstance(block, Exception):
+                raise block
+            yield block
+    finally:
+        # Stops the decompression thread if
+        # the caller stops reading early
+        done.set()
+        worker.join()
+
+
+def _records(blocks):
+    """Private generator: splits blocks of a FASTA file into records at each header
+    line, without splitting the blocks into lines.
+    @param blocks <iterable>:
+        Blocks of bytes of a FASTA file, see blocks()
+    @yield record <bytes>:
+        Bytes before the first header, then each record, without its leading '>'
+    """
+    parts = []
+    # Records start with a '>' at the
+    # start of a line, the start of the 
+    # file is the start of a line
+    newline = True
+    for block in blocks:
+        if newline and block.startswith(b'>'):
+            yield b''.join(parts)
+            parts, block = [], block[1:]
+        records = block.split(b'\n>')
+        if len(records) > 1:
+            # A record can straddle
+            # two or more blocks
+            parts.append(records[0])
+            yield b''.join(parts)
+            for record in records[1:-1]:
+                yield record
+            parts = []
+        parts.append(records[-1])
+        newline = block.endswith(b'\n')
+    yield b''.join(parts)
+
+
+def _entries(header, body):
+    """Private generator: parses the sequence lines of a record line by line, each 
+    line is stripped. Lines starting with a '>' after any whitespace are headers.
+    @param header <str>:
+        Header of the record, or None for the bytes before the first header
+    @param body <bytes>:
+        Sequence lines of the record
+    @yield header <str>, sequence <str>:
+        Header and sequence of each entry in the record
+    """
+    sequence = []
+    lines = body.decode().replace('\r\n', '\n').replace('\r', '\n').split('\n')
+    for line in lines:
+        line = line.strip()
+        if line.startswith('>'):
+            yield header, ''.join(sequence)
+            header, sequence = line[1:], []
+        elif line:
+            sequence.append(line)
+    yield header, ''.join(sequence)
 
 
 def fasta(filename):
@@ -11,38 +161,328 @@ def fasta(filename):
     The generator yields each sequence identifier and its 
     corresponding sequence to ensure a low memory profile. 
     If a sequence occurs over multiple lines, the yielded 
-    sequence is concatenated.
+    sequence is concatenated. The file is read in large 
+    blocks, and it can be gzip or BGZF-compressed (bgzip).
+    Entries without a sequence are skipped, apart from 
+    the last entry.
      @param filename <str>:
         Path of FASTA file to read and parse
     @yield chrom, sequence <str>, <str>:
         Yields each seq id and seq in the FASTA file
     """
-    with open(filename, 'r') as file:
-        sequence, chrom = '', ''
-        for line in file:
-            line = line.strip()
-            if line.startswith('>') and sequence:
-                # base case for additional entries
-                yield chrom, sequence
-                chrom = line[1:] # remove the > symbol
-                sequence = ''
-            elif line.startswith('>'):
-                # base case for first entry in fasta file
-                chrom = line[1:] # remove the > symbol
-            else:
-                # concatenate multi-line sequences
-                sequence += line
+    chrom, sequence = '', ''
+    first = True
+    for record in _records(blocks(filename)):
+        if first:
+            # Sequence lines before
+            # the first header
+            header, body, first = None, record, False
         else:
-            yield chrom, sequence
+            header, _, body = record.partition(b'\n')
+            if b'\r' in header.rstrip(b'\r'):
+                # Lines end with a carriage 
+                # return alone (old Mac files)
+                header, _, rest = header.partition(b'\r')
+                body = b'\r' + rest + b'\n' + body
+            header = header.decode().rstrip()
+        joined = body.replace(b'\n', b'')
+        if len(joined.translate(None, inner_whitespace)) == len(joined):
+            # Fast path, sequence lines are 
+            # joined once for each record
+            entries = ((header, joined.decode()),)
+        else:
+            entries = _entries(header, body)
+        for header, parsed in entries:
+            if header is None:
+                sequence = parsed
+                continue
+            if sequence:
+                yield chrom, sequence
+            chrom, sequence = header, parsed
+    yield chrom, sequence
+
+
+def faidx(filename):
+    """
+    Builds a samtools faidx-style index of a FASTA file. Each entry 
+    in the index contains the following fields: sequence name (first
+    word of the header), sequence length, byte offset of the sequence,
+    number of bases per line, and number of bytes per line. An index 
+    can only be built for a FASTA file where each sequence line, apart
+    from the last line of each entry, has the same length.
+    @param filename <str>:
+        Path of FASTA file to index
+    @return index list[(<str>, <int>, <int>, <int>, <int>)]:
+        Index entry for each sequence in the FASTA file
+    @raises ValueError:
+        If the FASTA file has irregular line lengths or it is compressed
+    """
+    if compressed(filename):
+        raise ValueError("Cannot index FASTA file '{}', it is compressed!".format(filename))
+    index = []
+    name, length, offset = None, 0, 0
+    linebases, linewidth, last = 0, 0, False
+    position = 0
+    with open(filename, 'rb') as file:
+        for line in file:
+            width = len(line)
+            if line.startswith(b'>'):
+                if name is not None:
+                    index.append((name, length, offset, linebases, linewidth))
+                header = line[1:].split()
+                name = header[0].decode() if header else ''
+                length, offset = 0, position + width
+                linebases, linewidth, last = 0, 0, False
+            elif name is not None:
+                sequence = line.rstrip(b'\r\n')
+                bases = len(sequence)
+                if sequence.strip() != sequence or (bases and last):
+                    # Whitespace within sequence lines
+                    # or blank lines between sequence
+                    # lines cannot be indexed
+                    raise ValueError("Cannot index FASTA file '{}', entry '{}' has irregular line lengths!".format(filename, name))
+                if not linebases:
+                    linebases, linewidth = bases, width
+                elif bases > linebases or width - bases != linewidth - linebases:
+                    raise ValueError("Cannot index FASTA file '{}', entry '{}' has irregular line lengths!".format(filename, name))
+                # Only the last line of an entry
+                # can be shorter than the others 
+                last = last or bases < linebases
+                length += bases
+            elif line.strip():
+                raise ValueError("Cannot index FASTA file '{}', sequence found before first header!".format(filename))
+            position += width
+        if name is not None:
+            index.append((name, length, offset, linebases, linewidth))
+
+    return index
+
+
+class IndexedFasta(object):
+    """Random access reader of a FASTA file. Sequences are served on demand
+    from a read-only memory map of the FASTA file using a samtools faidx-style
+    index, so only the sequences which are requested are ever read into memory. 
+    An existing index (FASTA file + '.fai') is used if it is not older than the
+    FASTA file, otherwise an index is built with faidx() and saved next to the
+    FASTA file (if the directory is writable). Compressed FASTA files, even
+    BGZF files with a samtools index, cannot be memory-mapped, see fasta().
+
+    @attributes:
+        filename -- path of the indexed FASTA file
+        key      -- function to convert each sequence name into its lookup key
+    """
+    def __init__(self, filename, key=None):
+        self.filename = filename
+        self.key = key if key is not None else (lambda name: name)
+        self._entries = {}
+        if compressed(filename):
+            raise ValueError("Cannot index FASTA file '{}', it is compressed!".format(filename))
+        index = self._index()
+        for i, (name, length, offset, linebases, linewidth) in enumerate(index):
+            # Entries without a sequence are skipped
+            # like fasta() (apart from the last entry), 
+            # later entries with the same key take 
+            # precedence over earlier ones
+            if not length and i < len(index) - 1:
+                continue
+            self._entries[self.key(name)] = (length, offset, linebases, linewidth)
+        self._file = open(filename, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Cannot memory map an empty file
+            self._map = b''
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def keys(self):
+        return self._entries.keys()
+
+    def __getitem__(self, key):
+        length, offset, linebases, linewidth = self._entries[key]
+        if not length:
+            return ''
+        # Number of bytes spanned by the sequence,
+        # including the newlines of each full line
+        span = (length // linebases) * linewidth + length % linebases
+        return self._map[offset:offset+span].replace(b'\n', b'').replace(b'\r', b'').decode()
+
+    def length(self, key):
+        """Length of a sequence, without reading it.
+        @param key <str>:
+            Lookup key of the sequence
+        @return length <int>:
+            Number of bases in the sequence
+        """
+        return self._entries[key][0]
+
+    def fetch(self, key, start, end):
+        """Reads a region of a sequence, i.e. the coding regions of a chromosome.
+        Only the lines spanned by the region are read from the memory map.
+        @param key <str>:
+            Lookup key of the sequence
+        @param start <int>:
+            Start of the region (0-based)
+        @param end <int>:
+            End of the region (0-based, exclusive)
+        @return region <str>:
+            Bases of the region, clipped to the ends of the sequence
+        """
+        length, offset, linebases, linewidth = self._entries[key]
+        start, end = max(start, 0), min(end, length)
+        if start >= end:
+            return ''
+        # Byte offsets of the first base and of the
+        # base after the last base of the region
+        first = offset + (start // linebases) * linewidth + start % linebases
+        last = offset + ((end - 1) // linebases) * linewidth + (end - 1) % linebases + 1
+        return self._map[first:last].replace(b'\n', b'').replace(b'\r', b'').decode()
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def close(self):
+        """Closes the memory map and the FASTA file.
+        """
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._file.close()
+
+    def _index(self):
+        """Private method: reads an existing, up-to-date index or builds a new index.
+        """
+        index = self.filename + '.fai'
+        if os.path.exists(index) and os.path.getmtime(index) >= os.path.getmtime(self.filename):
+            with open(index, 'r') as file:
+                entries = [line.rstrip('\n').split('\t') for line in file if line.strip()]
+            return [(e[0], int(e[1]), int(e[2]), int(e[3]), int(e[4])) for e in entries]
+
+        entries = faidx(self.filename)
+        try:
+            with open(index, 'w') as file:
+                for entry in entries:
+                    file.write('{}\t{}\t{}\t{}\t{}\n'.format(*entry))
+        except (IOError, OSError):
+            # Index is kept in memory only
+            pass
+        return entries
 
 
 def maf(filename, subset=[], skip='#', **kwargs):
     """Reads in an MAF-like file as a dataframe. Determines the 
     correct handler for reading in a given MAF file. Supports reading
     in TSV files (.tsv, .txt, .text, .vcf, or .maf), CSV files (.csv), 
-    and excel files (.xls, .xlsx, .xlsm, .xlsb, .odf, .ods, .odt ). 
+    excel files (.xls, .xlsx, .xlsm, .xlsb, .odf, .ods, .odt ), and
+    columnar Parquet (.parquet) or Arrow IPC files (.arrow, .feather).
     The subset option allows a users to only select a few columns 
-    given a list of column names.
+    given a list of column names, columnar files only read in the
+    selected columns.
+    @param filename <str>:
+        Path of an MAF-like file to read and parse
+    @param subset list[<str>]:
+        List of column names which can be used to subset the df
+    @param skip <str>:
+        Skips over line starting with this character
+    @params kwargs <read_excel()>
+        Key words to modify pandas.read_excel() function behavior
+    @return <pandas dataframe>:
+        dataframe with spreadsheet contents
+    """
+    # Full-length sequences of slim output files 
+    # of find are only re-joined from their sidecar 
+    # FASTA file when they are read in, see join().
+    # Files which are not slim have no key columns
+    # or already hold the full-length sequences.
+    from writer import sidecar, sidecar_columns
+    if os.path.exists(sidecar(filename)):
+        available = header(filename, skip)
+        columns = subset or available
+        joined = [column for column in sidecar_columns if (column in subset or not subset)
+            and column not in available and sidecar_columns[column][0] in available]
+        if joined:
+            keys = [sidecar_columns[column][0] for column in joined]
+            read = [column for column in columns if column not in joined]
+            read += [key for key in keys if key not in read]
+            df = handler(filename, read, skip, **kwargs)
+            join(df, sidecar(filename), joined)
+            if subset:
+                return df[subset]
+            # Full output columns in the order
+            # of an output file which is not slim
+            from finder import columns as full_columns
+            return df[[column for column in full_columns if column in df.columns] + 
+                [column for column in df.columns if column not in full_columns and column != 'Variant_Key']]
+
+    return handler(filename, subset, skip, **kwargs)
+
+
+def header(filename, skip='#'):
+    """Reads in the column names of an MAF-like file, see maf().
+    @param filename <str>:
+        Path of an MAF-like file to read
+    @param skip <str>:
+        Skips over line starting with this character
+    @return columns list[<str>]:
+        Column names
+    """
+    extension = os.path.splitext(filename)[-1].lower()
+    if extension in ['.parquet', '.arrow', '.feather']:
+        # Columnar files store their schema
+        from writer import pyarrow
+        pa = pyarrow()
+        if extension in ['.parquet']:
+            return list(pa.parquet.read_schema(filename).names)
+        with pa.ipc.open_file(filename) as fh:
+            return list(fh.schema.names)
+
+    return list(handler(filename, [], skip, nrows=0).columns)
+
+
+def join(df, filename, columns):
+    """Re-joins the full-length sequence columns of a slim output file of find 
+    from its sidecar FASTA file. Only the sequences of the requested columns are
+    read in from the memory-mapped sidecar file, see IndexedFasta. Sequences which
+    are not in the sidecar file are missing values.
+    @param df <pandas dataframe>:
+        Rows of a slim output file, with the key columns of each requested column
+    @param filename <str>:
+        Sidecar FASTA file
+    @param columns list[<str>]:
+        Full-length sequence columns to add to df
+    """
+    import pandas as pd
+    import numpy as np
+    from writer import sidecar_columns
+    with IndexedFasta(filename) as sequences:
+        for column in columns:
+            key_column, suffix = sidecar_columns[column]
+            names = ["{}:{}".format(key, suffix) if isinstance(key, str) else None for key in df[key_column]]
+            # Types are inferred like a
+            # TSV file, i.e. a column of
+            # missing values is numeric 
+            df[column] = pd.Series([sequences.get(name, np.nan) if name else np.nan for name in names], 
+                index=df.index)
+
+
+def handler(filename, subset=[], skip='#', **kwargs):
+    """Reads in an MAF-like file as a dataframe with the handler 
+    of its file extension, see maf().
     @param filename <str>:
         Path of an MAF-like file to read and parse
     @param subset list[<str>]:
@@ -64,6 +504,12 @@ def maf(filename, subset=[], skip='#', **kwargs):
     elif extension in ['.csv']:
         # Read in as an CSV file
         return csv(filename, subset, skip, **kwargs)
+    elif extension in ['.parquet']:
+        # Read in as a Parquet file
+        return parquet(filename, subset, skip, **kwargs)
+    elif extension in ['.arrow', '.feather']:
+        # Read in as an Arrow IPC file
+        return arrow(filename, subset, skip, **kwargs)
     else:
         # Default to reading in as an TSV file
         # Tab is the normal delimeter for MAF or VCF files
@@ -72,10 +518,202 @@ def maf(filename, subset=[], skip='#', **kwargs):
         return tsv(filename, subset, skip, **kwargs)
 
 
+def chunks(filename, subset=[], skip='#', chunksize=100000, **kwargs):
+    """Reads in an MAF-like file in chunks of a fixed number of rows. Determines 
+    the correct handler for reading in a given MAF file like maf(). TSV and CSV 
+    files are streamed, so only one chunk is held in memory at a time, and only
+    the columns listed in subset are parsed. Excel and columnar files are read 
+    in once and then split into chunks. Every column listed in 
+    subset is read in as a string, missing values are NaN.
+    @param filename <str>:
+        Path of an MAF-like file to read and parse
+    @param subset list[<str>]:
+        List of column names which can be used to subset the df
+    @param skip <str>:
+        Skips over line starting with this character
+    @param chunksize <int>:
+        Number of rows in each chunk
+    @params kwargs <read_csv()>
+        Key words to modify pandas.read_csv() function behavior
+    @yield <pandas dataframe>:
+        dataframe with the next chunk of rows, columns ordered like subset
+    """
+    import pandas as pd
+    # Get file extension
+    extension = os.path.splitext(filename)[-1].lower()
+    dtype = {column: str for column in subset} or None
+
+    if extension in ['.xls', '.xlsx', '.xlsm', '.xlsb', '.odf', '.ods', '.odt']:
+        # Excel files are converted into chunks
+        # after reading in the whole spreadsheet
+        df = excel(filename, subset, skip, dtype=dtype, **kwargs)
+        for i in range(0, len(df), chunksize):
+            yield df.iloc[i:i+chunksize]
+        return
+
+    if extension in ['.parquet', '.arrow', '.feather']:
+        # Columnar files are converted into chunks
+        # after reading in the columns of subset
+        df = maf(filename, subset, skip, **kwargs)
+        if dtype:
+            df = df.astype(str).where(df.notna())
+        for i in range(0, len(df), chunksize):
+            yield df.iloc[i:i+chunksize]
+        return
+
+    # Tab is the normal delimeter for MAF or VCF files,
+    # default to reading in as an TSV file
+    sep = ',' if extension in ['.csv'] else '\t'
+    reader = pd.read_csv(filename, sep=sep, comment=skip, chunksize=chunksize,
+        usecols=subset or None, dtype=dtype, **kwargs)
+    with reader:
+        for df in reader:
+            yield df[subset] if subset else df
+
+
+def records(filename, subset=[], skip='#', chunksize=100000, **kwargs):
+    """Streams the rows of an MAF-like file as plain tuples. Rows are read 
+    in chunks, see chunks(), so only one chunk is held in memory at a time.
+    @param filename <str>:
+        Path of an MAF-like file to read and parse
+    @param subset list[<str>]:
+        List of column names to parse, each tuple is ordered like subset
+    @param skip <str>:
+        Skips over line starting with this character
+    @param chunksize <int>:
+        Number of rows read in at a time
+    @params kwargs <read_csv()>
+        Key words to modify pandas.read_csv() function behavior
+    @yield <tuple>:
+        Values of each row in the MAF-like file
+    """
+    for df in chunks(filename, subset, skip, chunksize, **kwargs):
+        for record in df.itertuples(index=False, name=None):
+            yield record
+
+
+def cache_path(filename, subset=[], skip='#', **kwargs):
+    """Path of the converted, columnar file of an Excel file, see cached(). Each
+    set of options an Excel file is read in with has its own converted file.
+    @param filename <str>:
+        Path of an Excel file
+    @params subset, skip, kwargs:
+        Options of excel()
+    @return path <str>:
+        Hidden Arrow IPC file next to the Excel file, or in cache_directory,
+        i.e. '.sample.xlsx.3f5c0e9d1a2b.8c1d2e3f4a5b.metro-cache.arrow'
+    """
+    filename = os.path.abspath(filename)
+    source = hashlib.sha1(filename.encode()).hexdigest()[:12]
+    options = json.dumps([list(subset), skip, sorted((key, repr(value)) for key, value in kwargs.items())])
+    options = hashlib.sha1(options.encode()).hexdigest()[:12]
+    directory = cache_directory or os.path.dirname(filename)
+
+    return os.path.join(directory, '.{}.{}.{}{}'.format(os.path.basename(filename), source, options, cache_suffix))
+
+
+def prune(directory, keep=None, max_size=None):
+    """Removes the least recently used converted files of a directory until they
+    add up to at most max_size bytes, see cached().
+    @param directory <str>:
+        Directory of converted files
+    @param keep <str>:
+        Converted file which is never removed, unless it is larger than max_size
+    @param max_size <int>:
+        Maximum number of bytes of converted files, defaults to cache_size
+    @return removed <int>:
+        Number of files which were removed
+    """
+    max_size = cache_size if max_size is None else max_size
+    files = []
+    for name in os.listdir(directory):
+        if not name.endswith(cache_suffix):
+            continue
+        path = os.path.join(directory, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        files.append((path == keep, stat.st_mtime, stat.st_size, path))
+
+    # Files are evicted oldest first, 
+    # the kept file is evicted last
+    total = sum(size for _, _, size, _ in files)
+    removed = 0
+    for _, _, size, path in sorted(files):
+        if total <= max_size:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+
+    return removed
+
+
+def cached(filename, subset=[], skip='#', **kwargs):
+    """Reads in an Excel file through its converted, columnar file. Parsing a 
+    spreadsheet is by far the slowest way to read a dataframe, so the dataframe is
+    written to an Arrow IPC file the first time it is read in, and later reads only
+    load the Arrow IPC file. The size and modification time of the Excel file are
+    stored in the converted file, which is re-written once either of them changes.
+    Excel files are read in directly if pyarrow is not installed, or if their 
+    dataframe cannot be converted (i.e. a column mixes numbers and text).
+    @params filename, subset, skip, kwargs:
+        See excel()
+    @return <pandas dataframe>:
+        dataframe with spreadsheet contents, like _excel()
+    """
+    try:
+        from writer import pyarrow
+        pa = pyarrow()
+    except ImportError:
+        return _excel(filename, subset, skip, **kwargs)
+    stat = os.stat(filename)
+    source = json.dumps({'layout': cache_layout, 'size': stat.st_size, 'mtime': stat.st_mtime_ns}).encode()
+    path = cache_path(filename, subset, skip, **kwargs)
+    try:
+        with pa.OSFile(path, 'rb') as fh:
+            table = pa.ipc.open_file(fh).read_all()
+        if (table.schema.metadata or {}).get(b'metro_source') == source:
+            # Marks the file as recently
+            # used, see prune()
+            os.utime(path)
+            return table.to_pandas()
+    except (OSError, pa.ArrowException):
+        # Missing, partial or 
+        # corrupt converted file
+        pass
+
+    df = _excel(filename, subset, skip, **kwargs)
+    temporary = '{}.{}.tmp'.format(path, os.getpid())
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        table = table.replace_schema_metadata(dict(table.schema.metadata or {}, metro_source=source))
+        with pa.OSFile(temporary, 'wb') as fh:
+            with pa.ipc.new_file(fh, table.schema) as writer:
+                writer.write_table(table)
+        # Concurrent readers never
+        # see a partial file
+        os.replace(temporary, path)
+        prune(os.path.dirname(path), keep=path)
+    except (OSError, pa.ArrowException, ValueError, TypeError):
+        # Excel file is read in without
+        # caching, i.e. its directory is 
+        # read-only or a column mixes types
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+    return df
+
+
 def excel(filename, subset=[], skip='#', **kwargs):
     """Reads in an excel file as a dataframe. The subset option
     allows a users to only select a few columns given a list of 
-    column names.
+    column names. The spreadsheet is converted into a cached 
+    columnar file the first time it is read in, see cached().
     @param filename <str>:
         Path of an EXCEL file to read and parse
     @param subset list[<str>]:
@@ -87,6 +725,17 @@ def excel(filename, subset=[], skip='#', **kwargs):
     @return <pandas dataframe>:
         dataframe with spreadsheet contents
     """
+    return cached(filename, subset, skip, **kwargs)
+
+
+def _excel(filename, subset=[], skip='#', **kwargs):
+    """Private function: parses an excel file as a dataframe, see excel().
+    @params filename, subset, skip, kwargs:
+        See excel()
+    @return <pandas dataframe>:
+        dataframe with spreadsheet contents
+    """
+    import pandas as pd
     if subset: 
         # 'Transcript_ID','HGVSc','Hugo_Symbol', 'Gene'
         return pd.read_excel(filename, comment=skip, **kwargs)[subset]
@@ -109,6 +758,7 @@ def tsv(filename, subset=[], skip='#', **kwargs):
     @return <pandas dataframe>:
         dataframe with spreadsheet contents
     """
+    import pandas as pd
     if subset: 
         # 'Transcript_ID','HGVSc','Hugo_Symbol', 'Gene'
         return pd.read_table(filename, comment=skip, **kwargs)[subset]
@@ -131,6 +781,7 @@ def csv(filename, subset=[], skip='#', **kwargs):
     @return <pandas dataframe>:
         dataframe with spreadsheet contents
     """
+    import pandas as pd
     if subset: 
         # 'Transcript_ID','HGVSc','Hugo_Symbol', 'Gene'
         return pd.read_csv(filename, comment=skip, **kwargs)[subset]
@@ -138,6 +789,50 @@ def csv(filename, subset=[], skip='#', **kwargs):
     return pd.read_csv(filename, comment=skip, **kwargs)
 
 
+def parquet(filename, subset=[], skip='#', **kwargs):
+    """Reads in a Parquet file as a dataframe. Only the columns
+    listed in subset are read in. Requires pyarrow.
+    @param filename <str>:
+        Path of a Parquet file to read and parse
+    @param subset list[<str>]:
+        List of column names which can be used to subset the df
+    @param skip <str>:
+        Unused, columnar files do not have comment lines
+    @params kwargs <read_parquet()>
+        Key words to modify pandas.read_parquet() function behavior
+    @return <pandas dataframe>:
+        dataframe with file contents
+    """
+    import pandas as pd
+    return pd.read_parquet(filename, columns=subset or None, engine='pyarrow', **kwargs)
+
+
+def arrow(filename, subset=[], skip='#', **kwargs):
+    """Reads in an Arrow IPC (Feather v2) file as a dataframe. Only 
+    the columns listed in subset are read in. Dictionary encoded 
+    columns are decoded, so they are read in like a TSV file rather 
+    than as categoricals. Requires pyarrow.
+    @param filename <str>:
+        Path of an Arrow IPC file to read and parse
+    @param subset list[<str>]:
+        List of column names which can be used to subset the df
+    @param skip <str>:
+        Unused, columnar files do not have comment lines
+    @params kwargs <to_pandas()>
+        Key words to modify pyarrow.Table.to_pandas() function behavior
+    @return <pandas dataframe>:
+        dataframe with file contents
+    """
+    from writer import pyarrow
+    pa = pyarrow()
+    import pyarrow.feather
+    table = pa.feather.read_table(filename, columns=subset or None)
+    columns = [column.dictionary_decode() if pa.types.is_dictionary(column.type) else column 
+        for column in (table.column(i).combine_chunks() for i in range(table.num_columns))]
+
+    return pa.table(columns, names=table.column_names).to_pandas(**kwargs)
+
+
 def main():
     """
     Pseudo main method that runs when program is directly invoked.
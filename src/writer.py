@@ -0,0 +1,252 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+from __future__ import print_function
+
+"""
+ABOUT: Writers of the output files of the find sub command.
+
+Output rows can be written as a TSV file, or as a columnar Parquet or Arrow IPC file. Columnar
+files dictionary encode low-cardinality columns (gene, transcript, variant class) and compress
+every column, which shrinks the redundant full-length sequence columns, and they can be read
+back one column at a time, see reader.maf(). Columnar files require pyarrow.
+
+Slim output files hold keys instead of full-length sequences. Each wild-type sequence is
+written once per transcript, and each mutated sequence once per variant key (a hash of the
+mutated coding DNA sequence), to a sidecar FASTA file, see SlimTableWriter. reader.maf()
+re-joins the full-length sequences of a slim output file only when they are read in.
+"""
+import hashlib, os
+
+# Output formats and
+# their file extensions
+extensions = {
+    'tsv': '.tsv',
+    'parquet': '.parquet',
+    'arrow': '.arrow'
+}
+
+# Full-length sequence columns of slim output
+# files, mapped to the column keying them and
+# the suffix of their name in the sidecar file
+sidecar_columns = {
+    'WT_Transcript_Sequence': ('Transcript_ID', 'dna'),
+    'Mutated_Transcript_Sequence': ('Variant_Key', 'dna'),
+    'WT_AA_Sequence': ('Transcript_ID', 'aa'),
+    'Mutated_AA_Sequence': ('Variant_Key', 'aa')
+}
+
+
+def sidecar(filename):
+    """Path of the sidecar FASTA file of a slim output file.
+    @param filename <str>:
+        Slim output file, i.e. 'sample.metro.tsv'
+    @return sidecar <str>:
+        Sidecar FASTA file, i.e. 'sample.metro.sequences.fa'
+    """
+    return os.path.splitext(filename)[0] + '.sequences.fa'
+
+
+def variant_key(sequence):
+    """Keys a mutated sequence by its contents.
+    @param sequence <str>:
+        Mutated coding DNA sequence
+    @return key <str>:
+        Hash of the sequence
+    """
+    return hashlib.sha1(sequence.encode()).hexdigest()[:16]
+
+
+def pyarrow():
+    """Imports pyarrow, which is only required for columnar files.
+    @return pyarrow <module>:
+        pyarrow module, with its parquet and ipc modules loaded
+    @raises ImportError:
+        If pyarrow is not installed
+    """
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("Parquet and Arrow files require pyarrow, please install it with: pip install pyarrow")
+
+    return pyarrow
+
+
+class TableWriter(object):
+    """Writes tab-delimited output rows to a TSV, Parquet or Arrow IPC file. Rows of
+    columnar files are buffered and written in batches. Empty fields are written as
+    missing values, like they are read in from a TSV file.
+
+    @attributes:
+        filename    -- path of the output file
+        columns     -- column names
+        format      -- 'tsv', 'parquet' or 'arrow'
+        dictionary  -- columns of a columnar file to dictionary encode
+        integers    -- columns of a columnar file to store as integers
+        compression -- compression codec of a columnar file
+        batch_size  -- number of rows in each batch of a columnar file
+    """
+    def __init__(self, filename, columns, format='tsv', dictionary=[], integers=[],
+        compression='zstd', batch_size=10000, buffering=-1):
+        self.filename = filename
+        self.columns = list(columns)
+        self.format = format
+        self.dictionary = [column for column in dictionary if column in self.columns]
+        self.integers = [column for column in integers if column in self.columns]
+        self.compression = compression
+        self.batch_size = batch_size
+        self._rows = []
+        # A sidecar of an earlier slim output 
+        # file would be re-joined to this output 
+        # file when it is read in, see reader.maf()
+        if not isinstance(self, SlimTableWriter):
+            for stale in [sidecar(filename), sidecar(filename) + '.fai']:
+                if os.path.exists(stale):
+                    os.remove(stale)
+        if format == 'tsv':
+            self._writer = open(filename, 'w', buffering=buffering)
+            self._writer.write("\t".join(self.columns) + "\n")
+            return
+        if format not in extensions:
+            raise ValueError("Unsupported output format '{}'!".format(format))
+
+        pa = self._pa = pyarrow()
+        fields = []
+        for column in self.columns:
+            if column in self.integers:
+                fields.append(pa.field(column, pa.int64()))
+            elif column in self.dictionary and format == 'arrow':
+                fields.append(pa.field(column, pa.dictionary(pa.int32(), pa.string())))
+            else:
+                # Parquet dictionary encodes
+                # plain string columns, see
+                # use_dictionary below
+                fields.append(pa.field(column, pa.string()))
+        self.schema = pa.schema(fields)
+        if format == 'parquet':
+            self._writer = pa.parquet.ParquetWriter(filename, self.schema,
+                compression=self.compression, use_dictionary=self.dictionary or False)
+        else:
+            options = pa.ipc.IpcWriteOptions(compression=self.compression)
+            self._writer = pa.ipc.new_file(filename, self.schema, options=options)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def write(self, row):
+        """Writes an output row.
+        @param row <str>:
+            Tab-delimited fields of the row, ending with a newline
+        """
+        if self.format == 'tsv':
+            self._writer.write(row)
+            return
+        self._rows.append(row)
+        if len(self._rows) >= self.batch_size:
+            self._flush()
+
+    def writelines(self, rows):
+        """Writes output rows, see write().
+        @param rows list[<str>]:
+            Tab-delimited fields of each row
+        """
+        for row in rows:
+            self.write(row)
+
+    def _flush(self):
+        """Private method: writes the buffered rows of a columnar file as a batch.
+        """
+        if not self._rows:
+            return
+        pa = self._pa
+        fields = [row.rstrip("\n").split("\t") for row in self._rows]
+        arrays = []
+        for i, field in enumerate(self.schema):
+            values = [f[i] if i < len(f) and f[i] != '' else None for f in fields]
+            if field.name in self.integers:
+                values = [int(value) if value is not None else None for value in values]
+            array = pa.array(values, type=pa.int64() if field.name in self.integers else pa.string())
+            if pa.types.is_dictionary(field.type):
+                array = array.dictionary_encode().cast(field.type)
+            arrays.append(array)
+        self._writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=self.schema))
+        self._rows = []
+
+    def close(self):
+        """Writes any buffered rows and closes the output file.
+        """
+        if self.format != 'tsv':
+            self._flush()
+        self._writer.close()
+
+
+class SlimTableWriter(TableWriter):
+    """Writes slim output rows, see TableWriter. Full-length sequence columns are
+    replaced by a Variant_Key column, and each full-length sequence is written once
+    to a sidecar FASTA file, named after its key and its type, i.e. '>ENSMUST00000000041:aa'
+    for the wild-type amino acid sequence of a transcript or '>0f2c9a7e81d4b3a6:dna' for
+    a mutated coding DNA sequence. Empty sequences are not written.
+
+    @attributes:
+        sidecar -- path of the sidecar FASTA file, see sidecar()
+    """
+    def __init__(self, filename, columns, format='tsv', buffering=-1, **kwargs):
+        self.full_columns = list(columns)
+        slim = [column for column in columns if column not in sidecar_columns]
+        # Key of the mutated sequences is 
+        # listed before the subset sequences
+        position = slim.index('WT_Subset_AA_Sequence') if 'WT_Subset_AA_Sequence' in slim else len(slim)
+        slim.insert(position, 'Variant_Key')
+        TableWriter.__init__(self, filename, slim, format, buffering=buffering, **kwargs)
+        self.sidecar = sidecar(filename)
+        self._sidecar = open(self.sidecar, 'w', buffering=buffering)
+        # Names of the sequences
+        # already in the sidecar
+        self._written = set()
+
+    def write(self, row):
+        """Writes an output row, and any of its full-length sequences which are not 
+        in the sidecar file yet.
+        @param row <str>:
+            Tab-delimited fields of each of the full columns, ending with a newline
+        """
+        values = dict(zip(self.full_columns, row.rstrip("\n").split("\t")))
+        mutated = values.get('Mutated_Transcript_Sequence', '')
+        values['Variant_Key'] = variant_key(mutated) if mutated else ''
+        for column, (key_column, suffix) in sidecar_columns.items():
+            sequence, key = values.get(column, ''), values.get(key_column, '')
+            name = "{}:{}".format(key, suffix)
+            if sequence and key and name not in self._written:
+                self._sidecar.write(">{}\n{}\n".format(name, sequence))
+                self._written.add(name)
+        TableWriter.write(self, "\t".join(values.get(column, '') for column in self.columns) + "\n")
+
+    def close(self):
+        """Writes any buffered rows and closes the output and sidecar files.
+        """
+        TableWriter.close(self)
+        self._sidecar.close()
+
+
+def main():
+    """Pseudo-main method for testing.
+    """
+    import sys
+    filename = sys.argv[1] if len(sys.argv) > 1 else 'example.metro.tsv'
+    format = 'tsv'
+    for name, extension in extensions.items():
+        if filename.endswith(extension):
+            format = name
+    with TableWriter(filename, ['Hugo_Symbol', 'Variant_Start_Position', 'Mutated_AA_Sequence'], format,
+        dictionary=['Hugo_Symbol'], integers=['Variant_Start_Position']) as ofh:
+        ofh.write("Trp53\t10\tSLEYVSTRQPLRRSLRSCSTP\n")
+        ofh.writelines(["Kras\t35\t\n"])
+
+
+if __name__ == '__main__':
+
+    main()